@@ -0,0 +1,57 @@
+"""
+Batch create versus N single creates against a stand-in Data API client with
+a fixed per-statement latency.
+
+    python benchmarks/bench_batch_create.py
+"""
+import time
+
+import synthetic
+import lambda_function
+from standins import StandInRedshiftData
+
+TOOL_COUNT = 50
+STATEMENT_LATENCY = 0.05
+
+
+def sample_tools(count):
+    samples = synthetic.load_sample_rows()
+    tools = []
+    for i in range(count):
+        sample = samples[i % len(samples)]
+        tool = {name: sample[name] for name in lambda_function.TABLE_COLUMNS if name in sample and name not in ('s_no', 'is_display')}
+        tool['tool_name'] = f"{tool['tool_name']} {i}"
+        tools.append(tool)
+    return tools
+
+
+def run_single(tools):
+    client = StandInRedshiftData(statement_latency=STATEMENT_LATENCY)
+    start = time.perf_counter()
+    for tool in tools:
+        success, _, error = lambda_function.insert_tool_data(
+            client, 'cluster', 'dev', 'csp_tools', 'csp_tools_data1', 'secret', tool)
+        assert success, error
+    return time.perf_counter() - start, len(client.statements)
+
+
+def run_batch(tools):
+    client = StandInRedshiftData(statement_latency=STATEMENT_LATENCY)
+    start = time.perf_counter()
+    response = lambda_function.create_tools_batch(
+        client, 'cluster', 'dev', 'csp_tools', 'csp_tools_data1', 'secret', tools)
+    assert response['statusCode'] == 201, response
+    return time.perf_counter() - start, len(client.statements)
+
+
+def main():
+    tools = sample_tools(TOOL_COUNT)
+    single_time, single_statements = run_single(tools)
+    batch_time, batch_statements = run_batch(tools)
+    print(f"{TOOL_COUNT} tools, {STATEMENT_LATENCY * 1000:.0f} ms per statement")
+    print(f"  single creates  {single_time * 1000:8.1f} ms  {single_statements:4d} statements")
+    print(f"  batch create    {batch_time * 1000:8.1f} ms  {batch_statements:4d} statements  {single_time / batch_time:5.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+"""
+Bulk soft delete versus N calls to the single delete route against a stand-in
+Data API client with a fixed per-statement latency.
+
+    python benchmarks/bench_bulk_delete.py
+"""
+import json
+import time
+
+import synthetic  # noqa: F401  (environment + import path for lambda_function)
+import lambda_function
+from standins import StandInRedshiftData, scalar_result
+
+DELETE_COUNT = 30
+STATEMENT_LATENCY = 0.05
+
+
+def changed_result(s_nos):
+    def results(sql, parameters):
+        if sql.startswith('SELECT s_no FROM changed_tools'):
+            return [{
+                'ColumnMetadata': [{'name': 's_no', 'typeName': 'int4'}],
+                'Records': [[{'longValue': s_no}] for s_no in s_nos],
+            }]
+        return scalar_result()
+    return results
+
+
+def run_single(s_nos):
+    client = StandInRedshiftData(statement_latency=STATEMENT_LATENCY, results=changed_result(s_nos))
+    connection = {'redshift_client': client, 'cluster_id': 'cluster', 'database': 'dev', 'secret_arn': 'secret'}
+    start = time.perf_counter()
+    for s_no in s_nos:
+        event = {'rawPath': lambda_function.DELETE_RAW_PATH, 'body': json.dumps({'s_no': s_no})}
+        response = lambda_function.route_request(event, connection, 'csp_tools', 'csp_tools_data1')
+        assert response['statusCode'] == 200, response
+    return time.perf_counter() - start, len(client.statements)
+
+
+def run_bulk(s_nos):
+    client = StandInRedshiftData(statement_latency=STATEMENT_LATENCY, results=changed_result(s_nos))
+    start = time.perf_counter()
+    response = lambda_function.bulk_set_display(
+        client, 'cluster', 'dev', 'csp_tools', 'csp_tools_data1', 'secret', {'s_no': s_nos}, False)
+    assert response['statusCode'] == 200, response
+    assert json.loads(response['body'])['deleted'] == s_nos
+    return time.perf_counter() - start, len(client.statements)
+
+
+def main():
+    s_nos = list(range(1, DELETE_COUNT + 1))
+    single_time, single_statements = run_single(s_nos)
+    bulk_time, bulk_statements = run_bulk(s_nos)
+    print(f"{DELETE_COUNT} soft deletes, {STATEMENT_LATENCY * 1000:.0f} ms per statement")
+    print(f"  single deletes  {single_time * 1000:8.1f} ms  {single_statements:4d} statements")
+    print(f"  bulk delete     {bulk_time * 1000:8.1f} ms  {bulk_statements:4d} statements  {single_time / bulk_time:5.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""
+Bulk update versus N calls to the single update route against a stand-in Data
+API client with a fixed per-statement latency.
+
+    python benchmarks/bench_bulk_update.py
+"""
+import json
+import time
+
+import synthetic
+import lambda_function
+from standins import StandInRedshiftData, scalar_result
+
+UPDATE_COUNT = 50
+MISSING_COUNT = 5
+STATEMENT_LATENCY = 0.05
+
+
+def sample_updates(count):
+    samples = synthetic.load_sample_rows()
+    return [
+        {'s_no': i + 1, 'remarks': f"refreshed {i}", 'active_inactive': samples[i % len(samples)]['active_inactive']}
+        for i in range(count)
+    ]
+
+
+def found_result(existing):
+    def results(sql, parameters):
+        if sql.startswith('SELECT tool_updates.s_no'):
+            return [{
+                'ColumnMetadata': [{'name': 's_no', 'typeName': 'int4'}],
+                'Records': [[{'longValue': s_no}] for s_no in existing],
+            }]
+        return scalar_result()
+    return results
+
+
+def run_single(updates, existing):
+    client = StandInRedshiftData(statement_latency=STATEMENT_LATENCY, results=found_result(existing))
+    connection = {'redshift_client': client, 'cluster_id': 'cluster', 'database': 'dev', 'secret_arn': 'secret'}
+    start = time.perf_counter()
+    for update in updates:
+        event = {'rawPath': lambda_function.UPDATE_RAW_PATH, 'body': json.dumps(update)}
+        response = lambda_function.route_request(event, connection, 'csp_tools', 'csp_tools_data1')
+        assert response['statusCode'] == 200, response
+    return time.perf_counter() - start, len(client.statements)
+
+
+def run_bulk(updates, existing):
+    client = StandInRedshiftData(statement_latency=STATEMENT_LATENCY, results=found_result(existing))
+    start = time.perf_counter()
+    response = lambda_function.update_tools_batch(
+        client, 'cluster', 'dev', 'csp_tools', 'csp_tools_data1', 'secret', updates)
+    assert response['statusCode'] == 200, response
+    statuses = [result['status'] for result in json.loads(response['body'])['results']]
+    assert statuses.count('not_found') == MISSING_COUNT, statuses
+    return time.perf_counter() - start, len(client.statements)
+
+
+def main():
+    updates = sample_updates(UPDATE_COUNT)
+    existing = [update['s_no'] for update in updates[:UPDATE_COUNT - MISSING_COUNT]]
+    single_time, single_statements = run_single(updates[:UPDATE_COUNT - MISSING_COUNT], existing)
+    bulk_time, bulk_statements = run_bulk(updates, existing)
+    print(f"{UPDATE_COUNT} updates ({MISSING_COUNT} unknown s_no), {STATEMENT_LATENCY * 1000:.0f} ms per statement")
+    print(f"  single updates  {single_time * 1000:8.1f} ms  {single_statements:4d} statements")
+    print(f"  bulk update     {bulk_time * 1000:8.1f} ms  {bulk_statements:4d} statements  {single_time / bulk_time:5.1f}x")
+
+
+if __name__ == '__main__':
+    main()
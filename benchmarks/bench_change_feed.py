@@ -0,0 +1,81 @@
+"""
+Periodic catalog sync: a full getTools read versus getTools?since=<watermark>
+when CHANGED_ROWS rows (a few of them soft deleted) changed since the last
+sync, against a stand-in Data API client that sleeps page_latency seconds per
+get_statement_result call.
+
+The stand-in evaluates the since condition itself, standing in for Redshift
+returning only the changed rows.
+
+    python benchmarks/bench_change_feed.py
+"""
+import json
+import time
+
+import synthetic
+import lambda_function
+from standins import StandInRedshiftData
+
+ROW_COUNT = 20000
+CHANGED_ROWS = 200
+DELETED_ROWS = 20
+PAGE_SIZE = 500
+PAGE_LATENCY = 0.02
+LAST_SYNC = '2026-10-01 00:00:00.000000'
+COLUMN_NAMES = [name for name, _ in synthetic.COLUMNS]
+IS_DISPLAY_INDEX = COLUMN_NAMES.index('is_display')
+
+
+def make_catalog():
+    """Rows with a last_modified cell appended, the last CHANGED_ROWS changed after LAST_SYNC"""
+    records = synthetic.make_records(ROW_COUNT)
+    for i, record in enumerate(records):
+        changed = i >= ROW_COUNT - CHANGED_ROWS
+        if changed and i >= ROW_COUNT - DELETED_ROWS:
+            record[IS_DISPLAY_INDEX] = {'booleanValue': False}
+        day = '2026-10-02' if changed else '2026-09-30'
+        record.append({'stringValue': f"{day} 00:{i // 60 % 60:02d}:{i % 60:02d}.000000"})
+    return records
+
+
+def catalog_results(records):
+    metadata = synthetic.column_metadata() + [{'name': 'last_modified', 'typeName': 'timestamp'}]
+
+    def results(sql, parameters):
+        if 'last_modified >' in sql:
+            # The overlap only moves the start back, no row here changed inside it
+            rows = [record for record in records if record[-1]['stringValue'] > parameters['since']]
+        else:
+            rows = [record for record in records if record[IS_DISPLAY_INDEX].get('booleanValue', True)]
+        pages = synthetic.make_pages(rows, PAGE_SIZE)
+        for page in pages:
+            page['ColumnMetadata'] = metadata
+        return pages
+    return results
+
+
+def run(records, query_parameters):
+    client = StandInRedshiftData(statement_latency=0, page_latency=PAGE_LATENCY, results=catalog_results(records))
+    start = time.perf_counter()
+    response = lambda_function.read_tools(client, 'cluster', 'dev', 'csp_tools', 'csp_tools_data1', 'secret',
+                                          query_parameters)
+    elapsed = time.perf_counter() - start
+    assert response['statusCode'] == 200, response
+    return elapsed, len(response['body']), json.loads(response['body'])
+
+
+def main():
+    records = make_catalog()
+    print(f"{ROW_COUNT} rows, {CHANGED_ROWS} changed since the last sync ({DELETED_ROWS} deleted), "
+          f"{PAGE_SIZE} rows per page, {PAGE_LATENCY * 1000:.0f} ms per page")
+    full_time, full_bytes, _ = run(records, {'fields': 'all'})
+    feed_time, feed_bytes, feed = run(records, {'fields': 'all', 'since': LAST_SYNC})
+    tombstones = sum(1 for record in feed['records'] if not record['is_display'])
+    assert feed['total_count'] == CHANGED_ROWS and tombstones == DELETED_ROWS
+    print(f"  full read   {full_time * 1000:8.1f} ms  {full_bytes / 1e6:6.2f} MB body")
+    print(f"  since=      {feed_time * 1000:8.1f} ms  {feed_bytes / 1e6:6.2f} MB body  "
+          f"{full_time / feed_time:5.1f}x  watermark {feed['watermark']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""
+Payload size and end-to-end latency of a 10k-row getTools response with and
+without compression. End to end = handler time (stand-in Data API client,
+page_latency per page) + transfer at LINK_MBITS + client side decompression.
+
+    python benchmarks/bench_compression.py
+"""
+import base64
+import gzip
+import json
+import time
+
+import synthetic
+import lambda_function
+from standins import StandInRedshiftData, scalar_result
+
+ROW_COUNT = 10000
+PAGE_SIZE = 500
+PAGE_LATENCY = 0.02
+LINK_MBITS = 20
+ENCODINGS = ['identity', 'gzip'] + (['br'] if lambda_function.load_brotli() else [])
+
+
+def run(records, accept_encoding, query_parameters):
+    def results(sql, parameters):
+        if 'MAX(last_modified)' in sql:
+            return scalar_result(7)
+        return synthetic.make_pages(records, PAGE_SIZE)
+
+    client = StandInRedshiftData(statement_latency=0, page_latency=PAGE_LATENCY, results=results)
+    connection = {'redshift_client': client, 'cluster_id': 'cluster', 'database': 'dev', 'secret_arn': 'secret'}
+    event = {
+        'rawPath': lambda_function.GET_ALL_TOOLS_PATH,
+        'queryStringParameters': query_parameters,
+        'headers': {'accept-encoding': accept_encoding},
+    }
+    lambda_function._table_version_cache.clear()
+
+    start = time.perf_counter()
+    response = lambda_function.route_request(event, connection, 'csp_tools', 'csp_tools_data1')
+    handler_time = time.perf_counter() - start
+
+    payload = response['body'].encode('ascii') if not response.get('isBase64Encoded') else base64.b64decode(response['body'])
+    start = time.perf_counter()
+    encoding = response['headers'].get('Content-Encoding')
+    if encoding == 'gzip':
+        body = gzip.decompress(payload)
+    elif encoding == 'br':
+        body = lambda_function.load_brotli().decompress(payload)
+    else:
+        body = payload
+    decode_time = time.perf_counter() - start
+    assert json.loads(body)['total_count'] == len(records)
+
+    transfer_time = len(payload) * 8 / (LINK_MBITS * 1e6)
+    return handler_time, len(payload), handler_time + transfer_time + decode_time
+
+
+def main():
+    records = synthetic.make_records(ROW_COUNT)
+    print(f"{ROW_COUNT} rows, {PAGE_SIZE} rows per page, {PAGE_LATENCY * 1000:.0f} ms per page, {LINK_MBITS} Mbit/s link")
+    for encoding in ENCODINGS:
+        handler_time, size, total = run(records, encoding, {'fields': 'all'})
+        print(f"  {encoding:<9} {size / 1e6:6.2f} MB  handler {handler_time * 1000:7.1f} ms  "
+              f"end to end {total * 1000:7.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
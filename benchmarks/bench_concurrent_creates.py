@@ -0,0 +1,79 @@
+"""
+Concurrent creates: LOCK TABLE ... IN EXCLUSIVE MODE + MAX(s_no) versus the
+s_no allocator. The stand-in client serializes statements that hold the same
+lock, so serialized creates show up as wall time growing with the number of
+parallel requests. Reads of the main table issued alongside the creates show
+how long readers stall behind the exclusive lock.
+
+    python benchmarks/bench_concurrent_creates.py
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import synthetic
+import lambda_function
+from standins import StandInRedshiftData
+
+PARALLEL_CREATES = 40
+WORKERS = 10
+STATEMENT_LATENCY = 0.05
+SCHEMA = 'csp_tools'
+TABLE = 'csp_tools_data1'
+
+
+def legacy_create(client, tool):
+    # The statement sequence insert_tool_data ran before the allocator
+    columns = ", ".join(tool)
+    values = ", ".join(lambda_function.escape_sql_value(value) for value in tool.values())
+    lambda_function.run_statement(client, 'cluster', 'dev', 'secret', f"""
+BEGIN;
+LOCK TABLE {SCHEMA}.{TABLE} IN EXCLUSIVE MODE;
+INSERT INTO {SCHEMA}.{TABLE} (s_no, {columns})
+SELECT COALESCE(MAX(s_no), 0) + 1, {values} FROM {SCHEMA}.{TABLE};
+COMMIT;
+""")
+    lambda_function.run_statement(client, 'cluster', 'dev', 'secret', f"SELECT MAX(s_no) FROM {SCHEMA}.{TABLE};")
+
+
+def allocator_create(client, tool):
+    success, _, error = lambda_function.insert_tool_data(client, 'cluster', 'dev', SCHEMA, TABLE, 'secret', tool)
+    assert success, error
+
+
+def read(client):
+    start = time.perf_counter()
+    lambda_function.run_statement(client, 'cluster', 'dev', 'secret', f"SELECT * FROM {SCHEMA}.{TABLE} WHERE is_display = TRUE;")
+    return time.perf_counter() - start
+
+
+def run(create):
+    client = StandInRedshiftData(
+        statement_latency=STATEMENT_LATENCY,
+        exclusive_locks={'LOCK TABLE': 'main', f'UPDATE {SCHEMA}.csp_tools_id_allocator': 'allocator'},
+        blocked_by={'SELECT * FROM': 'main'},
+    )
+    lambda_function._s_no_pool.clear()
+    tool = {'tool_name': 'bench tool', 'team_name': 'FCS'}
+
+    with ThreadPoolExecutor(max_workers=WORKERS * 2) as pool:
+        start = time.perf_counter()
+        creates = [pool.submit(create, client, tool) for _ in range(PARALLEL_CREATES)]
+        reads = [pool.submit(read, client) for _ in range(WORKERS)]
+        for future in creates:
+            future.result()
+        create_time = time.perf_counter() - start
+        read_times = sorted(future.result() for future in reads)
+    return create_time, read_times[len(read_times) // 2], client.statement_count
+
+
+def main():
+    legacy = run(legacy_create)
+    allocator = run(allocator_create)
+    print(f"{PARALLEL_CREATES} creates on {WORKERS} workers, {STATEMENT_LATENCY * 1000:.0f} ms per statement, "
+          f"S_NO_BLOCK_SIZE={lambda_function.S_NO_BLOCK_SIZE}")
+    for name, (create_time, read_p50, statements) in (('LOCK TABLE + MAX', legacy), ('allocator', allocator)):
+        print(f"  {name:17s} creates {create_time * 1000:8.1f} ms  read p50 {read_p50 * 1000:7.1f} ms  {statements:3d} statements")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""
+Requests whose statements outlast the Lambda: a getTools read, a parallel
+scan and an updateTool against a stand-in Data API client whose statements
+take STATEMENT_LATENCY seconds, invoked with REMAINING_SECONDS left on the
+clock. Each one should come back as a 503 with Retry-After shortly before
+the Lambda timeout, with every statement it submitted cancelled. An S3
+ingest event has no client to answer, it should fail the invocation instead
+so that S3 retries it.
+
+    python benchmarks/bench_deadline.py
+"""
+import json
+import time
+
+import synthetic
+import lambda_function
+from standins import StandInRedshiftData, StandInS3, scalar_result
+
+STATEMENT_LATENCY = 3.0
+REMAINING_SECONDS = 2.0
+
+lambda_function.METRICS_ENABLED = False
+
+
+class StandInContext:
+    def __init__(self, remaining_seconds):
+        self._ends_at = time.monotonic() + remaining_seconds
+
+    def get_remaining_time_in_millis(self):
+        return int((self._ends_at - time.monotonic()) * 1000)
+
+
+class SlowStatements(StandInRedshiftData):
+    """Statements containing slow_sql take STATEMENT_LATENCY seconds, the rest finish at once"""
+
+    def __init__(self, slow_sql, **kwargs):
+        super().__init__(**kwargs)
+        self.slow_sql = slow_sql
+
+    def _finish_time(self, sql):
+        return time.monotonic() + (STATEMENT_LATENCY if self.slow_sql in sql else 0)
+
+    def still_running(self):
+        now = time.monotonic()
+        return sum(1 for finish_at, _ in self._running.values() if now < finish_at != float('inf'))
+
+
+def results(sql, parameters):
+    if 'MIN(s_no)' in sql:
+        return [{'ColumnMetadata': [], 'Records': [[{'longValue': 1}, {'longValue': 20000}]]}]
+    if 'SELECT rows_loaded' in sql:
+        return [{'ColumnMetadata': [], 'Records': []}]
+    return scalar_result()
+
+
+def invoke(client, event):
+    connection = {'redshift_client': client, 'cluster_id': 'cluster', 'database': 'dev', 'secret_arn': 'secret'}
+    lambda_function.get_redshift_connection = lambda force_refresh=False: connection
+    metrics = {}
+    emit_metrics = lambda_function.emit_metrics
+
+    def capture_metrics(route, cold_start):
+        metrics.update({name: value for name, (value, _) in lambda_function._invocation_metrics.items()})
+        emit_metrics(route, cold_start)
+
+    lambda_function.emit_metrics = capture_metrics
+    try:
+        start = time.perf_counter()
+        response = lambda_function.lambda_handler(event, StandInContext(REMAINING_SECONDS))
+        return time.perf_counter() - start, response, metrics
+    finally:
+        lambda_function.emit_metrics = emit_metrics
+
+
+def main():
+    print(f"{STATEMENT_LATENCY:.1f} s per statement, {REMAINING_SECONDS:.1f} s left on the Lambda, "
+          f"{lambda_function.DEADLINE_SAFETY_MARGIN_SECONDS:.1f} s safety margin")
+    cases = [
+        ('getTools', 'ORDER BY', {'rawPath': lambda_function.GET_ALL_TOOLS_PATH,
+                                  'queryStringParameters': {'limit': '50'}}),
+        ('getTools?parallel=4', 'BETWEEN', {'rawPath': lambda_function.GET_ALL_TOOLS_PATH,
+                                            'queryStringParameters': {'parallel': '4'}}),
+        ('updateTool', 'UPDATE', {'rawPath': lambda_function.UPDATE_RAW_PATH,
+                                  'body': json.dumps({'s_no': 1, 'remarks': 'bench'})}),
+    ]
+    for name, slow_sql, event in cases:
+        client = SlowStatements(slow_sql, results=results)
+        elapsed, response, metrics = invoke(client, dict(event, headers={}))
+        assert response['statusCode'] == 503, response
+        assert response['headers']['Retry-After'] == str(lambda_function.DEADLINE_RETRY_AFTER_SECONDS)
+        assert client.still_running() == 0
+        print(f"  {name:<20} {response['statusCode']} after {elapsed * 1000:7.1f} ms, "
+              f"{metrics.get('StatementCancellations', 0)} statements cancelled")
+
+    s3 = StandInS3()
+    csv_bytes = b"s_no,tool_name,team_name\n1,bench,bench\n"
+    s3.put_lazy_object('bucket', 'incoming/tools.csv', lambda: iter([csv_bytes]), len(csv_bytes))
+    lambda_function._s3_client = s3
+    client = SlowStatements('INSERT', results=results)
+    event = {'Records': [{'eventSource': 'aws:s3', 'eventName': 'ObjectCreated:Put',
+                          's3': {'bucket': {'name': 'bucket'}, 'object': {'key': 'incoming/tools.csv'}}}]}
+    try:
+        invoke(client, event)
+        raise AssertionError("S3 ingest past the deadline should fail the invocation")
+    except lambda_function.StatementTimeoutError:
+        pass
+    assert client.still_running() == 0
+    print(f"  {'S3 ingest':<20} invocation failed for S3 to retry")
+
+
+if __name__ == '__main__':
+    main()
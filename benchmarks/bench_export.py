@@ -0,0 +1,96 @@
+"""
+Full catalog extract with every column: JSON through getTools versus an
+UNLOAD to Parquet through exportTools, against stand-in Data API and S3
+clients. The stand-in "runs" the UNLOAD by writing a manifest of
+FILE_COUNT files, the Parquet files themselves never exist.
+
+The second run makes the UNLOAD outlast EXPORT_WAIT_SECONDS and follows it
+through exportStatus until the manifest is ready.
+
+    python benchmarks/bench_export.py
+"""
+import json
+import re
+import time
+
+import synthetic
+import lambda_function
+from standins import StandInRedshiftData, StandInS3, scalar_result
+
+ROW_COUNT = 20000
+PAGE_SIZE = 500
+PAGE_LATENCY = 0.02
+FILE_COUNT = 4
+# API Gateway rejects Lambda responses above this
+PAYLOAD_LIMIT_BYTES = 6 * 1024 * 1024
+
+lambda_function.EXPORT_BUCKET = 'csp-exports'
+lambda_function.UNLOAD_IAM_ROLE_ARN = 'arn:aws:iam::000000000000:role/unload'
+
+
+def catalog_results(records, s3):
+    def results(sql, parameters):
+        if 'MAX(last_modified)' in sql:
+            return scalar_result(7)
+        if sql.startswith('UNLOAD'):
+            bucket, prefix = re.search(r"TO 's3://([^/]+)/([^']+)'", sql).groups()
+            manifest = json.dumps({
+                'entries': [
+                    {'url': f"s3://{bucket}/{prefix}{i:04d}_part_00.parquet",
+                     'meta': {'content_length': 1_000_000, 'record_count': len(records) // FILE_COUNT}}
+                    for i in range(FILE_COUNT)
+                ],
+                'meta': {'record_count': len(records)},
+            }).encode('utf-8')
+            s3.put_lazy_object(bucket, f"{prefix}manifest", lambda: [manifest], len(manifest))
+            return []
+        return synthetic.make_pages(records, PAGE_SIZE)
+    return results
+
+
+def request(client, raw_path, query_parameters):
+    connection = {'redshift_client': client, 'cluster_id': 'cluster', 'database': 'dev', 'secret_arn': 'secret'}
+    event = {'rawPath': raw_path, 'queryStringParameters': query_parameters, 'headers': {}}
+    return lambda_function.route_request(event, connection, 'csp_tools', 'csp_tools_data1')
+
+
+def main():
+    records = synthetic.make_records(ROW_COUNT)
+    s3 = StandInS3()
+    lambda_function._s3_client = s3
+    print(f"{ROW_COUNT} rows, every column, {PAGE_SIZE} rows per page, {PAGE_LATENCY * 1000:.0f} ms per page")
+
+    client = StandInRedshiftData(statement_latency=0.2, page_latency=PAGE_LATENCY, results=catalog_results(records, s3))
+    start = time.perf_counter()
+    response = request(client, lambda_function.GET_ALL_TOOLS_PATH, {'fields': 'all'})
+    json_time = time.perf_counter() - start
+    json_bytes = len(response['body'])
+    print(f"  getTools JSON   {json_time * 1000:8.1f} ms  {json_bytes / 1e6:6.2f} MB body"
+          f"{'  (over the API Gateway limit)' if json_bytes > PAYLOAD_LIMIT_BYTES else ''}")
+
+    start = time.perf_counter()
+    response = request(client, lambda_function.EXPORT_RAW_PATH, {'team_name': "O'Brien's team"})
+    export_time = time.perf_counter() - start
+    assert response['statusCode'] == 200, response
+    body = json.loads(response['body'])
+    assert len(body['files']) == FILE_COUNT and body['record_count'] == ROW_COUNT
+    assert "team_name = ''O''''Brien''''s team''" in client.statements[-1], client.statements[-1]
+    print(f"  exportTools     {export_time * 1000:8.1f} ms  {len(response['body']):6d} byte body, {FILE_COUNT} files")
+
+    # An UNLOAD that outlasts the wait is followed through exportStatus
+    lambda_function.EXPORT_WAIT_SECONDS = 0.1
+    client = StandInRedshiftData(statement_latency=0.5, results=catalog_results(records, s3))
+    response = request(client, lambda_function.EXPORT_RAW_PATH, {})
+    assert response['statusCode'] == 202, response
+    export_id = json.loads(response['body'])['export_id']
+    polls = 0
+    while response['statusCode'] == 202:
+        time.sleep(0.1)
+        polls += 1
+        response = request(client, lambda_function.EXPORT_STATUS_RAW_PATH, {'export_id': export_id})
+    assert response['statusCode'] == 200, response
+    print(f"  slow export     202, then 200 after {polls} exportStatus polls")
+
+
+if __name__ == '__main__':
+    main()
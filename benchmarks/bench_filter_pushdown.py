@@ -0,0 +1,65 @@
+"""
+Team filter pushed down to SQL versus downloading the whole catalog and
+filtering it client side, against a stand-in Data API client that sleeps
+page_latency seconds per get_statement_result call.
+
+The stand-in evaluates the team_name filter itself, standing in for Redshift
+returning only the matching rows.
+
+    python benchmarks/bench_filter_pushdown.py
+"""
+import json
+import time
+
+import synthetic
+import lambda_function
+from standins import StandInRedshiftData
+
+ROW_COUNT = 20000
+PAGE_SIZE = 500
+PAGE_LATENCY = 0.05
+TEAMS = ['GCSS', 'Retail', 'Books', 'Devices', 'Payments', 'Ads', 'Music', 'Video']
+TEAM_NAME_INDEX = [name for name, _ in synthetic.COLUMNS].index('team_name')
+
+
+def make_catalog():
+    records = synthetic.make_records(ROW_COUNT)
+    for i, record in enumerate(records):
+        record[TEAM_NAME_INDEX] = {'stringValue': TEAMS[i % len(TEAMS)]}
+    return records
+
+
+def catalog_results(records):
+    def results(sql, parameters):
+        if 'team_name = :f0' in sql:
+            matching = [record for record in records if record[TEAM_NAME_INDEX]['stringValue'] == parameters['f0']]
+            return synthetic.make_pages(matching, PAGE_SIZE)
+        return synthetic.make_pages(records, PAGE_SIZE)
+    return results
+
+
+def run(records, query_parameters, client_filter=None):
+    client = StandInRedshiftData(statement_latency=0, page_latency=PAGE_LATENCY, results=catalog_results(records))
+    start = time.perf_counter()
+    response = lambda_function.read_tools(client, 'cluster', 'dev', 'csp_tools', 'csp_tools_data1', 'secret',
+                                          query_parameters)
+    tools = json.loads(response['body'])['records']
+    if client_filter:
+        tools = [tool for tool in tools if client_filter(tool)]
+    return time.perf_counter() - start, len(response['body']), len(tools)
+
+
+def main():
+    records = make_catalog()
+    team = TEAMS[0]
+    print(f"{ROW_COUNT} rows over {len(TEAMS)} teams, {PAGE_SIZE} rows per page, {PAGE_LATENCY * 1000:.0f} ms per page")
+    full_time, full_bytes, full_count = run(records, {}, lambda tool: tool['team_name'] == team)
+    pushed_time, pushed_bytes, pushed_count = run(records, {'team_name': team})
+    assert full_count == pushed_count
+    print(f"  client side filter  {full_time * 1000:8.1f} ms  {full_bytes / 1e6:6.2f} MB body  {full_count} tools")
+    print(f"  team_name={team:<8} {pushed_time * 1000:8.1f} ms  {pushed_bytes / 1e6:6.2f} MB body  "
+          f"{pushed_count} tools  {full_time / pushed_time:5.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+"""
+Client retries of one createTool: without an Idempotency-Key every retry
+inserts another row, with one the retries are answered from the in-process
+cache, or from the idempotency table when they land on another instance.
+A retry arriving while the first attempt still runs gets a 409. The
+stand-in Data API client keeps the claimed and saved keys in memory.
+
+    python benchmarks/bench_idempotency.py
+"""
+import hashlib
+import json
+import re
+import time
+
+import synthetic
+import lambda_function
+from standins import StandInRedshiftData, scalar_result
+
+RETRIES = 5
+STATEMENT_LATENCY = 0.05
+TOOL = {'tool_name': 'bench tool', 'team_name': 'FCS'}
+
+
+def make_client():
+    saved = {}
+    pending = lambda_function.IDEMPOTENCY_PENDING_STATUS
+
+    def results(sql, parameters):
+        table = f"csp_tools.{lambda_function.IDEMPOTENCY_TABLE_NAME}"
+        if table not in sql:
+            return scalar_result()
+        if sql.startswith('SELECT'):
+            # The claim batch, values are inlined
+            row = saved.get(re.search(r"idempotency_key = '([^']*)'", sql).group(1))
+            if row is None:
+                return [{'ColumnMetadata': [], 'Records': []}]
+            body = {'stringValue': row['response_body']} if row['response_body'] else {'isNull': True}
+            return [{'ColumnMetadata': [],
+                     'Records': [[{'stringValue': row['request_hash']}, {'longValue': row['status_code']}, body]]}]
+        if sql.startswith('INSERT'):
+            key, request_hash = re.search(r"SELECT '([^']*)', '[^']*', '([^']*)'", sql).groups()
+            saved.setdefault(key, {'request_hash': request_hash, 'status_code': pending, 'response_body': None})
+        elif sql.startswith('UPDATE'):
+            saved[parameters['idempotency_key']].update(status_code=int(parameters['status_code']),
+                                                        response_body=parameters['response_body'])
+        elif sql.startswith('DELETE') and saved.get(parameters['idempotency_key'], {}).get('status_code') == pending:
+            del saved[parameters['idempotency_key']]
+        return []
+
+    return StandInRedshiftData(statement_latency=STATEMENT_LATENCY, results=results)
+
+
+def create(client, headers, body=TOOL):
+    connection = {'redshift_client': client, 'cluster_id': 'cluster', 'database': 'dev', 'secret_arn': 'secret'}
+    event = {'rawPath': lambda_function.CREATE_RAW_PATH, 'body': json.dumps(body), 'headers': headers}
+    start = time.perf_counter()
+    response = lambda_function.route_request(event, connection, 'csp_tools', 'csp_tools_data1')
+    return time.perf_counter() - start, response
+
+
+def request_hash(body):
+    # As idempotent_write hashes a createTool request
+    payload = json.dumps([lambda_function.CREATE_RAW_PATH, body], sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def inserts(client):
+    return sum(1 for sql in client.statements if sql.startswith('INSERT INTO csp_tools.csp_tools_data1'))
+
+
+def main():
+    print(f"1 createTool + {RETRIES} retries, {STATEMENT_LATENCY * 1000:.0f} ms per statement")
+
+    client = make_client()
+    for _ in range(RETRIES + 1):
+        create(client, {})
+    print(f"  no key                  {inserts(client)} rows inserted")
+
+    client = make_client()
+    headers = {'Idempotency-Key': 'f3b1c2d4-retry-bench'}
+    _, first = create(client, headers)
+    before = client.statement_count
+    replay_times = []
+    for _ in range(RETRIES):
+        elapsed, response = create(client, headers)
+        assert response['statusCode'] == 201 and response['body'] == first['body']
+        replay_times.append(elapsed)
+    print(f"  key, same instance      {inserts(client)} row inserted, retries "
+          f"{max(replay_times) * 1000:.2f} ms at most, {client.statement_count - before} statements")
+
+    # Another instance: nothing cached in process, the table has the key
+    lambda_function._idempotency_cache.clear()
+    before = client.statement_count
+    elapsed, response = create(client, headers)
+    assert response['statusCode'] == 201 and response['body'] == first['body']
+    assert response['headers'].get('Idempotent-Replayed') == 'true'
+    print(f"  key, other instance     {inserts(client)} row inserted, retry {elapsed * 1000:.1f} ms, "
+          f"{client.statement_count - before} statement")
+
+    _, response = create(client, headers, dict(TOOL, tool_name='another tool'))
+    assert response['statusCode'] == 422, response
+    print(f"  key, different payload  {response['statusCode']}")
+
+    # The first attempt has claimed the key and is still running on another instance
+    client = make_client()
+    connection = {'redshift_client': client, 'cluster_id': 'cluster', 'database': 'dev', 'secret_arn': 'secret'}
+    claimed, _ = lambda_function.claim_idempotency_key(connection, 'csp_tools', 'csp_tools_data1',
+                                                       'f3b1c2d4-in-flight-bench', request_hash(TOOL))
+    assert claimed
+    _, response = create(client, {'Idempotency-Key': 'f3b1c2d4-in-flight-bench'})
+    assert response['statusCode'] == 409 and 'Retry-After' in response['headers'], response
+    print(f"  key, first still runs   {response['statusCode']}, {inserts(client)} row inserted")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+"""
+Serial versus partitioned full catalog export against a stand-in Data API
+client that sleeps page_latency seconds per get_statement_result call.
+
+    python benchmarks/bench_parallel_scan.py
+"""
+import json
+import time
+
+import synthetic
+import lambda_function
+from standins import StandInRedshiftData
+
+ROW_COUNT = 20000
+PAGE_SIZE = 500
+STATEMENT_LATENCY = 0.2
+PAGE_LATENCY = 0.05
+PARTITIONS = (1, 2, 4, 8)
+
+
+def catalog_results(records):
+    def results(sql, parameters):
+        if sql.startswith('SELECT MIN(s_no), MAX(s_no)'):
+            return [{
+                'ColumnMetadata': [{'name': 'min', 'typeName': 'int4'}, {'name': 'max', 'typeName': 'int4'}],
+                'Records': [[{'longValue': 1}, {'longValue': len(records)}]],
+            }]
+        if 'first_s_no' in parameters:
+            first, last = int(parameters['first_s_no']), int(parameters['last_s_no'])
+            return synthetic.make_pages(records[first - 1:last], PAGE_SIZE)
+        return synthetic.make_pages(records, PAGE_SIZE)
+    return results
+
+
+def run(records, partitions):
+    client = StandInRedshiftData(statement_latency=STATEMENT_LATENCY, page_latency=PAGE_LATENCY,
+                                 results=catalog_results(records))
+    start = time.perf_counter()
+    response = lambda_function.retrieve_data(client, 'cluster', 'dev', 'csp_tools', 'csp_tools_data1', 'secret',
+                                             partitions=partitions)
+    elapsed = time.perf_counter() - start
+    body = json.loads(response['body'])
+    s_nos = [record['s_no'] for record in body['records']]
+    assert s_nos == list(range(1, len(records) + 1)), "records out of s_no order"
+    return elapsed
+
+
+def main():
+    records = synthetic.make_records(ROW_COUNT)
+    print(f"{ROW_COUNT} rows, {PAGE_SIZE} rows per page, {STATEMENT_LATENCY * 1000:.0f} ms per statement, "
+          f"{PAGE_LATENCY * 1000:.0f} ms per page, {lambda_function.PARALLEL_SCAN_MAX_WORKERS} workers")
+    baseline = None
+    for partitions in PARTITIONS:
+        elapsed = run(records, partitions)
+        baseline = baseline or elapsed
+        print(f"  partitions={partitions:<2d} {elapsed * 1000:8.1f} ms  {baseline / elapsed:5.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""
+getTools with the default summary projection versus fields=all against a
+stand-in Data API client that returns only the selected columns and sleeps
+page_latency seconds per get_statement_result call.
+
+The sample CSV has short texts, tool_script is padded to SCRIPT_BYTES to model
+the scripts pasted into the live catalog.
+
+    python benchmarks/bench_projection.py
+"""
+import json
+import time
+
+import synthetic
+import lambda_function
+from standins import StandInRedshiftData
+
+ROW_COUNT = 20000
+PAGE_SIZE = 500
+PAGE_LATENCY = 0.02
+SCRIPT_BYTES = 2000
+COLUMN_NAMES = [name for name, _ in synthetic.COLUMNS]
+TOOL_SCRIPT_INDEX = COLUMN_NAMES.index('tool_script')
+
+
+def projected_results(records):
+    def results(sql, parameters):
+        select_list = sql[len('SELECT '):sql.index(' FROM ')]
+        names = COLUMN_NAMES if select_list == '*' else select_list.split(', ')
+        indexes = [COLUMN_NAMES.index(name) for name in names]
+        metadata = [synthetic.column_metadata()[i] for i in indexes]
+        pages = synthetic.make_pages([[record[i] for i in indexes] for record in records], PAGE_SIZE)
+        pages[0]['ColumnMetadata'] = metadata
+        return pages
+    return results
+
+
+def run(records, query_parameters):
+    client = StandInRedshiftData(statement_latency=0, page_latency=PAGE_LATENCY, results=projected_results(records))
+    start = time.perf_counter()
+    response = lambda_function.read_tools(client, 'cluster', 'dev', 'csp_tools', 'csp_tools_data1', 'secret',
+                                          query_parameters)
+    elapsed = time.perf_counter() - start
+    assert json.loads(response['body'])['total_count'] == len(records)
+    return elapsed, len(response['body'])
+
+
+def main():
+    records = synthetic.make_records(ROW_COUNT)
+    script = ("SELECT sku, count(*) FROM feeds GROUP BY sku;\n" * (SCRIPT_BYTES // 46 + 1))[:SCRIPT_BYTES]
+    for record in records:
+        record[TOOL_SCRIPT_INDEX] = {'stringValue': script}
+    print(f"{ROW_COUNT} rows, {PAGE_SIZE} rows per page, {PAGE_LATENCY * 1000:.0f} ms per page, "
+          f"{SCRIPT_BYTES} byte tool_script")
+    full_time, full_bytes = run(records, {'fields': 'all'})
+    summary_time, summary_bytes = run(records, {})
+    print(f"  fields=all  {full_time * 1000:8.1f} ms  {full_bytes / 1e6:6.2f} MB body")
+    print(f"  summary     {summary_time * 1000:8.1f} ms  {summary_bytes / 1e6:6.2f} MB body  "
+          f"{full_time / summary_time:5.1f}x  ({len(lambda_function.SUMMARY_FIELDS)} of {len(COLUMN_NAMES)} columns)")
+
+
+if __name__ == '__main__':
+    main()
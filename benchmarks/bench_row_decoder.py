@@ -0,0 +1,63 @@
+"""
+Row decoding microbenchmark: the per-cell 'stringValue' in value chain the
+read paths used to run versus build_row_decoder.
+
+    python benchmarks/bench_row_decoder.py
+"""
+import timeit
+
+import synthetic
+import lambda_function
+
+
+def legacy_decode(result):
+    columns = [meta['name'] for meta in result['ColumnMetadata']]
+    records = []
+    for row in result['Records']:
+        record = {}
+        for i, value in enumerate(row):
+            if 'stringValue' in value:
+                record[columns[i]] = value['stringValue']
+            elif 'longValue' in value:
+                record[columns[i]] = value['longValue']
+            elif 'doubleValue' in value:
+                record[columns[i]] = value['doubleValue']
+            elif 'booleanValue' in value:
+                record[columns[i]] = value['booleanValue']
+            elif 'isNull' in value:
+                record[columns[i]] = None
+        records.append(record)
+    return records
+
+
+def decoder_dicts(result):
+    decode_row = lambda_function.build_row_decoder(result['ColumnMetadata'])
+    return list(map(decode_row, result['Records']))
+
+
+def decoder_tuples(result):
+    decode_row = lambda_function.build_row_decoder(result['ColumnMetadata'], as_dict=False)
+    return list(map(decode_row, result['Records']))
+
+
+def main():
+    for row_count in (10000, 100000):
+        result = {
+            'ColumnMetadata': synthetic.column_metadata(),
+            'Records': synthetic.make_records(row_count),
+        }
+        assert legacy_decode(result) == decoder_dicts(result)
+
+        repeat = 3
+        legacy = min(timeit.repeat(lambda: legacy_decode(result), number=1, repeat=repeat))
+        dicts = min(timeit.repeat(lambda: decoder_dicts(result), number=1, repeat=repeat))
+        tuples = min(timeit.repeat(lambda: decoder_tuples(result), number=1, repeat=repeat))
+
+        print(f"{row_count} rows")
+        print(f"  legacy chain     {legacy * 1000:8.1f} ms")
+        print(f"  decoder (dict)   {dicts * 1000:8.1f} ms  {legacy / dicts:5.2f}x")
+        print(f"  decoder (tuple)  {tuples * 1000:8.1f} ms  {legacy / tuples:5.2f}x")
+
+
+if __name__ == '__main__':
+    main()
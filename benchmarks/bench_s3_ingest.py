@@ -0,0 +1,86 @@
+"""
+S3 CSV ingestion throughput (rows/sec) and peak RSS against stand-in S3 and
+Data API clients. The CSV is generated lazily from sample-data/Sample_Input.csv
+so the benchmark itself does not hold the file in memory.
+
+    python benchmarks/bench_s3_ingest.py [rows]
+"""
+import csv
+import io
+import json
+import resource
+import sys
+import time
+
+import synthetic
+import lambda_function
+from standins import StandInRedshiftData, StandInS3, scalar_result
+
+BUCKET = 'csp-tools-ingest'
+KEY = 'incoming/Sample_Input.csv'
+
+
+def csv_chunks(row_count, rows_per_chunk=200):
+    samples = synthetic.load_sample_rows()
+    header = list(samples[0].keys())
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    for i in range(row_count):
+        sample = dict(samples[i % len(samples)])
+        sample['s_no'] = i + 1
+        writer.writerow([sample[name] for name in header])
+        if (i + 1) % rows_per_chunk == 0:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode('utf-8')
+
+
+def results(sql, parameters):
+    if 'SELECT rows_loaded' in sql:
+        # The file was never loaded before
+        return [{'ColumnMetadata': [], 'Records': []}]
+    return scalar_result()
+
+
+def peak_rss_mb():
+    # ru_maxrss is KB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main():
+    row_count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    content_length = sum(len(chunk) for chunk in csv_chunks(row_count))
+
+    s3 = StandInS3()
+    s3.put_lazy_object(BUCKET, KEY, lambda: csv_chunks(row_count), content_length)
+    lambda_function._s3_client = s3
+    # Measure parsing and SQL building, not the describe_statement back-off
+    lambda_function.POLL_INITIAL_DELAY_SECONDS = 0
+
+    connection = {
+        'redshift_client': StandInRedshiftData(statement_latency=0, keep_sql=False, results=results),
+        'cluster_id': 'cluster',
+        'database': 'dev',
+        'secret_arn': 'secret',
+    }
+    event = {'Records': [{
+        'eventSource': 'aws:s3',
+        'eventName': 'ObjectCreated:Put',
+        's3': {'bucket': {'name': BUCKET}, 'object': {'key': KEY}},
+    }]}
+
+    rss_before = peak_rss_mb()
+    start = time.perf_counter()
+    response = lambda_function.ingest_s3_event(event, connection, 'csp_tools', 'csp_tools_data1')
+    elapsed = time.perf_counter() - start
+
+    rows = sum(result['rows_loaded'] for result in json.loads(response['body'])['files'])
+    print(f"{rows} rows, {content_length / 1e6:.1f} MB of CSV")
+    print(f"  {elapsed:.2f} s, {rows / elapsed:,.0f} rows/sec")
+    print(f"  peak RSS {peak_rss_mb():.1f} MB (before ingest {rss_before:.1f} MB)")
+
+
+if __name__ == '__main__':
+    main()
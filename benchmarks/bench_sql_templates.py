@@ -0,0 +1,64 @@
+"""
+Distinct SQL texts sent to Redshift for a run of reads and writes: templated
+statements with Parameters versus the old f-string SQL with inlined values.
+Every distinct text is a separate compile on the cluster, the same text with
+new parameter values reuses the cached plan.
+
+    python benchmarks/bench_sql_templates.py
+"""
+import time
+
+import synthetic
+import lambda_function
+from standins import StandInRedshiftData
+
+LOOKUPS = 500
+SCHEMA = 'csp_tools'
+TABLE = 'csp_tools_data1'
+
+
+def legacy_lookup_sql(s_no):
+    return f"""
+            SELECT *
+            FROM {SCHEMA}.{TABLE}
+            WHERE s_no = {s_no} AND is_display = TRUE;
+        """
+
+
+def legacy_login_sql(login):
+    return f"SELECT * FROM {SCHEMA}.{TABLE} WHERE login = '{login}' AND is_display = TRUE ORDER BY s_no;"
+
+
+def run_legacy(logins):
+    client = StandInRedshiftData(statement_latency=0)
+    start = time.perf_counter()
+    for i in range(LOOKUPS):
+        client.execute_statement(Sql=legacy_lookup_sql(i + 1))
+        client.execute_statement(Sql=legacy_login_sql(logins[i % len(logins)]))
+    return time.perf_counter() - start, client.statements
+
+
+def run_templates(logins):
+    client = StandInRedshiftData(statement_latency=0)
+    start = time.perf_counter()
+    for i in range(LOOKUPS):
+        lambda_function.submit_statement(client, 'cluster', 'dev', 'secret',
+                                         lambda_function.sql_template('get_tool_by_s_no', SCHEMA, TABLE),
+                                         parameters={'s_no': i + 1})
+        lambda_function.submit_statement(client, 'cluster', 'dev', 'secret',
+                                         lambda_function.list_tools_template(SCHEMA, TABLE, (('login', 'eq', 1),),
+                                                                             's_no', False, None, None),
+                                         parameters={'f0': logins[i % len(logins)]})
+    return time.perf_counter() - start, client.statements
+
+
+def main():
+    logins = sorted({row['login'] for row in synthetic.load_sample_rows() if row.get('login')}) or ['user1']
+    print(f"{LOOKUPS} s_no lookups + {LOOKUPS} login lookups over {len(logins)} logins")
+    for label, run in (("f-string SQL", run_legacy), ("templates", run_templates)):
+        elapsed, statements = run(logins)
+        print(f"  {label:<14} {len(set(statements)):5d} distinct SQL texts   {elapsed * 1000:7.1f} ms client side")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+"""
+Cold start of lambda_function.py: module import time in a fresh interpreter,
+then first-invocation latency of a getTools read with the connection set up
+lazily by the request, primed in the init phase, or primed by a warm-up event.
+
+STS, Secrets Manager and client creation are stand-ins sleeping the latencies
+below. Import times need the real boto3 / botocore installed to be meaningful.
+
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --repeat 20
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import synthetic
+import lambda_function
+from standins import StandInRedshiftData, scalar_result
+
+ASSUME_ROLE_LATENCY = 0.12
+GET_SECRET_LATENCY = 0.06
+CLIENT_CREATION_LATENCY = 0.08
+STATEMENT_LATENCY = 0.05
+# Imported by the function before they became lazy
+DEFERRED_MODULES = ('uuid', 'csv', 'codecs', 'urllib.parse', 'gzip', 'concurrent.futures', 'botocore.session')
+
+lambda_function.POLL_INITIAL_DELAY_SECONDS = 0
+lambda_function.METRICS_ENABLED = False
+
+
+def import_time(statement):
+    """Seconds a fresh interpreter spends on `statement`"""
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(path for path in (sys.path[0], env.get('PYTHONPATH')) if path)
+    code = f"import time; t = time.perf_counter(); {statement}; print(time.perf_counter() - t)"
+    output = subprocess.run([sys.executable, '-c', code], env=env, check=True, capture_output=True, text=True)
+    return float(output.stdout.strip().splitlines()[-1])
+
+
+def install_standins(records):
+    def assume_role(role_arn, session_name):
+        time.sleep(ASSUME_ROLE_LATENCY)
+        return {'AccessKeyId': 'AKID', 'SecretAccessKey': 'secret', 'SessionToken': 'token'}
+
+    def get_secret(secret_name, access_key, secret_key, session_token, region):
+        time.sleep(GET_SECRET_LATENCY)
+        return {'ARN': 'secret', 'SecretString': '{"dbClusterIdentifier": "cluster", "dbname": "dev"}'}
+
+    def results(sql, parameters):
+        if 'MAX(last_modified)' in sql:
+            return scalar_result(7)
+        return synthetic.make_pages(records)
+
+    def create_redshift_client(access_key, secret_key, session_token, region):
+        time.sleep(CLIENT_CREATION_LATENCY)
+        return StandInRedshiftData(statement_latency=STATEMENT_LATENCY, results=results)
+
+    lambda_function.assume_role = assume_role
+    lambda_function.get_secret = get_secret
+    lambda_function.create_redshift_client = create_redshift_client
+
+
+def new_container():
+    lambda_function.invalidate_connection_cache()
+    lambda_function._table_version_cache.clear()
+    lambda_function._cold_start = True
+
+
+def invoke(event):
+    start = time.perf_counter()
+    response = lambda_function.lambda_handler(event, None)
+    assert response['statusCode'] == 200, response
+    return time.perf_counter() - start
+
+
+def first_invocation(mode):
+    """(init seconds, first request seconds) of one simulated container"""
+    new_container()
+    read = {'rawPath': lambda_function.GET_ALL_TOOLS_PATH, 'queryStringParameters': {'limit': '50'}, 'headers': {}}
+    init = 0.0
+    if mode == 'init':
+        start = time.perf_counter()
+        assert lambda_function.prime_connection()
+        init = time.perf_counter() - start
+    elif mode == 'warmup':
+        # The scheduled ping takes the cold start, the read lands on a warm container
+        init = invoke({'warmup': True})
+    return init, invoke(read)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    imports = [import_time('import lambda_function') for _ in range(args.repeat)]
+    deferred = [import_time('import ' + ', '.join(DEFERRED_MODULES)) for _ in range(args.repeat)]
+    print(f"Import, median of {args.repeat} fresh interpreters")
+    print(f"  lambda_function      {statistics.median(imports) * 1000:7.1f} ms")
+    print(f"  deferred modules     {statistics.median(deferred) * 1000:7.1f} ms  ({', '.join(DEFERRED_MODULES)})")
+
+    install_standins(synthetic.make_records(50))
+    print(f"First getTools read, STS {ASSUME_ROLE_LATENCY * 1000:.0f} ms, secret {GET_SECRET_LATENCY * 1000:.0f} ms, "
+          f"client {CLIENT_CREATION_LATENCY * 1000:.0f} ms, {STATEMENT_LATENCY * 1000:.0f} ms per statement")
+    for mode in ('lazy', 'init', 'warmup'):
+        runs = [first_invocation(mode) for _ in range(args.repeat)]
+        init = statistics.median(run[0] for run in runs)
+        first = statistics.median(run[1] for run in runs)
+        print(f"  {mode:<8} init {init * 1000:7.1f} ms  first request {first * 1000:7.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,170 @@
+"""
+Offline microbenchmark suite for the read and insert hot paths of
+lambda_function.py, on synthetic Data API responses at 1k, 10k and 100k rows.
+
+    python benchmarks/bench_suite.py                  # compare with baseline.json
+    python benchmarks/bench_suite.py --save-baseline  # record a new baseline
+    python benchmarks/bench_suite.py --sizes 1000,10000 --threshold 0.5
+
+Each case reports the best of --repeat runs. A case slower than its baseline
+by more than --threshold (default 30%) is flagged and the exit status is 1.
+Baselines are machine specific: record one on the machine that compares.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import timeit
+
+import synthetic
+import lambda_function
+from standins import StandInRedshiftData
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+DEFAULT_SIZES = (1000, 10000, 100000)
+LOGINS = ['aravran', 'bhasker', 'csp-ops', 'feeds-team']
+
+# The stand-in finishes statements at once, polling would only add sleeps
+lambda_function.POLL_INITIAL_DELAY_SECONDS = 0
+lambda_function.METRICS_ENABLED = False
+
+
+def catalog_client(pages):
+    return StandInRedshiftData(statement_latency=0, results=lambda sql, parameters: pages, keep_sql=False)
+
+
+def case_decode(records):
+    metadata = synthetic.column_metadata()
+
+    def run():
+        decode_row = lambda_function.build_row_decoder(metadata)
+        return [decode_row(row) for row in records]
+    return run
+
+
+def case_serialize(records):
+    decode_row = lambda_function.build_row_decoder(synthetic.column_metadata())
+    decoded = [decode_row(row) for row in records]
+    encode = lambda_function.COMPACT_JSON_ENCODER.encode
+
+    def run():
+        return ','.join(encode(record) for record in decoded)
+    return run
+
+
+def case_retrieve_data(records):
+    # Decode + JSON building of a full getTools read, pages included
+    pages = synthetic.make_pages(records)
+
+    def run():
+        response = lambda_function.retrieve_data(catalog_client(pages), 'cluster', 'dev', 'csp_tools',
+                                                 'csp_tools_data1', 'secret')
+        assert response['statusCode'] == 200, response
+    return run
+
+
+def case_retrieve_by_login(records):
+    # What get_tools_by_login did before it became the login= filter
+    pages = synthetic.make_pages(records)
+
+    def run():
+        response = lambda_function.retrieve_data(catalog_client(pages), 'cluster', 'dev', 'csp_tools',
+                                                 'csp_tools_data1', 'secret', filters=(('login', 'eq', (LOGINS[0],)),))
+        assert response['statusCode'] == 200, response
+    return run
+
+
+def case_insert_values(rows):
+    # escape_sql_value based multi-row VALUES building, as in the S3 ingest path
+    def run():
+        return ",\n".join(lambda_function.render_values_row(values) for values in rows)
+    return run
+
+
+def sample_value_rows(row_count):
+    samples = synthetic.load_sample_rows()
+    columns = [name for name in lambda_function.TABLE_COLUMNS if name != 's_no']
+    return [
+        [samples[i % len(samples)].get(name) for name in columns]
+        for i in range(row_count)
+    ]
+
+
+CASES = (
+    ('decode', case_decode, 'records'),
+    ('serialize', case_serialize, 'records'),
+    ('retrieve_data', case_retrieve_data, 'records'),
+    ('retrieve_by_login', case_retrieve_by_login, 'login_records'),
+    ('insert_values', case_insert_values, 'value_rows'),
+)
+
+
+def run_suite(sizes, repeat):
+    results = {}
+    for size in sizes:
+        inputs = {
+            'records': synthetic.make_records(size),
+            'login_records': synthetic.make_records(size, logins=[LOGINS[0]]),
+            'value_rows': sample_value_rows(size),
+        }
+        for name, factory, input_name in CASES:
+            run = factory(inputs[input_name])
+            # Fewer repeats for the big inputs, they are stable enough already
+            runs = max(1, repeat if size <= 10000 else repeat // 2)
+            best = min(timeit.repeat(run, number=1, repeat=runs))
+            results[f"{name}/{size}"] = round(best * 1000, 3)
+            print(f"  {name:<18} {size:>7} rows  {best * 1000:9.2f} ms", flush=True)
+    return results
+
+
+def compare(results, baseline, threshold):
+    regressions = []
+    for key, value in sorted(results.items()):
+        previous = baseline.get(key)
+        if previous is None:
+            print(f"  {key:<26} {value:9.2f} ms  (no baseline)")
+            continue
+        change = value / previous - 1
+        flag = 'REGRESSION' if change > threshold else ''
+        print(f"  {key:<26} {value:9.2f} ms  baseline {previous:9.2f} ms  {change:+7.1%}  {flag}")
+        if flag:
+            regressions.append(key)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', default=','.join(str(size) for size in DEFAULT_SIZES))
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--threshold', type=float, default=0.3)
+    parser.add_argument('--baseline', default=BASELINE_FILE)
+    parser.add_argument('--save-baseline', action='store_true')
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(',')]
+    print(f"Python {platform.python_version()} on {platform.machine()}, best of {args.repeat}")
+    results = run_suite(sizes, args.repeat)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump({'python': platform.python_version(), 'results': results}, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}, run with --save-baseline first")
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)['results']
+    print(f"Against {args.baseline} (threshold {args.threshold:.0%})")
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print(f"{len(regressions)} regression(s): {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
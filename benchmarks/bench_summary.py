@@ -0,0 +1,92 @@
+"""
+Dashboard tool counts: the whole catalog through getTools aggregated client
+side versus /getToolSummary served from the materialized view, cold and from
+the in-process cache. The stand-in Data API client sleeps page_latency
+seconds per get_statement_result call and answers the view query with rows
+grouped from the same catalog.
+
+    python benchmarks/bench_summary.py
+"""
+import collections
+import json
+import time
+
+import synthetic
+import lambda_function
+from standins import StandInRedshiftData, scalar_result
+
+ROW_COUNT = 20000
+PAGE_SIZE = 500
+PAGE_LATENCY = 0.02
+TEAMS = ['GCSS', 'Retail', 'Books', 'Devices', 'Payments', 'Ads', 'Music', 'Video']
+COLUMN_NAMES = [name for name, _ in synthetic.COLUMNS]
+GROUP_COLUMNS = ('team_name', 'active_inactive', 'can_be_reused_across_csp_teams')
+GROUP_INDEXES = [COLUMN_NAMES.index(name) for name in GROUP_COLUMNS]
+
+
+def make_catalog():
+    records = synthetic.make_records(ROW_COUNT)
+    for i, record in enumerate(records):
+        record[GROUP_INDEXES[0]] = {'stringValue': TEAMS[i % len(TEAMS)]}
+    return records
+
+
+def view_rows(records):
+    counts = collections.Counter(
+        tuple(record[index].get('stringValue') for index in GROUP_INDEXES) for record in records
+    )
+    return [[{'stringValue': value} if value is not None else {'isNull': True} for value in key] + [{'longValue': count}]
+            for key, count in counts.items()]
+
+
+def catalog_results(records):
+    def results(sql, parameters):
+        if 'MAX(last_modified)' in sql:
+            return scalar_result(7)
+        if lambda_function.SUMMARY_VIEW_NAME in sql:
+            metadata = [{'name': name, 'typeName': 'varchar'} for name in GROUP_COLUMNS]
+            return [{'ColumnMetadata': metadata + [{'name': 'tool_count', 'typeName': 'int8'}],
+                     'Records': view_rows(records)}]
+        return synthetic.make_pages(records, PAGE_SIZE)
+    return results
+
+
+def request(client, raw_path, query_parameters=None):
+    connection = {'redshift_client': client, 'cluster_id': 'cluster', 'database': 'dev', 'secret_arn': 'secret'}
+    event = {'rawPath': raw_path, 'queryStringParameters': query_parameters, 'headers': {}}
+    start = time.perf_counter()
+    response = lambda_function.route_request(event, connection, 'csp_tools', 'csp_tools_data1')
+    assert response['statusCode'] == 200, response
+    return time.perf_counter() - start, response['body']
+
+
+def client_side_counts(body):
+    counts = collections.Counter()
+    for tool in json.loads(body)['records']:
+        counts[tuple(tool[name] for name in GROUP_COLUMNS)] += 1
+    return counts
+
+
+def main():
+    records = make_catalog()
+    client = StandInRedshiftData(statement_latency=0, page_latency=PAGE_LATENCY, results=catalog_results(records))
+    print(f"{ROW_COUNT} rows over {len(TEAMS)} teams, {PAGE_SIZE} rows per page, {PAGE_LATENCY * 1000:.0f} ms per page")
+
+    start = time.perf_counter()
+    _, body = request(client, lambda_function.GET_ALL_TOOLS_PATH)
+    counts = client_side_counts(body)
+    full_time = time.perf_counter() - start
+
+    lambda_function._summary_cache.clear()
+    cold_time, summary = request(client, lambda_function.SUMMARY_RAW_PATH)
+    cached_time, _ = request(client, lambda_function.SUMMARY_RAW_PATH)
+    assert json.loads(summary)['tool_count'] == sum(counts.values()) == ROW_COUNT
+
+    print(f"  getTools + client side  {full_time * 1000:8.1f} ms  {len(body) / 1e6:6.2f} MB body")
+    print(f"  getToolSummary          {cold_time * 1000:8.1f} ms  {len(summary):6d} byte body  "
+          f"{full_time / cold_time:5.1f}x")
+    print(f"  getToolSummary, cached  {cached_time * 1000:8.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""
+A bulk edit session of single createTool / updateTool / deleteTool calls,
+applied one transaction per request versus queued (write-behind) and
+flushed by apply_queued_writes in SQS batches of BATCH_SIZE, against a
+stand-in Data API client and an in-memory queue.
+
+The first delete flush fails on purpose, its messages come back through the
+partial batch response and are applied on redelivery.
+
+    python benchmarks/bench_write_behind.py
+"""
+import json
+import time
+
+import synthetic
+import lambda_function
+from standins import StandInRedshiftData, StandInSQS, scalar_result
+
+WRITES_PER_TYPE = 100
+BATCH_SIZE = 100
+STATEMENT_LATENCY = 0.05
+QUEUE_URL = 'https://sqs.us-east-1.amazonaws.com/000000000000/csp-tool-writes'
+
+
+def make_client(fail_first_delete=False):
+    failures = {'delete': fail_first_delete}
+
+    def results(sql, parameters):
+        if 'WHERE s_no IN' in sql and sql.startswith('SELECT s_no'):
+            # The deleted rows exist already, nothing of the queued creates is in the table yet
+            s_nos = [int(s_no) for s_no in sql[sql.index('IN (') + 4:sql.index(')')].split(', ')]
+            return [{'ColumnMetadata': [{'name': 's_no', 'typeName': 'int4'}],
+                     'Records': [[{'longValue': s_no}] for s_no in s_nos if s_no > WRITES_PER_TYPE]}]
+        if sql.startswith('SELECT tool_updates.s_no'):
+            # Every update finds its row
+            return [{'ColumnMetadata': [{'name': 's_no', 'typeName': 'int4'}],
+                     'Records': [[{'longValue': s_no}] for s_no in range(1, WRITES_PER_TYPE + 1)]}]
+        if 'changed_tools' in sql and failures['delete']:
+            failures['delete'] = False
+            raise Exception("Serializable isolation violation")
+        return scalar_result()
+
+    return StandInRedshiftData(statement_latency=STATEMENT_LATENCY, results=results)
+
+
+def session_writes():
+    writes = []
+    for i in range(WRITES_PER_TYPE):
+        writes.append((lambda_function.CREATE_RAW_PATH, {'tool_name': f"bench tool {i}", 'team_name': 'FCS'}))
+        writes.append((lambda_function.UPDATE_RAW_PATH, {'s_no': i + 1, 'remarks': f"edit {i}"}))
+        writes.append((lambda_function.DELETE_RAW_PATH, {'s_no': WRITES_PER_TYPE + i + 1}))
+    return writes
+
+
+def send(client, raw_path, body):
+    connection = {'redshift_client': client, 'cluster_id': 'cluster', 'database': 'dev', 'secret_arn': 'secret'}
+    event = {'rawPath': raw_path, 'body': json.dumps(body), 'headers': {}}
+    return lambda_function.route_request(event, connection, 'csp_tools', 'csp_tools_data1')
+
+
+def run_direct(writes):
+    lambda_function.WRITE_BEHIND_QUEUE_URL = None
+    lambda_function._s_no_pool.clear()
+    client = make_client()
+    start = time.perf_counter()
+    for raw_path, body in writes:
+        assert send(client, raw_path, body)['statusCode'] in (200, 201), body
+    return time.perf_counter() - start, client.statement_count
+
+
+def run_write_behind(writes):
+    lambda_function.WRITE_BEHIND_QUEUE_URL = QUEUE_URL
+    lambda_function._s_no_pool.clear()
+    queue = StandInSQS()
+    lambda_function._sqs_client = queue
+    client = make_client(fail_first_delete=True)
+
+    start = time.perf_counter()
+    for raw_path, body in writes:
+        assert send(client, raw_path, body)['statusCode'] == 202, body
+    accept_time = time.perf_counter() - start
+    accept_statements = client.statement_count
+
+    connection = {'redshift_client': client, 'cluster_id': 'cluster', 'database': 'dev', 'secret_arn': 'secret'}
+    flushes = 0
+    redelivered = 0
+    start = time.perf_counter()
+    while queue.messages:
+        batch = queue.take_batch(BATCH_SIZE)
+        failed = lambda_function.apply_queued_writes(connection, 'csp_tools', 'csp_tools_data1', batch['Records'])
+        response = {'batchItemFailures': [{'itemIdentifier': message_id} for message_id in failed]}
+        queue.return_failures(batch, response)
+        redelivered += len(failed)
+        flushes += 1
+    flush_time = time.perf_counter() - start
+    return accept_time, accept_statements, flush_time, client.statement_count - accept_statements, flushes, redelivered
+
+
+def main():
+    writes = session_writes()
+    print(f"{len(writes)} single writes ({WRITES_PER_TYPE} each of create / update / delete), "
+          f"{STATEMENT_LATENCY * 1000:.0f} ms per statement, SQS batches of {BATCH_SIZE}")
+    direct_time, direct_statements = run_direct(writes)
+    accept_time, accept_statements, flush_time, flush_statements, flushes, redelivered = run_write_behind(writes)
+    print(f"  one transaction each  {direct_time * 1000:8.1f} ms  {direct_statements:4d} statements")
+    print(f"  write-behind accept   {accept_time * 1000:8.1f} ms  {accept_statements:4d} statements (s_no blocks)")
+    print(f"  write-behind flush    {flush_time * 1000:8.1f} ms  {flush_statements:4d} statements in {flushes} batches, "
+          f"{redelivered} messages redelivered")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,175 @@
+"""
+In-process stand-ins for the AWS clients lambda_function.py talks to.
+
+They record every call and simulate latency, nothing more: statements do not
+run any SQL, results are whatever the ``results`` callable returns.
+"""
+import itertools
+import threading
+import time
+
+
+def scalar_result(value=1):
+    return [{
+        'ColumnMetadata': [{'name': 'value', 'typeName': 'int8'}],
+        'Records': [[{'longValue': value}]],
+    }]
+
+
+class StandInRedshiftData:
+    """redshift-data client whose statements finish statement_latency seconds after submission"""
+
+    def __init__(self, statement_latency=0.05, page_latency=0.0, results=None, result_rows=1, keep_sql=True,
+                 exclusive_locks=None, blocked_by=None):
+        self.statement_latency = statement_latency
+        self.page_latency = page_latency
+        # results(sql, parameters) -> list of get_statement_result pages
+        self.results = results or (lambda sql, parameters: scalar_result())
+        self.result_rows = result_rows
+        self.keep_sql = keep_sql
+        self.statements = []
+        self.statement_count = 0
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._running = {}
+        # {sql substring: lock name}: such statements hold the lock while they run
+        self.exclusive_locks = exclusive_locks or {}
+        # {sql substring: lock name}: such statements wait for the lock to be free
+        self.blocked_by = blocked_by or {}
+        self._lock_free_at = {}
+        self.cancelled = []
+
+    def _submit(self, sql, pages):
+        with self._lock:
+            statement_id = f"stmt-{next(self._ids)}"
+            self.statement_count += 1
+            if self.keep_sql:
+                self.statements.append(sql)
+            self._running[statement_id] = (self._finish_time(sql), pages)
+        return {'Id': statement_id}
+
+    def _finish_time(self, sql):
+        start = time.monotonic()
+        held = [name for pattern, name in self.exclusive_locks.items() if pattern in sql]
+        waited = [name for pattern, name in self.blocked_by.items() if pattern in sql]
+        for name in held + waited:
+            start = max(start, self._lock_free_at.get(name, 0))
+        finish = start + self.statement_latency
+        for name in held:
+            self._lock_free_at[name] = finish
+        return finish
+
+    def execute_statement(self, Sql, Parameters=(), **kwargs):
+        parameters = {parameter['name']: parameter['value'] for parameter in Parameters}
+        return self._submit(Sql, self.results(Sql, parameters))
+
+    def batch_execute_statement(self, Sqls, **kwargs):
+        response = self._submit("\n".join(Sqls), [])
+        for index, sql in enumerate(Sqls, start=1):
+            self._running[f"{response['Id']}:{index}"] = (0, self.results(sql, {}))
+        return response
+
+    def describe_statement(self, Id):
+        finish_at, _ = self._running[Id]
+        if time.monotonic() < finish_at:
+            return {'Id': Id, 'Status': 'STARTED'}
+        return {
+            'Id': Id,
+            'Status': 'FINISHED',
+            'ResultRows': self.result_rows,
+            'HasResultSet': True,
+            'Duration': int(self.statement_latency * 1e9),
+            'SubStatements': [],
+        }
+
+    def get_statement_result(self, Id, NextToken=None):
+        if self.page_latency:
+            time.sleep(self.page_latency)
+        _, pages = self._running[Id]
+        return pages[int(NextToken) if NextToken else 0]
+
+    def cancel_statement(self, Id):
+        with self._lock:
+            finish_at, pages = self._running[Id]
+            if time.monotonic() >= finish_at:
+                return {'Status': False}
+            # Cancelled statements never finish
+            self._running[Id] = (float('inf'), pages)
+            self.cancelled.append(Id)
+        return {'Status': True}
+
+
+class StandInStreamingBody:
+    """botocore StreamingBody look-alike fed from an iterable of byte chunks"""
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._buffer = b''
+
+    def read(self, amt=None):
+        while amt is None or len(self._buffer) < amt:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            self._buffer += chunk
+        if amt is None:
+            data, self._buffer = self._buffer, b''
+        else:
+            data, self._buffer = self._buffer[:amt], self._buffer[amt:]
+        return data
+
+    def iter_chunks(self, chunk_size=1024):
+        while True:
+            data = self.read(chunk_size)
+            if not data:
+                break
+            yield data
+
+
+class StandInS3:
+    """s3 client serving objects from callables that produce their bytes lazily"""
+
+    def __init__(self):
+        self.objects = {}
+        self.uploads = {}
+
+    def put_lazy_object(self, bucket, key, chunks_factory, content_length):
+        self.objects[(bucket, key)] = (chunks_factory, content_length)
+
+    def get_object(self, Bucket, Key):
+        chunks_factory, content_length = self.objects[(Bucket, Key)]
+        return {'Body': StandInStreamingBody(chunks_factory()), 'ContentLength': content_length}
+
+    def generate_presigned_url(self, ClientMethod, Params, ExpiresIn=3600):
+        return f"https://{Params['Bucket']}.s3.amazonaws.com/{Params['Key']}?X-Amz-Expires={ExpiresIn}"
+
+    def upload_fileobj(self, fileobj, bucket, key):
+        size = 0
+        while True:
+            data = fileobj.read(1024 * 1024)
+            if not data:
+                break
+            size += len(data)
+        self.uploads[(bucket, key)] = size
+
+
+class StandInSQS:
+    """In-memory sqs client, take_batch hands queued messages out as an SQS event"""
+
+    def __init__(self):
+        self.messages = []
+        self._ids = itertools.count(1)
+
+    def send_message(self, QueueUrl, MessageBody, **kwargs):
+        message_id = f"msg-{next(self._ids)}"
+        self.messages.append({'messageId': message_id, 'body': MessageBody, 'eventSource': 'aws:sqs'})
+        return {'MessageId': message_id}
+
+    def take_batch(self, batch_size=10):
+        batch, self.messages = self.messages[:batch_size], self.messages[batch_size:]
+        return {'Records': batch}
+
+    def return_failures(self, batch, response):
+        """Requeue the messages a partial batch response reported as failed"""
+        failed = {item['itemIdentifier'] for item in response['batchItemFailures']}
+        self.messages.extend(record for record in batch['Records'] if record['messageId'] in failed)
@@ -0,0 +1,101 @@
+"""
+Synthetic Data API responses for benchmarking lambda_function.py offline.
+
+Columns follow sql/ddl_create_tables.sql (plus the columns added to the live
+table since), values are drawn from sample-data/Sample_Input.csv.
+"""
+import csv
+import os
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAMPLE_CSV = os.path.join(REPO_ROOT, 'sample-data', 'Sample_Input.csv')
+
+# Make lambda/lambda_function.py importable without a deployed environment
+sys.path.insert(0, os.path.join(REPO_ROOT, 'lambda'))
+os.environ.setdefault('SecretId', 'benchmark-secret')
+os.environ.setdefault('Role_Arn', 'arn:aws:iam::000000000000:role/benchmark')
+os.environ.setdefault('SCHEMA_NAME', 'csp_tools')
+os.environ.setdefault('REDSHIFT_TABLE_NAME', 'csp_tools_data1')
+
+COLUMNS = [
+    ('s_no', 'int4'),
+    ('team_name', 'varchar'),
+    ('tool_name', 'varchar'),
+    ('description', 'varchar'),
+    ('tool_code_link', 'varchar'),
+    ('tool_script', 'varchar'),
+    ('wiki_link', 'varchar'),
+    ('impact_ticket_reduced_effort_saving_hc', 'varchar'),
+    ('impact_ticket_reduced_effort_saving_tat', 'varchar'),
+    ('created_date', 'varchar'),
+    ('active_inactive', 'varchar'),
+    ('reason_for_inactive_or_deprecation', 'varchar'),
+    ('tool_used_by_csp_external_team', 'varchar'),
+    ('can_be_reused_across_csp_teams', 'varchar'),
+    ('eng_team_request_self', 'varchar'),
+    ('eng_business_team_name', 'varchar'),
+    ('op_link_from_eng_team', 'varchar'),
+    ('reason_for_cut', 'varchar'),
+    ('remarks', 'varchar'),
+    ('is_display', 'bool'),
+    ('login', 'varchar'),
+    ('tool_owner', 'varchar'),
+    ('catalog_write_read', 'varchar'),
+    ('reason_for_catalog_access', 'varchar'),
+    ('who_use_this_tool', 'varchar'),
+]
+
+PAGE_SIZE = 1000
+
+
+def load_sample_rows():
+    with open(SAMPLE_CSV, newline='', encoding='utf-8') as f:
+        return list(csv.DictReader(f))
+
+
+def column_metadata():
+    return [{'name': name, 'typeName': type_name} for name, type_name in COLUMNS]
+
+
+def make_cell(type_name, raw):
+    if raw in ('', None):
+        return {'isNull': True}
+    if type_name == 'int4':
+        return {'longValue': int(raw)}
+    if type_name == 'bool':
+        return {'booleanValue': str(raw).lower() == 'true'}
+    return {'stringValue': raw}
+
+
+def make_records(row_count, logins=None):
+    samples = load_sample_rows()
+    records = []
+    for i in range(row_count):
+        sample = samples[i % len(samples)]
+        row = []
+        for name, type_name in COLUMNS:
+            if name == 's_no':
+                raw = i + 1
+            elif name == 'is_display':
+                raw = 'true'
+            elif name == 'login' and logins:
+                raw = logins[i % len(logins)]
+            else:
+                raw = sample.get(name, '')
+            row.append(make_cell(type_name, raw))
+        records.append(row)
+    return records
+
+
+def make_pages(records, page_size=PAGE_SIZE):
+    """Split records into get_statement_result pages chained through NextToken"""
+    pages = []
+    for start in range(0, max(len(records), 1), page_size):
+        page = {'Records': records[start:start + page_size], 'TotalNumRows': len(records)}
+        if not pages:
+            page['ColumnMetadata'] = column_metadata()
+        if start + page_size < len(records):
+            page['NextToken'] = str(len(pages) + 1)
+        pages.append(page)
+    return pages
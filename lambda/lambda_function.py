@@ -1,125 +1,335 @@
 import json
-import uuid
 import boto3
 import os
-import botocore
-import botocore.session as bc
-from botocore.client import Config
+import botocore.exceptions
 import time
+import random
+import base64
+import hashlib
+import datetime
+import threading
+import functools
+import contextlib
+from collections import namedtuple, OrderedDict
 # import pandas as pd
 import io
-import csv
-
+# csv, codecs, urllib.parse, gzip, brotli and concurrent.futures are imported
+# where they are used, only S3 ingest / compressed or parallel reads need them
 
 
 GET_ALL_TOOLS_PATH = "/csp-tooling-lambda1/getTools"
 CREATE_RAW_PATH = "/csp-tooling-lambda1/createTool"
 UPDATE_RAW_PATH = "/csp-tooling-lambda1/updateTool"
 DELETE_RAW_PATH = "/csp-tooling-lambda1/deleteTool"
+CREATE_BATCH_RAW_PATH = "/csp-tooling-lambda1/createTools"
+UPDATE_BATCH_RAW_PATH = "/csp-tooling-lambda1/updateTools"
+DELETE_BATCH_RAW_PATH = "/csp-tooling-lambda1/deleteTools"
+RESTORE_BATCH_RAW_PATH = "/csp-tooling-lambda1/restoreTools"
+SUMMARY_RAW_PATH = "/csp-tooling-lambda1/getToolSummary"
+EXPORT_RAW_PATH = "/csp-tooling-lambda1/exportTools"
+EXPORT_STATUS_RAW_PATH = "/csp-tooling-lambda1/exportStatus"
+
+API_ROUTES = (
+    GET_ALL_TOOLS_PATH,
+    CREATE_RAW_PATH,
+    UPDATE_RAW_PATH,
+    DELETE_RAW_PATH,
+    CREATE_BATCH_RAW_PATH,
+    UPDATE_BATCH_RAW_PATH,
+    DELETE_BATCH_RAW_PATH,
+    RESTORE_BATCH_RAW_PATH,
+    SUMMARY_RAW_PATH,
+    EXPORT_RAW_PATH,
+    EXPORT_STATUS_RAW_PATH,
+)
+
+
+# Columns of csp_tools_data1 (sql/ddl_create_tables.sql plus the ones added later)
+TABLE_COLUMNS = {
+    's_no': 'INT',
+    'team_name': 'VARCHAR(255)',
+    'tool_name': 'VARCHAR(255)',
+    'description': 'VARCHAR(65535)',
+    'tool_code_link': 'VARCHAR(255)',
+    'tool_script': 'VARCHAR(65535)',
+    'wiki_link': 'VARCHAR(255)',
+    'impact_ticket_reduced_effort_saving_hc': 'VARCHAR(255)',
+    'impact_ticket_reduced_effort_saving_tat': 'VARCHAR(255)',
+    'created_date': 'VARCHAR(50)',
+    'active_inactive': 'VARCHAR(50)',
+    'reason_for_inactive_or_deprecation': 'VARCHAR(65535)',
+    'tool_used_by_csp_external_team': 'VARCHAR(255)',
+    'can_be_reused_across_csp_teams': 'VARCHAR(50)',
+    'eng_team_request_self': 'VARCHAR(50)',
+    'eng_business_team_name': 'VARCHAR(255)',
+    'op_link_from_eng_team': 'VARCHAR(255)',
+    'reason_for_cut': 'VARCHAR(65535)',
+    'remarks': 'VARCHAR(65535)',
+    'is_display': 'BOOLEAN',
+    'login': 'VARCHAR(255)',
+    'tool_owner': 'VARCHAR(255)',
+    'catalog_write_read': 'VARCHAR(255)',
+    'reason_for_catalog_access': 'VARCHAR(500)',
+    'who_use_this_tool': 'VARCHAR(500)',
+}
+
+MAX_BATCH_SIZE = int(os.environ.get('MAX_BATCH_SIZE', '500'))
+
+# Columns a bulk delete / restore may select rows by, besides an s_no list
+BULK_FILTER_COLUMNS = ('team_name', 'login', 'tool_owner')
+
+# Data API limits: 40 statements per batch_execute_statement, 100 KB of SQL per
+# statement. Multi-row INSERTs, the S3 ingest ones included, stay under BATCH_SQL_MAX_BYTES.
+DATA_API_MAX_BATCH_SQLS = 40
+BATCH_SQL_MAX_BYTES = int(os.environ.get('BATCH_SQL_MAX_BYTES', '90000'))
+
+# getTools filters: col=v, col__in=a,b,c and col__prefix=v (case-insensitive)
+FILTER_COLUMNS = (
+    'team_name',
+    'tool_name',
+    'active_inactive',
+    'tool_used_by_csp_external_team',
+    'can_be_reused_across_csp_teams',
+    'eng_team_request_self',
+    'eng_business_team_name',
+    'login',
+    'tool_owner',
+    'catalog_write_read',
+)
+FILTER_OPERATORS = ('in', 'prefix')
+MAX_FILTER_IN_VALUES = 100
+
+# ?sort=column or ?sort=-column for descending, s_no breaks ties
+SORT_COLUMNS = ('s_no', 'tool_name', 'team_name', 'created_date', 'active_inactive')
+DEFAULT_SORT = ('s_no', False)
+
+# Query parameters that are not filters
+READ_CONTROL_PARAMETERS = ('s_no', 'limit', 'cursor', 'parallel', 'sort', 'fields', 'since')
+
+# ?since=<watermark> returns the rows whose last_modified is later, soft deleted
+# ones included. A write can commit a little after its SYSDATE, so the feed
+# starts this much before the watermark and clients may see a row twice.
+CHANGE_FEED_OVERLAP_SECONDS = int(os.environ.get('CHANGE_FEED_OVERLAP_SECONDS', '30'))
+
+# The VARCHAR(65535) columns dominate bytes scanned and sent, list reads leave
+# them out unless asked for with fields=all or by name
+LARGE_TEXT_COLUMNS = tuple(name for name, sql_type in TABLE_COLUMNS.items() if sql_type == 'VARCHAR(65535)')
+SUMMARY_FIELDS = tuple(name for name in TABLE_COLUMNS if name not in LARGE_TEXT_COLUMNS)
+# last_modified is set by the lambda itself, fields= can ask for it but writes cannot set it
+READABLE_COLUMNS = tuple(TABLE_COLUMNS) + ('last_modified',)
 
 
 print('Loading function')
-secret_name = os.environ['SecretId']
 
 
-def retrieve_data(redshift_client, cluster_id, database, schema_name,table_name, secret_arn):
+# LOG_LEVEL=DEBUG brings back the event / SQL dumps, they are skipped otherwise
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+DEBUG_LOGGING = LOG_LEVEL == 'DEBUG'
+
+# One CloudWatch Embedded Metric Format line per invocation with the time
+# spent in each phase. Phases running on several threads are summed.
+METRICS_NAMESPACE = os.environ.get('METRICS_NAMESPACE', 'CspToolingLambda')
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'true').lower() == 'true'
+
+_invocation_metrics = {}
+_metrics_lock = threading.Lock()
+_cold_start = True
+
+
+def log_debug(*args):
+    if DEBUG_LOGGING:
+        print(*args)
+
+
+def record_metric(name, value, unit='Milliseconds'):
+    with _metrics_lock:
+        total, _ = _invocation_metrics.get(name, (0, unit))
+        _invocation_metrics[name] = (total + value, unit)
+
+
+@contextlib.contextmanager
+def timed_phase(name):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_metric(name, (time.perf_counter() - started) * 1000)
+
+
+def route_name(event):
+    if is_warmup_event(event):
+        return 'warmup'
+    if is_s3_event(event):
+        return 's3Ingest'
+    raw_path = event.get('rawPath') or ''
+    if raw_path in API_ROUTES:
+        return raw_path.rsplit('/', 1)[-1]
+    # Unknown paths share one dimension value to keep metric cardinality bounded
+    return 'unknown'
+
+
+def emit_metrics(route, cold_start):
+    """Print the metrics collected for this invocation as one EMF log line"""
+    with _metrics_lock:
+        metrics = dict(_invocation_metrics)
+        _invocation_metrics.clear()
+    if not METRICS_ENABLED or not metrics:
+        return
+
+    line = {
+        '_aws': {
+            'Timestamp': int(time.time() * 1000),
+            'CloudWatchMetrics': [{
+                'Namespace': METRICS_NAMESPACE,
+                'Dimensions': [['Route', 'ColdStart']],
+                'Metrics': [{'Name': name, 'Unit': unit} for name, (_, unit) in sorted(metrics.items())],
+            }],
+        },
+        'Route': route,
+        'ColdStart': 'true' if cold_start else 'false',
+    }
+    for name, (value, unit) in metrics.items():
+        line[name] = round(value, 3) if unit == 'Milliseconds' else value
+    print(json.dumps(line, separators=(',', ':')))
+
+
+# Credentials, secret and redshift-data client are cached at module scope so
+# warm invocations skip the STS / Secrets Manager round trips.
+CREDENTIAL_REFRESH_MARGIN_SECONDS = int(os.environ.get('CREDENTIAL_REFRESH_MARGIN_SECONDS', '300'))
+SECRET_CACHE_TTL_SECONDS = int(os.environ.get('SECRET_CACHE_TTL_SECONDS', '900'))
+
+AUTH_ERROR_CODES = (
+    'ExpiredToken',
+    'ExpiredTokenException',
+    'InvalidClientTokenId',
+    'UnrecognizedClientException',
+    'InvalidSignatureException',
+    'AccessDeniedException',
+)
+
+# describe_statement polling: short first delay, then exponential backoff with jitter
+POLL_INITIAL_DELAY_SECONDS = float(os.environ.get('POLL_INITIAL_DELAY_SECONDS', '0.05'))
+POLL_MAX_DELAY_SECONDS = float(os.environ.get('POLL_MAX_DELAY_SECONDS', '1.0'))
+POLL_BACKOFF_MULTIPLIER = float(os.environ.get('POLL_BACKOFF_MULTIPLIER', '2.0'))
+POLL_JITTER_RATIO = float(os.environ.get('POLL_JITTER_RATIO', '0.2'))
+# Used when no Lambda context is available to derive a deadline from
+STATEMENT_TIMEOUT_SECONDS = float(os.environ.get('STATEMENT_TIMEOUT_SECONDS', '30'))
+DEADLINE_SAFETY_MARGIN_SECONDS = float(os.environ.get('DEADLINE_SAFETY_MARGIN_SECONDS', '1.0'))
+# Sent with the 503 of a request that ran out of time, its statements were cancelled
+DEADLINE_RETRY_AFTER_SECONDS = int(os.environ.get('DEADLINE_RETRY_AFTER_SECONDS', '5'))
+
+_connection_cache = {
+    'credentials': None,
+    'credentials_expire_at': 0,
+    'secret': None,
+    'secret_expire_at': 0,
+    'redshift_client': None,
+}
+
+cache_stats = {
+    'credentials_hits': 0,
+    'credentials_misses': 0,
+    'secret_hits': 0,
+    'secret_misses': 0,
+    'client_hits': 0,
+    'client_misses': 0,
+    'forced_refreshes': 0,
+}
+
+
+def partition_s_no_range(first_s_no, last_s_no, partitions):
+    """Split [first_s_no, last_s_no] into at most partitions contiguous (first, last) ranges"""
+    span = last_s_no - first_s_no + 1
+    partitions = max(1, min(partitions, span))
+    bounds = [first_s_no + span * i // partitions for i in range(partitions + 1)]
+    return [(bounds[i], bounds[i + 1] - 1) for i in range(partitions)]
+
+
+def fetch_partition_pages(redshift_client, statement_id, deadline=None):
+    wait_for_query(redshift_client, statement_id, "Partition query", deadline)
+    return list(iter_result_pages(redshift_client, statement_id))
+
+
+def retrieve_data_parallel(redshift_client, cluster_id, database, schema_name, table_name, secret_arn, partitions, deadline=None, columns=None):
+    """Full export as one statement per s_no range, pages fetched on a thread pool and merged in s_no order"""
+    statement = run_statement(redshift_client, cluster_id, database, secret_arn,
+                              sql_template('display_s_no_range', schema_name, table_name),
+                              query_name="Range query", deadline=deadline)
+    row = redshift_client.get_statement_result(Id=statement.statement_id)['Records'][0]
+    if row[0].get('isNull') or row[1].get('isNull'):
+        return records_response_from_pages([{'ColumnMetadata': [], 'Records': []}])
+
+    ranges = partition_s_no_range(row[0]['longValue'], row[1]['longValue'], partitions)
+    print(f"Parallel scan over {len(ranges)} partitions")
+
+    # Every partition is submitted before any is waited on, Redshift runs them concurrently
+    query = sql_template('list_tools_range', schema_name, table_name, columns)
+    statement_ids = [
+        submit_statement(redshift_client, cluster_id, database, secret_arn, query,
+                         {'first_s_no': first, 'last_s_no': last})
+        for first, last in ranges
+    ]
+
+    from concurrent.futures import ThreadPoolExecutor
+
+    with ThreadPoolExecutor(max_workers=min(PARALLEL_SCAN_MAX_WORKERS, len(statement_ids))) as executor:
+        futures = [
+            executor.submit(fetch_partition_pages, redshift_client, statement_id, deadline)
+            for statement_id in statement_ids
+        ]
+        # Ranges are disjoint and ascending, so partition order is s_no order
+        pages = (page for future in futures for page in future.result())
+        return records_response_from_pages(pages)
+
+
+def retrieve_data(redshift_client, cluster_id, database, schema_name,table_name, secret_arn, limit=None, after_s_no=None, deadline=None, partitions=None, filters=(), sort=DEFAULT_SORT, after_key=None, columns=None, since=None):
     try:
 
         print("Inside retrieve data method. ")
-        # SQL query
+        if (partitions and partitions > 1 and limit is None and after_s_no is None
+                and not filters and sort == DEFAULT_SORT and since is None):
+            return retrieve_data_parallel(redshift_client, cluster_id, database, schema_name, table_name, secret_arn,
+                                          partitions, deadline=deadline, columns=columns)
+
+        # SQL query, keyset pagination on the sort column with s_no as tie breaker
         # query = f"SELECT *, is_display FROM {schema_name}.{table_name};"
-        query = f"SELECT * FROM {schema_name}.{table_name} WHERE is_display = TRUE;"
-        
-        # Execute the query
-        response = redshift_client.execute_statement(
-            ClusterIdentifier=cluster_id,
-            Database=database,
-            SecretArn=secret_arn,
-            Sql=query
-        )
+        sort_column, descending = sort
+        if columns is not None and since is not None:
+            # Tombstones are told apart by is_display, the next watermark comes from last_modified
+            columns = tuple(name for name in READABLE_COLUMNS
+                            if name in columns or name in ('is_display', 'last_modified'))
+        elif columns is not None and sort_column not in columns:
+            # The cursor of the next page needs the sort value of the last row
+            columns = tuple(name for name in READABLE_COLUMNS if name in columns or name == sort_column)
+        parameters = filter_parameters(filters)
+        if since is not None:
+            parameters['since'] = since
+        cursor_shape = None
+        if after_s_no is not None:
+            parameters['after_s_no'] = after_s_no
+            cursor_shape = 's_no'
+            if sort_column != 's_no':
+                # The Data API rejects empty parameter values, '' is written inline
+                cursor_shape = 'key' if after_key else 'empty_key'
+                if after_key:
+                    parameters['after_key'] = after_key
+
+        # One extra row tells us whether there is a next page
+        query = list_tools_template(schema_name, table_name, filter_shape(filters), sort_column, descending,
+                                    cursor_shape, limit + 1 if limit is not None else None, columns,
+                                    since is not None)
         
-        # Get query result
-        statement_id = response['Id']
-        all_records = []
-        
-        # Wait for query completion
-        while True:
-            status_response = redshift_client.describe_statement(Id=statement_id)
-            status = status_response['Status']
-            print(f"Query Status: {status}")
-            
-            if status == 'FINISHED':
-                # Get initial results
-                result = redshift_client.get_statement_result(Id=statement_id)
-                
-                # Get column names once
-                columns = [meta['name'] for meta in result['ColumnMetadata']]
-                print(f"Columns: {columns}")
-
-                # Add this debug information
-                print("Column Metadata details:")
-                for meta in result['ColumnMetadata']:
-                    print(f"Column: {meta['name']}, Type: {meta.get('typeName')}")
-                
-                # Process all pages of results
-                while True:
-                    # Process current page
-                    for row in result['Records']:
-                        record = {}
-                        for i, value in enumerate(row):
-                            # Handle different data types
-                            if 'stringValue' in value:
-                                record[columns[i]] = value['stringValue']
-                            elif 'longValue' in value:
-                                record[columns[i]] = value['longValue']
-                            elif 'doubleValue' in value:
-                                record[columns[i]] = value['doubleValue']
-                            elif 'booleanValue' in value:  # Add this case
-                                record[columns[i]] = value['booleanValue']
-                            elif 'isNull' in value:
-                                record[columns[i]] = None
-                        all_records.append(record)
-                    
-                    # Check if there are more pages
-                    if 'NextToken' in result:
-                        # Get next page
-                        result = redshift_client.get_statement_result(
-                            Id=statement_id,
-                            NextToken=result['NextToken']
-                        )
-                    else:
-                        break
-                
-                print(f"Total records retrieved: {len(all_records)}")
-                
-                # Convert to JSON and format it nicely
-                formatted_json = json.dumps(
-                    {
-                        'total_count': len(all_records),
-                        'records': all_records
-                    },
-                    indent=2
-                )
-                
-                print("Full JSON output:")
-                print(formatted_json)
-                
-                return {
-                    'statusCode': 200,
-                    'body': formatted_json,
-                    'headers': {
-                        'Content-Type': 'application/json'
-                    }
-                }
-                
-            elif status in ['FAILED', 'ABORTED']:
-                error_message = f"Query failed: {status_response.get('Error', 'Unknown error')}"
-                print(error_message)
-                raise Exception(error_message)
-            
-            time.sleep(1)  # Wait before checking again
+        # Execute the query and wait for completion
+        statement = run_statement(redshift_client, cluster_id, database, secret_arn, query,
+                                  deadline=deadline, parameters=parameters)
+
+        return build_records_response(redshift_client, statement.statement_id, limit,
+                                      sort_column=None if sort_column == 's_no' else sort_column,
+                                      watermark=since)
 
     except Exception as e:
+        if is_auth_error(e) or is_retry_later_error(e):
+            raise
         error_message = f"Error: {str(e)}"
         print(error_message)
         return {
@@ -134,6 +344,459 @@ def retrieve_data(redshift_client, cluster_id, database, schema_name,table_name,
 
 
 
+# Data API field that carries the value for each Redshift column type
+VALUE_FIELD_BY_TYPE = {
+    'int2': 'longValue',
+    'int4': 'longValue',
+    'int8': 'longValue',
+    'float4': 'doubleValue',
+    'float8': 'doubleValue',
+    'bool': 'booleanValue',
+    'varchar': 'stringValue',
+    'bpchar': 'stringValue',
+    'char': 'stringValue',
+    'text': 'stringValue',
+    'numeric': 'stringValue',
+    'date': 'stringValue',
+    'time': 'stringValue',
+    'timetz': 'stringValue',
+    'timestamp': 'stringValue',
+    'timestamptz': 'stringValue',
+    'super': 'stringValue',
+}
+
+
+def decode_cell(value):
+    # Fallback for column types without a fixed extractor
+    if 'stringValue' in value:
+        return value['stringValue']
+    elif 'longValue' in value:
+        return value['longValue']
+    elif 'doubleValue' in value:
+        return value['doubleValue']
+    elif 'booleanValue' in value:
+        return value['booleanValue']
+    return None
+
+
+def build_row_decoder(column_metadata, as_dict=True):
+    """Build a decoder for one result set, with a fixed extractor per column typeName"""
+    names = tuple(meta['name'] for meta in column_metadata)
+    fields = tuple(VALUE_FIELD_BY_TYPE.get(meta.get('typeName')) for meta in column_metadata)
+
+    if all(fields):
+        # dict.get(cell, field): a NULL cell ({'isNull': True}) has no value field and yields None
+        def values(row):
+            return map(dict.get, row, fields)
+    else:
+        import operator
+
+        getters = tuple(operator.methodcaller('get', field) if field else decode_cell for field in fields)
+
+        def values(row):
+            return [getter(cell) for getter, cell in zip(getters, row)]
+
+    if as_dict:
+        return lambda row: dict(zip(names, values(row)))
+    return lambda row: tuple(values(row))
+
+
+# Compact separators: the list responses are never read by humans
+COMPACT_JSON_ENCODER = json.JSONEncoder(separators=(',', ':'), default=str)
+
+# Table version behind the catalog ETags, read from the rows' last_modified.
+# Writes set it to SYSDATE, not GETDATE(), whose whole seconds would leave two
+# updates within the same second with the same version.
+TABLE_VERSION_CACHE_TTL_SECONDS = float(os.environ.get('TABLE_VERSION_CACHE_TTL_SECONDS', '2'))
+
+_table_version_cache = {}
+
+DEFAULT_PAGE_LIMIT = int(os.environ.get('DEFAULT_PAGE_LIMIT', '0'))  # 0 = no limit
+MAX_PAGE_LIMIT = int(os.environ.get('MAX_PAGE_LIMIT', '1000'))
+
+# Full exports can be split into s_no ranges read in parallel. Overridden per
+# request with ?parallel=N, 0 / 1 = one serial statement.
+PARALLEL_SCAN_PARTITIONS = int(os.environ.get('PARALLEL_SCAN_PARTITIONS', '0'))
+PARALLEL_SCAN_MAX_PARTITIONS = int(os.environ.get('PARALLEL_SCAN_MAX_PARTITIONS', '16'))
+PARALLEL_SCAN_MAX_WORKERS = int(os.environ.get('PARALLEL_SCAN_MAX_WORKERS', '8'))
+
+
+def encode_cursor(last_s_no, sort_key=None):
+    cursor = {'s_no': last_s_no}
+    if sort_key is not None:
+        cursor['k'] = sort_key
+    payload = json.dumps(cursor, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(payload).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return (s_no, sort_key) from a cursor, sort_key is None for s_no ordered pages"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        sort_key = payload.get('k')
+        if sort_key is not None and not isinstance(sort_key, str):
+            raise TypeError("cursor sort key must be a string")
+        return int(payload['s_no']), sort_key
+    except (ValueError, KeyError, TypeError, AttributeError):
+        raise ValueError("Invalid cursor")
+
+
+def parse_filter_params(query_parameters):
+    """Return the allowlisted filters of a read as ((column, operator, values), ...)"""
+    filters = []
+    for name, value in sorted(query_parameters.items()):
+        if name in READ_CONTROL_PARAMETERS:
+            continue
+        column, _, operator = name.partition('__')
+        if column not in TABLE_COLUMNS:
+            # Unrelated parameters (cache busters and the like) are ignored
+            continue
+        if column not in FILTER_COLUMNS:
+            raise ValueError(f"Filtering on {column} is not supported")
+        if operator and operator not in FILTER_OPERATORS:
+            raise ValueError(f"Unsupported filter operator: {operator}")
+
+        values = [v.strip() for v in value.split(',')] if operator == 'in' else [value]
+        if not all(values):
+            raise ValueError(f"{name} cannot be empty")
+        if len(values) > MAX_FILTER_IN_VALUES:
+            raise ValueError(f"{name} accepts at most {MAX_FILTER_IN_VALUES} values")
+        filters.append((column, operator or 'eq', tuple(values)))
+    return tuple(filters)
+
+
+def parse_fields_param(query_parameters, default=None):
+    """Return the projected columns in table order, None for every column"""
+    fields = query_parameters.get('fields')
+    if not fields:
+        return default
+    if fields == 'all':
+        return None
+    if fields == 'summary':
+        return SUMMARY_FIELDS
+
+    requested = {name.strip() for name in fields.split(',')}
+    unknown = sorted(requested - set(READABLE_COLUMNS))
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    # s_no identifies the record and drives the cursor, it is always returned
+    requested.add('s_no')
+    return tuple(name for name in READABLE_COLUMNS if name in requested)
+
+
+def select_list(columns):
+    return '*' if columns is None else ', '.join(columns)
+
+
+def parse_since_param(query_parameters):
+    """Return the since watermark as a UTC 'YYYY-MM-DD HH:MM:SS.ffffff' string, None without one"""
+    since = query_parameters.get('since')
+    if not since:
+        return None
+    try:
+        watermark = datetime.datetime.fromisoformat(since.strip().replace('Z', '+00:00'))
+    except ValueError:
+        raise ValueError("since must be an ISO 8601 timestamp")
+    if watermark.tzinfo is not None:
+        # last_modified holds SYSDATE, which is UTC without a zone
+        watermark = watermark.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return watermark.strftime('%Y-%m-%d %H:%M:%S.%f')
+
+
+def parse_sort_param(query_parameters):
+    sort = query_parameters.get('sort')
+    if not sort:
+        return DEFAULT_SORT
+    descending = sort.startswith('-')
+    column = sort.lstrip('-')
+    if column not in SORT_COLUMNS:
+        raise ValueError(f"sort must be one of: {', '.join(SORT_COLUMNS)}")
+    return column, descending
+
+
+def filter_shape(filters):
+    # What the SQL text depends on: columns, operators and IN list lengths
+    return tuple((column, operator, len(values)) for column, operator, values in filters)
+
+
+def filter_parameters(filters):
+    parameters = {}
+    for index, (column, operator, values) in enumerate(filters):
+        if operator == 'in':
+            for value_index, value in enumerate(values):
+                parameters[f"f{index}_{value_index}"] = value
+        elif operator == 'prefix':
+            escaped = values[0].replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+            parameters[f"f{index}"] = escaped + '%'
+        else:
+            parameters[f"f{index}"] = values[0]
+    return parameters
+
+
+def parse_page_params(query_parameters):
+    """Return (limit, after_s_no, after_key) from the limit / cursor query parameters"""
+    limit = DEFAULT_PAGE_LIMIT or None
+    if query_parameters.get('limit'):
+        try:
+            limit = int(query_parameters['limit'])
+        except ValueError:
+            raise ValueError("limit must be an integer")
+        if limit < 1:
+            raise ValueError("limit must be a positive integer")
+
+    after_s_no = None
+    after_key = None
+    if query_parameters.get('cursor'):
+        after_s_no, after_key = decode_cursor(query_parameters['cursor'])
+        if limit is None:
+            limit = MAX_PAGE_LIMIT
+
+    if limit is not None:
+        limit = min(limit, MAX_PAGE_LIMIT)
+    return limit, after_s_no, after_key
+
+
+def parse_partitions_param(query_parameters):
+    partitions = PARALLEL_SCAN_PARTITIONS
+    if query_parameters.get('parallel'):
+        try:
+            partitions = int(query_parameters['parallel'])
+        except ValueError:
+            raise ValueError("parallel must be an integer")
+        if partitions < 1:
+            raise ValueError("parallel must be a positive integer")
+    return min(partitions, PARALLEL_SCAN_MAX_PARTITIONS)
+
+
+def fetch_result_page(redshift_client, statement_id, next_token=None):
+    record_metric('ResultPages', 1, 'Count')
+    with timed_phase('ResultFetchTime'):
+        if next_token is None:
+            return redshift_client.get_statement_result(Id=statement_id)
+        return redshift_client.get_statement_result(Id=statement_id, NextToken=next_token)
+
+
+def iter_result_pages(redshift_client, statement_id):
+    result = fetch_result_page(redshift_client, statement_id)
+    yield result
+    while 'NextToken' in result:
+        result = fetch_result_page(redshift_client, statement_id, result['NextToken'])
+        yield result
+
+
+def build_records_response(redshift_client, statement_id, limit=None, sort_column=None, watermark=None):
+    """Stream result pages straight into a compact JSON body, one record at a time"""
+    return records_response_from_pages(iter_result_pages(redshift_client, statement_id), limit, sort_column,
+                                       watermark)
+
+
+def records_response_from_pages(pages, limit=None, sort_column=None, watermark=None):
+    encode = COMPACT_JSON_ENCODER.encode
+    body = io.StringIO()
+    body.write('{"records":[')
+
+    decode_row = None
+    count = 0
+    last_record = None
+    has_more = False
+
+    for page in pages:
+        if decode_row is None:
+            decode_row = build_row_decoder(page['ColumnMetadata'])
+        rows = page['Records']
+        if limit is not None and count + len(rows) > limit:
+            rows = rows[:limit - count]
+            has_more = True
+
+        # A page at a time, so decode and serialization can be timed apart
+        started = time.perf_counter()
+        records = [decode_row(row) for row in rows]
+        decoded = time.perf_counter()
+        for record in records:
+            if count:
+                body.write(',')
+            body.write(encode(record))
+            count += 1
+        if records:
+            last_record = records[-1]
+        record_metric('DecodeTime', (decoded - started) * 1000)
+        record_metric('SerializeTime', (time.perf_counter() - decoded) * 1000)
+        if has_more:
+            break
+
+    print(f"Total records retrieved: {count}")
+
+    body.write(f'],"total_count":{count}')
+    if limit is not None:
+        next_cursor = None
+        if has_more:
+            # Pages sorted on another column resume from (sort value, s_no)
+            sort_key = (last_record.get(sort_column) or '') if sort_column else None
+            next_cursor = encode_cursor(last_record.get('s_no'), sort_key)
+        body.write(f',"next_cursor":{encode(next_cursor)}')
+    if watermark is not None:
+        # Change feeds are ordered by last_modified, the last row carries the newest change
+        if last_record is not None:
+            watermark = last_record.get('last_modified') or watermark
+        body.write(f',"watermark":{encode(watermark)}')
+    body.write('}')
+
+    return {
+        'statusCode': 200,
+        'body': body.getvalue(),
+        'headers': {
+            'Content-Type': 'application/json'
+        }
+    }
+
+
+
+def get_table_version(redshift_client, cluster_id, database, schema_name, table_name, secret_arn, deadline=None):
+    cache_key = (schema_name, table_name)
+    cached = _table_version_cache.get(cache_key)
+    if cached and time.monotonic() < cached[1]:
+        return cached[0]
+
+    statement = run_statement(redshift_client, cluster_id, database, secret_arn,
+                              sql_template('table_version', schema_name, table_name),
+                              query_name="Version query", deadline=deadline)
+    result = redshift_client.get_statement_result(Id=statement.statement_id)
+    # Every write sets last_modified: creates move the count, updates and soft deletes the sum
+    version = '-'.join(str(next(iter(cell.values()))) for cell in result['Records'][0])
+
+    _table_version_cache[cache_key] = (version, time.monotonic() + TABLE_VERSION_CACHE_TTL_SECONDS)
+    return version
+
+
+def table_written(redshift_client, cluster_id, database, schema_name, table_name, secret_arn):
+    """After a committed write: the version moves with the rows, only the caches are stale"""
+    # Counted per invocation, lambda_handler must not run the request again after this
+    record_metric('CommittedWrites', 1, 'Count')
+    _table_version_cache.pop((schema_name, table_name), None)
+    refresh_tool_summary(redshift_client, cluster_id, database, schema_name, table_name, secret_arn)
+
+
+def committed_writes():
+    """Table writes this invocation has committed so far"""
+    with _metrics_lock:
+        return _invocation_metrics.get('CommittedWrites', (0, 'Count'))[0]
+
+
+# Tool counts by team / status / reuse come from a materialized view, see
+# sql/ddl_create_tables.sql. It auto refreshes; SUMMARY_REFRESH_AFTER_WRITE
+# also submits a refresh after each write from this function.
+SUMMARY_VIEW_NAME = os.environ.get('SUMMARY_VIEW_NAME', 'csp_tools_team_summary')
+SUMMARY_CACHE_TTL_SECONDS = float(os.environ.get('SUMMARY_CACHE_TTL_SECONDS', '60'))
+SUMMARY_REFRESH_AFTER_WRITE = os.environ.get('SUMMARY_REFRESH_AFTER_WRITE', 'false').lower() == 'true'
+
+_summary_cache = {}
+
+
+def refresh_tool_summary(redshift_client, cluster_id, database, schema_name, table_name, secret_arn):
+    _summary_cache.pop((schema_name, table_name), None)
+    if not SUMMARY_REFRESH_AFTER_WRITE:
+        return
+    try:
+        # Fire and forget, Redshift skips a refresh with nothing new
+        submit_statement(redshift_client, cluster_id, database, secret_arn,
+                         sql_template('refresh_tool_summary', schema_name, table_name))
+    except Exception as e:
+        # Not raised even for auth errors, the write before it has committed
+        record_metric('SummaryRefreshFailures', 1, 'Count')
+        print(f"Error refreshing tool summary: {str(e)}")
+
+
+def make_etag(version, raw_path, query_parameters, encoding=None):
+    # Strong ETag: same table version + same request + same encoding => byte-identical body
+    request_key = json.dumps([raw_path, sorted((query_parameters or {}).items())], separators=(',', ':'))
+    if encoding:
+        request_key += f"|{encoding}"
+    digest = hashlib.sha256(f"{version}|{request_key}".encode('utf-8')).hexdigest()[:32]
+    return f'"{digest}"'
+
+
+def etag_matches(event, etag):
+    headers = {k.lower(): v for k, v in (event.get('headers') or {}).items()}
+    if_none_match = headers.get('if-none-match')
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        if candidate == '*' or candidate == etag:
+            return True
+    return False
+
+
+# Read responses above this size are compressed when Accept-Encoding allows it
+COMPRESSION_MIN_BYTES = int(os.environ.get('COMPRESSION_MIN_BYTES', '1024'))
+GZIP_COMPRESSION_LEVEL = int(os.environ.get('GZIP_COMPRESSION_LEVEL', '5'))
+BROTLI_QUALITY = int(os.environ.get('BROTLI_QUALITY', '5'))
+
+
+@functools.lru_cache(maxsize=None)
+def load_brotli():
+    """Return the brotli module, or None when it is not packaged with the function"""
+    try:
+        import brotli
+    except ImportError:
+        # Not part of the Lambda runtime
+        return None
+    return brotli
+
+
+def negotiate_encoding(event):
+    """Return 'br', 'gzip' or None from the request's Accept-Encoding"""
+    headers = {k.lower(): v for k, v in (event.get('headers') or {}).items()}
+    accepted = {}
+    for item in (headers.get('accept-encoding') or '').split(','):
+        name, _, params = item.strip().partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if name:
+            accepted[name.strip().lower()] = quality
+
+    def acceptable(encoding):
+        return accepted.get(encoding, accepted.get('*', 0.0)) > 0
+
+    if acceptable('br') and load_brotli() is not None:
+        return 'br'
+    if acceptable('gzip'):
+        return 'gzip'
+    return None
+
+
+def compress_response(response, encoding):
+    if not encoding or response.get('isBase64Encoded'):
+        return response
+    body = response['body'].encode('utf-8')
+    if len(body) < COMPRESSION_MIN_BYTES:
+        return response
+
+    with timed_phase('CompressTime'):
+        if encoding == 'br':
+            compressed = load_brotli().compress(body, quality=BROTLI_QUALITY)
+        else:
+            import gzip
+
+            # mtime=0 keeps the bytes stable for a given body, which the ETag promises
+            compressed = gzip.compress(body, compresslevel=GZIP_COMPRESSION_LEVEL, mtime=0)
+    print(f"Compressed response {len(body)} -> {len(compressed)} bytes ({encoding})")
+
+    response['body'] = base64.b64encode(compressed).decode('ascii')
+    response['isBase64Encoded'] = True
+    response['headers']['Content-Encoding'] = encoding
+    return response
+
+
+
 def create_redshift_client(access_key, secret_key, session_token, region):
     return boto3.client(
         'redshift-data',
@@ -166,45 +829,110 @@ def get_secret(secret_name, access_key, secret_key, session_token, region):
     return response
 
 
-def check_tool_exists(redshift_client, cluster_id, database, schema_name, table_name, secret_arn, tool_name):
+def invalidate_connection_cache():
+    _connection_cache['credentials'] = None
+    _connection_cache['credentials_expire_at'] = 0
+    _connection_cache['secret'] = None
+    _connection_cache['secret_expire_at'] = 0
+    _connection_cache['redshift_client'] = None
+
+
+def get_redshift_connection(force_refresh=False):
+    """Return cached Redshift connection details, refreshing whatever has expired"""
+    redshift_region = os.environ.get('REDSHIFT_REGION', 'us-east-1')
+    cache = _connection_cache
+
+    if force_refresh:
+        cache_stats['forced_refreshes'] += 1
+        invalidate_connection_cache()
+
+    now = time.time()
+
+    # Assumed-role credentials are refreshed a margin before they expire
+    if cache['credentials'] is None or now >= cache['credentials_expire_at']:
+        cache_stats['credentials_misses'] += 1
+        with timed_phase('AssumeRoleTime'):
+            credentials = assume_role(os.environ['Role_Arn'], "cross_acct_lambda")
+        expiration = credentials.get('Expiration')
+        expire_at = expiration.timestamp() if expiration is not None else now + 3600
+        cache['credentials'] = credentials
+        cache['credentials_expire_at'] = expire_at - CREDENTIAL_REFRESH_MARGIN_SECONDS
+        # The client is bound to the old credentials, so it has to be rebuilt too
+        cache['redshift_client'] = None
+    else:
+        cache_stats['credentials_hits'] += 1
+
+    credentials = cache['credentials']
+    access_key = credentials['AccessKeyId']
+    secret_key = credentials['SecretAccessKey']
+    session_token = credentials['SessionToken']
+
+    if cache['secret'] is None or now >= cache['secret_expire_at']:
+        cache_stats['secret_misses'] += 1
+        with timed_phase('GetSecretTime'):
+            response = get_secret(os.environ["SecretId"], access_key, secret_key, session_token, redshift_region)
+        secret_json = json.loads(response['SecretString'])
+        cache['secret'] = {
+            'secret_arn': response['ARN'],
+            'cluster_id': secret_json['dbClusterIdentifier'],
+            'database': secret_json['dbname'],
+        }
+        cache['secret_expire_at'] = now + SECRET_CACHE_TTL_SECONDS
+    else:
+        cache_stats['secret_hits'] += 1
+
+    if cache['redshift_client'] is None:
+        cache_stats['client_misses'] += 1
+        with timed_phase('ClientCreationTime'):
+            cache['redshift_client'] = create_redshift_client(access_key, secret_key, session_token, redshift_region)
+    else:
+        cache_stats['client_hits'] += 1
+
+    return {
+        'redshift_client': cache['redshift_client'],
+        'cluster_id': cache['secret']['cluster_id'],
+        'database': cache['secret']['database'],
+        'secret_arn': cache['secret']['secret_arn'],
+    }
+
+
+# Connection setup runs in the Lambda init phase, not in the first request
+INIT_PRIME_CONNECTION = os.environ.get('INIT_PRIME_CONNECTION', 'true').lower() == 'true'
+
+
+def prime_connection():
+    """Fill the connection cache ahead of the first request, False if that failed"""
+    try:
+        with timed_phase('InitPrimeTime'):
+            get_redshift_connection()
+        return True
+    except Exception as e:
+        # The first request sets the connection up again, init must not fail over it
+        print(f"Connection priming failed: {str(e)}")
+        return False
+
+
+def is_auth_error(error):
+    # Expired/invalid STS credentials surface as ClientErrors, a rotated
+    # database secret surfaces as a failed statement.
+    if isinstance(error, botocore.exceptions.ClientError):
+        return error.response.get('Error', {}).get('Code') in AUTH_ERROR_CODES
+    return 'password authentication failed' in str(error)
+
+
+def check_tool_exists(redshift_client, cluster_id, database, schema_name, table_name, secret_arn, tool_name, deadline=None):
     try:
         # SQL query to check if tool_name exists
-        query = f"""
-            SELECT EXISTS (
-                SELECT 1 
-                FROM {schema_name}.{table_name} 
-                WHERE tool_name = '{tool_name}'
-            );
-        """
-        
-        # Execute the query
-        response = redshift_client.execute_statement(
-            ClusterIdentifier=cluster_id,
-            Database=database,
-            SecretArn=secret_arn,
-            Sql=query
-        )
+        query = sql_template('check_tool_exists', schema_name, table_name)
         
-        # Get query result
-        statement_id = response['Id']
-        
-        # Wait for query completion
-        while True:
-            status_response = redshift_client.describe_statement(Id=statement_id)
-            status = status_response['Status']
-            
-            if status == 'FINISHED':
-                result = redshift_client.get_statement_result(Id=statement_id)
-                # The result will be a boolean value
-                exists = result['Records'][0][0]['booleanValue']
-                return exists
-                
-            elif status in ['FAILED', 'ABORTED']:
-                error_message = f"Query failed: {status_response.get('Error', 'Unknown error')}"
-                print(error_message)
-                raise Exception(error_message)
-            
-            time.sleep(1)
+        # Execute the query and wait for completion
+        statement = run_statement(redshift_client, cluster_id, database, secret_arn, query,
+                                  deadline=deadline, parameters={'tool_name': tool_name})
+
+        result = redshift_client.get_statement_result(Id=statement.statement_id)
+        # The result will be a boolean value
+        exists = result['Records'][0][0]['booleanValue']
+        return exists
 
     except Exception as e:
         print(f"Error checking tool existence: {str(e)}")
@@ -212,34 +940,260 @@ def check_tool_exists(redshift_client, cluster_id, database, schema_name, table_
 
 
 
-def wait_for_query(redshift_client, statement_id, query_name):
-    """Helper function with detailed waiting logic"""
-    start_time = time.time()
-    timeout = 30  # Reduced timeout for debugging
-    last_status = None
-    
-    while time.time() - start_time < timeout:
-        try:
-            status_response = redshift_client.describe_statement(Id=statement_id)
-            current_status = status_response['Status']
-            
-            if current_status != last_status:
-                print(f"{query_name} status changed to: {current_status}")
-                last_status = current_status
-                
-            if current_status == 'FINISHED':
-                result = redshift_client.get_statement_result(Id=statement_id)
-                return True, result
-            elif current_status in ['FAILED', 'ABORTED']:
-                error = status_response.get('Error', 'No error details')
-                return False, error
-                
-            time.sleep(1)
-        except Exception as e:
-            print(f"Error checking {query_name} status: {str(e)}")
-            return False, str(e)
-    
-    return False, f"Timeout waiting for {query_name}"
+class StatementFailedError(Exception):
+    pass
+
+
+class RetryLaterError(Exception):
+    pass
+
+
+class StatementTimeoutError(RetryLaterError):
+    pass
+
+
+class AllocatorConflictError(RetryLaterError):
+    pass
+
+
+def is_retry_later_error(error):
+    # Answered with a 503 by the handler instead of the route's own 4xx / 500
+    return isinstance(error, RetryLaterError)
+
+
+StatementResult = namedtuple(
+    'StatementResult',
+    ['statement_id', 'status', 'result_rows', 'has_result_set', 'duration_ms', 'sub_statements'],
+)
+
+
+def get_deadline(context):
+    """Monotonic deadline for all statements of one invocation"""
+    if context is None:
+        return time.monotonic() + STATEMENT_TIMEOUT_SECONDS
+    remaining_seconds = context.get_remaining_time_in_millis() / 1000.0
+    return time.monotonic() + remaining_seconds - DEADLINE_SAFETY_MARGIN_SECONDS
+
+
+def wait_for_query(redshift_client, statement_id, query_name="Query", deadline=None, cancel_on_timeout=True):
+    """Poll describe_statement with exponential backoff and jitter until the statement completes"""
+    if deadline is None:
+        deadline = time.monotonic() + STATEMENT_TIMEOUT_SECONDS
+
+    with timed_phase('PollTime'):
+        return poll_statement(redshift_client, statement_id, query_name, deadline, cancel_on_timeout)
+
+
+def cancel_statement(redshift_client, statement_id, query_name="Query"):
+    """Stop a statement nobody waits for anymore, so it does not keep its WLM slot"""
+    try:
+        cancelled = redshift_client.cancel_statement(Id=statement_id).get('Status', False)
+    except Exception as e:
+        # Finished in the meantime, or the cancel itself failed: the timeout is reported either way
+        print(f"Could not cancel {query_name} (statement {statement_id}): {str(e)}")
+        cancelled = False
+    if cancelled:
+        print(f"Cancelled {query_name} (statement {statement_id}) at the deadline")
+        record_metric('StatementCancellations', 1, 'Count')
+    return cancelled
+
+
+def poll_statement(redshift_client, statement_id, query_name, deadline, cancel_on_timeout=True):
+    delay = POLL_INITIAL_DELAY_SECONDS
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            if cancel_on_timeout:
+                cancel_statement(redshift_client, statement_id, query_name)
+            raise StatementTimeoutError(f"Timeout waiting for {query_name} (statement {statement_id})")
+
+        jitter = 1 + random.uniform(-POLL_JITTER_RATIO, POLL_JITTER_RATIO)
+        time.sleep(min(delay * jitter, remaining))
+        delay = min(delay * POLL_BACKOFF_MULTIPLIER, POLL_MAX_DELAY_SECONDS)
+
+        status_response = redshift_client.describe_statement(Id=statement_id)
+        record_metric('PollCount', 1, 'Count')
+        status = status_response['Status']
+
+        if status == 'FINISHED':
+            return StatementResult(
+                statement_id=statement_id,
+                status=status,
+                result_rows=status_response.get('ResultRows', -1),
+                has_result_set=status_response.get('HasResultSet', False),
+                duration_ms=status_response.get('Duration', 0) // 1000000,
+                sub_statements=status_response.get('SubStatements', []),
+            )
+        elif status in ['FAILED', 'ABORTED']:
+            error_message = f"{query_name} failed: {status_response.get('Error', 'Unknown error')}"
+            print(error_message)
+            raise StatementFailedError(error_message)
+
+
+def to_parameter_value(value):
+    # Data API parameters are strings, Redshift casts them to the column type
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    return str(value)
+
+
+def sql_parameters(values):
+    return [{'name': name, 'value': to_parameter_value(value)} for name, value in values.items()]
+
+
+def sql_literal(value):
+    # Inline form of a bound parameter for the batch API: only None is NULL, "NA" and "" are kept as given
+    if value is None:
+        return 'NULL'
+    if isinstance(value, bool):
+        return 'TRUE' if value else 'FALSE'
+    if isinstance(value, int):
+        return str(value)
+    return sql_string_literal(to_parameter_value(value))
+
+
+def submit_statement(redshift_client, cluster_id, database, secret_arn, sql, parameters=None):
+    """Submit one statement through the Data API without waiting for it"""
+    request = {
+        'ClusterIdentifier': cluster_id,
+        'Database': database,
+        'SecretArn': secret_arn,
+        'Sql': sql,
+    }
+    if parameters:
+        request['Parameters'] = sql_parameters(parameters)
+    record_metric('StatementCount', 1, 'Count')
+    with timed_phase('SubmitTime'):
+        return redshift_client.execute_statement(**request)['Id']
+
+
+def run_statement(redshift_client, cluster_id, database, secret_arn, sql, query_name="Query", deadline=None, parameters=None):
+    """Submit one statement through the Data API and wait for it to finish"""
+    statement_id = submit_statement(redshift_client, cluster_id, database, secret_arn, sql, parameters)
+    return wait_for_query(redshift_client, statement_id, query_name, deadline)
+
+
+
+# Stable SQL text with :name placeholders, values travel in Parameters. The same
+# text for every value lets Redshift reuse the compiled plan and result cache.
+SQL_TEMPLATES = {
+    'check_tool_exists': "SELECT EXISTS (SELECT 1 FROM {table} WHERE tool_name = :tool_name);",
+    'get_tool_by_s_no': "SELECT {columns} FROM {table} WHERE s_no = :s_no AND is_display = TRUE;",
+    'display_s_no_range': "SELECT MIN(s_no), MAX(s_no) FROM {table} WHERE is_display = TRUE;",
+    'list_tools_range': (
+        "SELECT {columns} FROM {table} WHERE is_display = TRUE AND s_no BETWEEN :first_s_no AND :last_s_no ORDER BY s_no;"
+    ),
+    'soft_delete_tool': "UPDATE {table} SET is_display = FALSE, last_modified = SYSDATE WHERE s_no = :s_no;",
+    'table_version': (
+        "SELECT COUNT(*), MAX(last_modified), SUM(DATEDIFF(microsecond, '2000-01-01', last_modified)) FROM {table};"
+    ),
+    'tool_summary': (
+        "SELECT team_name, active_inactive, can_be_reused_across_csp_teams, tool_count "
+        "FROM {schema}.{summary_view};"
+    ),
+    'refresh_tool_summary': "REFRESH MATERIALIZED VIEW {schema}.{summary_view};",
+    'save_idempotent_response': (
+        "UPDATE {schema}.{idempotency_table} SET status_code = :status_code, response_body = :response_body "
+        "WHERE idempotency_key = :idempotency_key AND table_name = :table_name AND status_code = {pending_status};"
+    ),
+    'release_idempotency_key': (
+        "DELETE FROM {schema}.{idempotency_table} "
+        "WHERE idempotency_key = :idempotency_key AND table_name = :table_name AND status_code = {pending_status};"
+    ),
+}
+
+
+@functools.lru_cache(maxsize=None)
+def sql_template(name, schema_name, table_name, columns=None):
+    return SQL_TEMPLATES[name].format(
+        columns=select_list(columns),
+        table=f"{schema_name}.{table_name}",
+        schema=schema_name,
+        summary_view=SUMMARY_VIEW_NAME,
+        idempotency_table=IDEMPOTENCY_TABLE_NAME,
+        pending_status=IDEMPOTENCY_PENDING_STATUS,
+    )
+
+
+def is_null_value(value):
+    # Same NULL rules as escape_sql_value
+    return value is None or value == "NA" or value == ""
+
+
+@functools.lru_cache(maxsize=256)
+def insert_template(schema_name, table_name, columns, null_columns):
+    values = ", ".join("NULL" if name in null_columns else f":{name}" for name in columns)
+    return (f"INSERT INTO {schema_name}.{table_name} (s_no, {', '.join(columns)}, last_modified) "
+            f"VALUES (:s_no, {values}, SYSDATE);")
+
+
+@functools.lru_cache(maxsize=256)
+def batch_insert_template(schema_name, table_name, columns, null_cells):
+    # null_cells holds one tuple of NULL columns per row
+    rows = []
+    for row_index, null_columns in enumerate(null_cells):
+        values = ", ".join(
+            "NULL" if name in null_columns else f":r{row_index}_{name}"
+            for name in columns
+        )
+        rows.append(f"(:r{row_index}_s_no, {values}, SYSDATE)")
+    return (f"INSERT INTO {schema_name}.{table_name} (s_no, {', '.join(columns)}, last_modified) VALUES\n"
+            + ",\n".join(rows) + ";")
+
+
+@functools.lru_cache(maxsize=256)
+def update_template(schema_name, table_name, columns, null_columns, empty_columns=()):
+    # The Data API rejects empty parameter values, so '' is written inline
+    set_clause = ", ".join(
+        f"{name} = NULL" if name in null_columns
+        else f"{name} = ''" if name in empty_columns
+        else f"{name} = :{name}"
+        for name in columns
+    )
+    return f"UPDATE {schema_name}.{table_name} SET {set_clause}, last_modified = SYSDATE WHERE s_no = :s_no;"
+
+
+@functools.lru_cache(maxsize=256)
+def list_tools_template(schema_name, table_name, filter_shape, sort_column, descending, cursor_shape, limit, columns=None, since=False):
+    """SELECT for a getTools read, see filter_shape / filter_parameters for the :f placeholders"""
+    if since:
+        # Soft deleted rows stay in a change feed as tombstones
+        conditions = [f"last_modified > DATEADD(second, -{CHANGE_FEED_OVERLAP_SECONDS}, CAST(:since AS TIMESTAMP))"]
+    else:
+        conditions = ["is_display = TRUE"]
+    for index, (column, operator, count) in enumerate(filter_shape):
+        if operator == 'in':
+            conditions.append(f"{column} IN ({', '.join(f':f{index}_{i}' for i in range(count))})")
+        elif operator == 'prefix':
+            conditions.append(f"{column} ILIKE :f{index}")
+        else:
+            conditions.append(f"{column} = :f{index}")
+
+    # NULLs sort as '' so the keyset comparison below never meets a NULL. The
+    # since condition already leaves out rows without a last_modified.
+    if sort_column in ('s_no', 'last_modified'):
+        sort_expression = sort_column
+    else:
+        sort_expression = f"COALESCE({sort_column}, '')"
+    comparison = '<' if descending else '>'
+    if cursor_shape == 's_no':
+        conditions.append(f"s_no {comparison} :after_s_no")
+    elif cursor_shape:
+        key = ":after_key" if cursor_shape == 'key' else "''"
+        if sort_column == 'last_modified':
+            key = f"CAST({key} AS TIMESTAMP)"
+        conditions.append(
+            f"({sort_expression} {comparison} {key} OR ({sort_expression} = {key} AND s_no > :after_s_no))"
+        )
+
+    query = f"SELECT {select_list(columns)} FROM {schema_name}.{table_name} WHERE {' AND '.join(conditions)}"
+    query += f" ORDER BY {sort_expression}{' DESC' if descending else ''}"
+    if sort_column != 's_no':
+        query += ", s_no"
+    # limit stays inline: Redshift does not accept a parameter in LIMIT
+    if limit is not None:
+        query += f" LIMIT {int(limit)}"
+    return query + ";"
 
 
 
@@ -251,83 +1205,133 @@ def escape_sql_value(value):
     elif isinstance(value, (int, float)):
         return str(value)
     elif isinstance(value, str):
-        return "'" + value.replace("'", "''") + "'"
+        return sql_string_literal(value)
     else:
         return str(value)  # fallback for other types
 
-def insert_tool_data(redshift_client, cluster_id, database, schema_name, table_name, secret_arn, request_body):
-    try:
-        # Prepare the column names and properly escaped values
-        columns = list(request_body.keys())
-        values = [escape_sql_value(value) for value in request_body.values()]
-        values_str = ", ".join(values)
-
-        # Transaction with separate INSERT and SELECT queries
-        insert_query = f"""
-BEGIN;
-LOCK TABLE {schema_name}.{table_name} IN EXCLUSIVE MODE;
-INSERT INTO {schema_name}.{table_name} (s_no, {", ".join(columns)})
-SELECT COALESCE(MAX(s_no), 0) + 1, {values_str}
-FROM {schema_name}.{table_name};
-COMMIT;
-"""
 
-        # First execute the INSERT transaction
-        print(f"Insert Query: {insert_query}")
-        insert_response = redshift_client.execute_statement(
-            ClusterIdentifier=cluster_id,
-            Database=database,
-            SecretArn=secret_arn,
-            Sql=insert_query
-        )
-        
-        # Wait for INSERT to complete
-        insert_statement_id = insert_response["Id"]
-        while True:
-            status_response = redshift_client.describe_statement(Id=insert_statement_id)
-            status = status_response["Status"]
-            
-            if status == "FINISHED":
-                break
-            elif status in ["FAILED", "ABORTED"]:
-                error_message = f"Insert query failed: {status_response.get('Error', 'Unknown error')}"
-                print(error_message)
-                return False, None, error_message
-            time.sleep(1)
-
-        # Now execute a separate SELECT to get the max s_no
-        select_query = f"SELECT MAX(s_no) FROM {schema_name}.{table_name};"
-        print(f"Select Query: {select_query}")
-        select_response = redshift_client.execute_statement(
+def sql_string_literal(text):
+    # Redshift reads a backslash inside a literal as an escape, so it is doubled along with quotes
+    return "'" + text.replace('\\', '\\\\').replace("'", "''") + "'"
+
+# s_no values come from a small counter table instead of MAX(s_no) under an
+# exclusive lock. Each Lambda instance reserves a block of S_NO_BLOCK_SIZE ids
+# and hands them out locally, so most creates are a single INSERT. Ids left in
+# a block when an instance is recycled are never used (gaps are expected).
+ID_ALLOCATOR_TABLE_NAME = os.environ.get('ID_ALLOCATOR_TABLE_NAME', 'csp_tools_id_allocator')
+S_NO_BLOCK_SIZE = int(os.environ.get('S_NO_BLOCK_SIZE', '20'))
+# Concurrent reservations of the one counter row can abort on serializable isolation
+ALLOCATOR_MAX_ATTEMPTS = int(os.environ.get('ALLOCATOR_MAX_ATTEMPTS', '3'))
+ALLOCATOR_RETRY_DELAY_SECONDS = float(os.environ.get('ALLOCATOR_RETRY_DELAY_SECONDS', '0.1'))
+
+_s_no_pool = {}
+_s_no_pool_lock = threading.Lock()
+
+
+def run_batch_statement(redshift_client, cluster_id, database, secret_arn, sqls, query_name="Batch", deadline=None):
+    """Submit several statements as one transaction and wait for them to finish"""
+    record_metric('StatementCount', 1, 'Count')
+    with timed_phase('SubmitTime'):
+        response = redshift_client.batch_execute_statement(
             ClusterIdentifier=cluster_id,
             Database=database,
             SecretArn=secret_arn,
-            Sql=select_query
+            Sqls=sqls
         )
-        
-        # Wait for SELECT to complete
-        select_statement_id = select_response["Id"]
-        while True:
-            status_response = redshift_client.describe_statement(Id=select_statement_id)
-            status = status_response["Status"]
-            
-            if status == "FINISHED":
-                try:
-                    result = redshift_client.get_statement_result(Id=select_statement_id)
-                    if result.get('Records') and len(result['Records']) > 0:
-                        new_s_no = int(result['Records'][0][0]['longValue'])
-                        return True, new_s_no, None
-                    else:
-                        return False, None, "Table is empty after insert"
-                except Exception as e:
-                    return False, None, f"Failed to get result: {str(e)}"
-            elif status in ["FAILED", "ABORTED"]:
-                error_message = f"Select query failed: {status_response.get('Error', 'Unknown error')}"
-                print(error_message)
-                return False, None, error_message
-            time.sleep(1)
+    return wait_for_query(redshift_client, response['Id'], query_name, deadline)
+
+
+def reserve_s_no_block(redshift_client, cluster_id, database, schema_name, table_name, secret_arn, count, deadline=None):
+    """Atomically reserve count ids from the allocator table, returns the first one"""
+    allocator = f"{schema_name}.{ID_ALLOCATOR_TABLE_NAME}"
+    for attempt in range(1, ALLOCATOR_MAX_ATTEMPTS + 1):
+        try:
+            statement = run_batch_statement(
+                redshift_client, cluster_id, database, secret_arn,
+                [
+                    f"UPDATE {allocator} SET next_s_no = next_s_no + {int(count)} WHERE table_name = '{table_name}';",
+                    f"SELECT next_s_no - {int(count)} FROM {allocator} WHERE table_name = '{table_name}';",
+                ],
+                query_name="s_no reservation", deadline=deadline,
+            )
+            break
+        except StatementFailedError as e:
+            if is_auth_error(e):
+                raise
+            record_metric('AllocatorConflicts', 1, 'Count')
+            if attempt == ALLOCATOR_MAX_ATTEMPTS:
+                # Not the request's fault, the handler answers 503 and the client retries
+                raise AllocatorConflictError(f"Could not reserve s_no values: {str(e)}")
+            time.sleep(ALLOCATOR_RETRY_DELAY_SECONDS * attempt * random.uniform(0.5, 1.5))
+    # Results of a batch are read per sub-statement, "<id>:<n>"
+    result = redshift_client.get_statement_result(Id=f"{statement.statement_id}:2")
+    if not result['Records']:
+        raise Exception(f"No allocator row for table {table_name}")
+    return int(result['Records'][0][0]['longValue'])
+
+
+def advance_allocator_template(schema_name, table_name, last_s_no=None):
+    """UPDATE moving next_s_no past ids loaded as they are: past last_s_no, or past MAX(s_no) of the table"""
+    allocator = f"{schema_name}.{ID_ALLOCATOR_TABLE_NAME}"
+    if last_s_no is not None:
+        return (f"UPDATE {allocator} SET next_s_no = GREATEST(next_s_no, {int(last_s_no) + 1}) "
+                f"WHERE table_name = '{table_name}';")
+    return (f"UPDATE {allocator} SET next_s_no = GREATEST(next_s_no, loaded.after_max) "
+            f"FROM (SELECT COALESCE(MAX(s_no), 0) + 1 AS after_max FROM {schema_name}.{table_name}) loaded "
+            f"WHERE {allocator}.table_name = '{table_name}';")
+
+
+def allocate_s_no(redshift_client, cluster_id, database, schema_name, table_name, secret_arn, count=1, deadline=None):
+    """Return the first of count contiguous new s_no values"""
+    key = (schema_name, table_name)
+    # Held across the refill so concurrent callers wait for one reservation
+    # instead of each reserving a block of their own
+    with _s_no_pool_lock:
+        next_s_no, end = _s_no_pool.get(key, (0, 0))
+        if end - next_s_no >= count:
+            _s_no_pool[key] = (next_s_no + count, end)
+            return next_s_no
+
+        # Reserve this request's ids plus a fresh block for the next creates
+        reserve = count + S_NO_BLOCK_SIZE
+        first = reserve_s_no_block(redshift_client, cluster_id, database, schema_name, table_name, secret_arn,
+                                   reserve, deadline=deadline)
+        _s_no_pool[key] = (first + count, first + reserve)
+        return first
+
+
+def insert_tool_data(redshift_client, cluster_id, database, schema_name, table_name, secret_arn, request_body, deadline=None):
+    try:
+        # Column names go into the SQL text, so only known columns are accepted
+        error_message = validate_tool_item(request_body)
+        if error_message:
+            return False, None, error_message
+
+        # Values are passed as parameters
+        columns = tuple(request_body)
+        null_columns = tuple(name for name, value in request_body.items() if is_null_value(value))
+        parameters = {name: value for name, value in request_body.items() if not is_null_value(value)}
+
+        new_s_no = allocate_s_no(redshift_client, cluster_id, database, schema_name, table_name, secret_arn,
+                                 deadline=deadline)
+        parameters['s_no'] = new_s_no
+
+        # The s_no is known up front: no table lock, no MAX(s_no) scan, no SELECT afterwards
+        insert_query = insert_template(schema_name, table_name, columns, null_columns)
+
+        log_debug(f"Insert Query: {insert_query}")
+        try:
+            run_statement(redshift_client, cluster_id, database, secret_arn, insert_query,
+                          query_name="Insert query", deadline=deadline, parameters=parameters)
+        except StatementFailedError as e:
+            return False, None, str(e)
+        table_written(redshift_client, cluster_id, database, schema_name, table_name, secret_arn)
+
+        return True, new_s_no, None
             
     except Exception as e:
+        if is_auth_error(e) or is_retry_later_error(e):
+            raise
         error_message = f"Unexpected error: {str(e)}"
         print(f"Error in insert_tool_data: {error_message}")
         return False, None, error_message
@@ -335,146 +1339,502 @@ COMMIT;
 
 
 
-def check_And_Insert(redshift_client, cluster_id, database, schema_name,table_name, secret_arn, tool_exists, tool_name, request_body):
+def validate_tool_item(item):
+    """Return an error message for an invalid create payload, None if it can be inserted"""
+    if not isinstance(item, dict):
+        return "Each tool must be a JSON object"
+    if not item.get('tool_name'):
+        return "tool_name is required"
+    if 's_no' in item:
+        return "s_no is assigned by the service and cannot be provided"
+    unknown = sorted(set(item) - set(TABLE_COLUMNS))
+    if unknown:
+        return f"Unknown columns: {', '.join(unknown)}"
+    return None
+
 
+def values_insert_sqls(insert_prefix, values_rows):
+    """Multi-row INSERTs of rendered rows, each under BATCH_SQL_MAX_BYTES"""
+    sqls = []
+    chunk = []
+    chunk_bytes = len(insert_prefix)
+    for row in values_rows:
+        row_bytes = len(row.encode('utf-8')) + 2
+        if chunk and chunk_bytes + row_bytes > BATCH_SQL_MAX_BYTES:
+            sqls.append(insert_prefix + ",\n".join(chunk) + ";")
+            chunk = []
+            chunk_bytes = len(insert_prefix)
+        chunk.append(row)
+        chunk_bytes += row_bytes
+    if chunk:
+        sqls.append(insert_prefix + ",\n".join(chunk) + ";")
+    return sqls
+
+
+def insert_tools_batch(redshift_client, cluster_id, database, schema_name, table_name, secret_arn, tools, deadline=None, s_nos=None):
+    """Insert validated tools with one multi-row INSERT, returns (success, first_s_no, error_message)
+
+    s_nos, when given, are the already allocated s_no values of the tools.
+    """
     try:
+        columns = [name for name in TABLE_COLUMNS if name != 's_no' and any(name in tool for tool in tools)]
+
+        if s_nos is None:
+            # One contiguous block of s_no values for the whole batch
+            first_s_no = allocate_s_no(redshift_client, cluster_id, database, schema_name, table_name, secret_arn,
+                                       count=len(tools), deadline=deadline)
+            s_nos = range(first_s_no, first_s_no + len(tools))
+        first_s_no = s_nos[0]
+
+        parameters = {}
+        null_cells = []
+        for offset, tool in enumerate(tools):
+            parameters[f"r{offset}_s_no"] = s_nos[offset]
+            null_columns = []
+            for name in columns:
+                value = tool.get(name)
+                if is_null_value(value):
+                    null_columns.append(name)
+                else:
+                    parameters[f"r{offset}_{name}"] = value
+            null_cells.append(tuple(null_columns))
 
-        if tool_exists:
-            return {
-                "statusCode": 400,
-                "body": json.dumps(
-                    {
-                        "message": f'Tool name "{tool_name}" already exists in database',
-                        "exists": True,
-                    }
-                ),
-                "headers": {"Content-Type": "application/json"},
-            }
-        else:
-            # If tool doesn't exist, proceed with insertion
-            # redshift_client, cluster_id, database, schema_name, table_name, secret_arn, tool_data
-            insert_success = insert_tool_data(
-                redshift_client,
-                cluster_id,
-                database,
-                schema_name,
-                table_name,
-                secret_arn,
-                request_body,  # Passing the entire request body as tool data
-            )
-        
-            if insert_success:
-                return {
-                    "statusCode": 201,
-                    "body": json.dumps(
-                        {
-                            "message": f'Tool "{tool_name}" successfully inserted',
-                            "tool_data": request_body,
-                        }
-                    ),
-                    "headers": {"Content-Type": "application/json"},
-                }
+        # Upper bound of the template size, estimated before building (and caching) it
+        placeholder = f":r{len(tools) - 1}_"
+        row_bytes = (len(placeholder) + len("(s_no, SYSDATE),\n")
+                     + sum(len(placeholder) + len(name) + 2 for name in columns))
+        template_bytes = len(schema_name) + len(table_name) + sum(len(name) + 2 for name in columns) + 64
+
+        try:
+            if template_bytes + len(tools) * row_bytes <= BATCH_SQL_MAX_BYTES:
+                insert_query = batch_insert_template(schema_name, table_name, tuple(columns), tuple(null_cells))
+                print(f"Batch insert of {len(tools)} tools")
+                run_statement(redshift_client, cluster_id, database, secret_arn, insert_query,
+                              query_name="Batch insert query", deadline=deadline, parameters=parameters)
             else:
-                return {
-                    "statusCode": 500,
-                    "body": json.dumps({"error": "Failed to insert tool data"}),
-                    "headers": {"Content-Type": "application/json"},
-                }
+                # The placeholders alone pass the 100 KB statement limit: literal INSERTs split by size,
+                # still one transaction. The batch API takes no Parameters.
+                insert_prefix = (f"INSERT INTO {schema_name}.{table_name} "
+                                 f"(s_no, {', '.join(columns)}, last_modified) VALUES\n")
+                values_rows = [
+                    "(" + ", ".join([str(int(s_nos[offset]))] + [
+                        'NULL' if is_null_value(tool.get(name)) else sql_literal(tool.get(name)) for name in columns
+                    ]) + ", SYSDATE)"
+                    for offset, tool in enumerate(tools)
+                ]
+                sqls = values_insert_sqls(insert_prefix, values_rows)
+                if len(sqls) > DATA_API_MAX_BATCH_SQLS:
+                    raise ValueError("Create payload is too large for one request")
+                print(f"Batch insert of {len(tools)} tools in {len(sqls)} statements")
+                run_batch_statement(redshift_client, cluster_id, database, secret_arn, sqls,
+                                    query_name="Batch insert query", deadline=deadline)
+        except StatementFailedError as e:
+            return False, None, str(e)
+        table_written(redshift_client, cluster_id, database, schema_name, table_name, secret_arn)
+
+        return True, first_s_no, None
 
     except Exception as e:
-        print(f"Error: {str(e)}")
-        import traceback
-        print(f"Traceback: {traceback.format_exc()}")
+        if is_auth_error(e) or is_retry_later_error(e):
+            raise
+        error_message = f"Unexpected error: {str(e)}"
+        print(f"Error in insert_tools_batch: {error_message}")
+        return False, None, error_message
+
+
+def create_tools_batch(redshift_client, cluster_id, database, schema_name, table_name, secret_arn, request_body, deadline=None):
+    # Accept either a bare array or {"tools": [...]}
+    tools = request_body.get('tools') if isinstance(request_body, dict) else request_body
+    if not isinstance(tools, list) or not tools:
         return {
-            'statusCode': 500,
-            'body': json.dumps({
-                'error': str(e)
-            }),
-            'headers': {
-                'Content-Type': 'application/json'
-            }
+            'statusCode': 400,
+            'body': json.dumps({'error': 'Request body must be a non-empty array of tools'}),
+            'headers': {'Content-Type': 'application/json'}
+        }
+    if len(tools) > MAX_BATCH_SIZE:
+        return {
+            'statusCode': 400,
+            'body': json.dumps({'error': f'At most {MAX_BATCH_SIZE} tools can be created per request'}),
+            'headers': {'Content-Type': 'application/json'}
         }
 
+    valid = []
+    errors = []
+    for index, item in enumerate(tools):
+        error = validate_tool_item(item)
+        if error:
+            errors.append({'index': index, 'error': error})
+        else:
+            valid.append((index, item))
 
-def update_tool_data(redshift_client, cluster_id, database, schema_name,table_name, secret_arn, tool_data):
-    try:
+    if not valid:
+        return {
+            'statusCode': 400,
+            'body': json.dumps({'message': 'No valid tools to create', 'errors': errors}),
+            'headers': {'Content-Type': 'application/json'}
+        }
 
-        # tool_name = tool_data.get("tool_name")
-        s_no = tool_data.get("s_no")
+    success, first_s_no, error_message = insert_tools_batch(
+        redshift_client,
+        cluster_id,
+        database,
+        schema_name,
+        table_name,
+        secret_arn,
+        [item for _, item in valid],
+        deadline=deadline,
+    )
+    if not success:
+        return {
+            'statusCode': 400,
+            'body': json.dumps({'message': 'Failed to create tools', 'error': error_message, 'errors': errors}),
+            'headers': {'Content-Type': 'application/json'}
+        }
 
-        # Remove tool_name from the data to be updated (since it's our primary key)
-        update_data = {k: v for k, v in tool_data.items() if k != "s_no"}
+    created = [
+        {'index': index, 's_no': first_s_no + offset, 'tool_name': item['tool_name']}
+        for offset, (index, item) in enumerate(valid)
+    ]
+    return {
+        'statusCode': 201,
+        'body': json.dumps({
+            'message': f'{len(created)} tools successfully created',
+            'created': created,
+            'errors': errors,
+        }),
+        'headers': {'Content-Type': 'application/json'}
+    }
+
+
+
+def validate_tool_update(item):
+    """Return an error message for an invalid update payload, None if it can be applied"""
+    if not isinstance(item, dict):
+        return "Each update must be a JSON object"
+    s_no = item.get('s_no')
+    if isinstance(s_no, bool) or not isinstance(s_no, int):
+        return "s_no is required and must be an integer"
+    if len(item) < 2:
+        return "No fields provided for update"
+    unknown = sorted(set(item) - set(TABLE_COLUMNS))
+    if unknown:
+        return f"Unknown columns: {', '.join(unknown)}"
+    return None
 
-        if not update_data:
-            raise ValueError("No fields provided for update")
 
-        # Construct the SET clause for UPDATE statement
-        set_clause = ", ".join(
-            [
-                (
-                    f"{key} = '{value}'"
-                    if isinstance(value, str)
-                    else f"{key} = {value}"
-                )
-                for key, value in update_data.items()
-            ]
-        )
+def apply_tool_updates(redshift_client, cluster_id, database, schema_name, table_name, secret_arn, updates, deadline=None):
+    """Stage updates in a temp table and apply them with one UPDATE ... FROM, returns the s_no values found"""
+    columns = [name for name in TABLE_COLUMNS if name != 's_no' and any(name in item for item in updates)]
+
+    # Rows can change different columns: set_<column> says whether new_<column> applies
+    staging_columns = ["s_no INT"]
+    for name in columns:
+        staging_columns.append(f"new_{name} {TABLE_COLUMNS[name]}")
+        staging_columns.append(f"set_{name} BOOLEAN")
+    sqls = [f"CREATE TEMP TABLE tool_updates ({', '.join(staging_columns)});"]
+
+    values_rows = []
+    for item in updates:
+        values = [item['s_no']]
+        for name in columns:
+            values.append(item.get(name))
+            values.append(name in item)
+        # Same values and NULL rules as a single updateTool
+        values_rows.append("(" + ", ".join(sql_literal(value) for value in values) + ")")
+    sqls.extend(values_insert_sqls("INSERT INTO tool_updates VALUES\n", values_rows))
+
+    set_clause = ", ".join(
+        f"{name} = CASE WHEN tool_updates.set_{name} THEN tool_updates.new_{name} ELSE {name} END"
+        for name in columns
+    )
+    sqls.append(
+        f"UPDATE {schema_name}.{table_name} SET {set_clause}, last_modified = SYSDATE "
+        f"FROM tool_updates WHERE {schema_name}.{table_name}.s_no = tool_updates.s_no;"
+    )
+    # Which of the staged rows matched, read back from the last sub-statement
+    sqls.append(
+        f"SELECT tool_updates.s_no FROM tool_updates "
+        f"JOIN {schema_name}.{table_name} target ON target.s_no = tool_updates.s_no;"
+    )
+    if len(sqls) > DATA_API_MAX_BATCH_SQLS:
+        raise ValueError("Update payload is too large for one request")
 
-        # Construct and execute UPDATE query
-        query = f"""
-                UPDATE {schema_name}.{table_name}
-                SET {set_clause}
-                WHERE s_no = {s_no};
-            """
+    print(f"Bulk update of {len(updates)} tools in {len(sqls)} statements")
+    statement = run_batch_statement(redshift_client, cluster_id, database, secret_arn, sqls,
+                                    query_name="Bulk update query", deadline=deadline)
 
-        print(f"Update Query: {query}")  # For debugging
+    found = set()
+    for page in iter_result_pages(redshift_client, f"{statement.statement_id}:{len(sqls)}"):
+        found.update(int(record[0]['longValue']) for record in page['Records'])
+    if found:
+        table_written(redshift_client, cluster_id, database, schema_name, table_name, secret_arn)
+    return found
 
-        # Execute the query
-        response = redshift_client.execute_statement(
-            ClusterIdentifier=cluster_id,
-            Database=database,
-            SecretArn=secret_arn,
-            Sql=query,
+
+def update_tools_batch(redshift_client, cluster_id, database, schema_name, table_name, secret_arn, request_body, deadline=None):
+    # Accept either a bare array or {"tools": [...]}
+    updates = request_body.get('tools') if isinstance(request_body, dict) else request_body
+    if not isinstance(updates, list) or not updates:
+        return {
+            'statusCode': 400,
+            'body': json.dumps({'error': 'Request body must be a non-empty array of updates'}),
+            'headers': {'Content-Type': 'application/json'}
+        }
+    if len(updates) > MAX_BATCH_SIZE:
+        return {
+            'statusCode': 400,
+            'body': json.dumps({'error': f'At most {MAX_BATCH_SIZE} tools can be updated per request'}),
+            'headers': {'Content-Type': 'application/json'}
+        }
+
+    valid = []
+    errors = []
+    seen = set()
+    for index, item in enumerate(updates):
+        error = validate_tool_update(item)
+        if not error and item['s_no'] in seen:
+            error = "Duplicate s_no in request"
+        if error:
+            errors.append({'index': index, 'error': error})
+        else:
+            seen.add(item['s_no'])
+            valid.append((index, item))
+
+    if not valid:
+        return {
+            'statusCode': 400,
+            'body': json.dumps({'message': 'No valid updates to apply', 'errors': errors}),
+            'headers': {'Content-Type': 'application/json'}
+        }
+
+    try:
+        found = apply_tool_updates(
+            redshift_client,
+            cluster_id,
+            database,
+            schema_name,
+            table_name,
+            secret_arn,
+            [item for _, item in valid],
+            deadline=deadline,
         )
+    except (StatementFailedError, ValueError) as e:
+        return {
+            'statusCode': 400,
+            'body': json.dumps({'message': 'Failed to update tools', 'error': str(e), 'errors': errors}),
+            'headers': {'Content-Type': 'application/json'}
+        }
 
-        # Wait for query completion
-        statement_id = response["Id"]
-        while True:
-            status_response = redshift_client.describe_statement(Id=statement_id)
-            status = status_response["Status"]
-
-            if status == "FINISHED":
-                # Check if any rows were updated
-                # result = redshift_client.get_statement_result(Id=statement_id)
-                # rows_updated = result.get("UpdatedRows", 0)
-                # return rows_updated > 0
-                return True
-
-            elif status in ["FAILED", "ABORTED"]:
-                error_message = f"Update query failed: {status_response.get('Error', 'Unknown error')}"
-                print(error_message)
-                raise Exception(error_message)
+    results = [
+        {'index': index, 's_no': item['s_no'], 'status': 'updated' if item['s_no'] in found else 'not_found'}
+        for index, item in valid
+    ]
+    return {
+        'statusCode': 200,
+        'body': json.dumps({
+            'message': f'{len(found)} tools successfully updated',
+            'results': results,
+            'errors': errors,
+        }),
+        'headers': {'Content-Type': 'application/json'}
+    }
+
+
+
+def set_tools_display(redshift_client, cluster_id, database, schema_name, table_name, secret_arn, is_display, s_nos=None, filters=None, deadline=None):
+    """Flip is_display for every matching row in one set-based UPDATE, returns the s_no values that changed"""
+    conditions = [f"is_display = {'FALSE' if is_display else 'TRUE'}"]
+    if s_nos is not None:
+        conditions.append(f"s_no IN ({', '.join(str(int(s_no)) for s_no in s_nos)})")
+    for name, value in (filters or {}).items():
+        # The batch API takes no Parameters: names are checked against BULK_FILTER_COLUMNS, values quoted
+        conditions.append(f"{name} = {sql_string_literal(value)}")
+
+    # Only rows not yet in the target state are captured, so the SELECT reports real changes
+    sqls = [
+        f"CREATE TEMP TABLE changed_tools AS SELECT s_no FROM {schema_name}.{table_name} WHERE {' AND '.join(conditions)};",
+        f"UPDATE {schema_name}.{table_name} SET is_display = {'TRUE' if is_display else 'FALSE'}, last_modified = SYSDATE "
+        f"FROM changed_tools WHERE {schema_name}.{table_name}.s_no = changed_tools.s_no;",
+        "SELECT s_no FROM changed_tools ORDER BY s_no;",
+    ]
+    statement = run_batch_statement(redshift_client, cluster_id, database, secret_arn, sqls,
+                                    query_name="Bulk display query", deadline=deadline)
+
+    changed = []
+    for page in iter_result_pages(redshift_client, f"{statement.statement_id}:{len(sqls)}"):
+        changed.extend(int(record[0]['longValue']) for record in page['Records'])
+    if changed:
+        table_written(redshift_client, cluster_id, database, schema_name, table_name, secret_arn)
+    return changed
+
+
+def bulk_set_display(redshift_client, cluster_id, database, schema_name, table_name, secret_arn, request_body, is_display, deadline=None):
+    # {"s_no": [1, 2, ...]} or {"filter": {"team_name": "..."}}
+    action = 'restored' if is_display else 'deleted'
+    if not isinstance(request_body, dict):
+        request_body = {}
+    s_nos = request_body.get('s_no')
+    filters = request_body.get('filter')
+
+    error = None
+    if (s_nos is None) == (filters is None):
+        error = 'Provide either an s_no list or a filter'
+    elif s_nos is not None:
+        if not isinstance(s_nos, list) or not s_nos:
+            error = 's_no must be a non-empty array'
+        elif any(isinstance(s_no, bool) or not isinstance(s_no, int) for s_no in s_nos):
+            error = 's_no values must be integers'
+        elif len(s_nos) > MAX_BATCH_SIZE:
+            error = f'At most {MAX_BATCH_SIZE} tools can be {action} per request'
+    elif not isinstance(filters, dict) or not filters:
+        error = f'filter must be a non-empty object on {", ".join(BULK_FILTER_COLUMNS)}'
+    elif set(filters) - set(BULK_FILTER_COLUMNS):
+        error = f'Unsupported filter columns: {", ".join(sorted(set(filters) - set(BULK_FILTER_COLUMNS)))}'
+    elif any(not isinstance(value, str) or not value for value in filters.values()):
+        error = 'filter values must be non-empty strings'
+    if error:
+        return {
+            'statusCode': 400,
+            'body': json.dumps({'error': error}),
+            'headers': {'Content-Type': 'application/json'}
+        }
 
-            time.sleep(1)
+    try:
+        changed = set_tools_display(redshift_client, cluster_id, database, schema_name, table_name, secret_arn,
+                                    is_display, s_nos=s_nos, filters=filters, deadline=deadline)
+    except StatementFailedError as e:
+        return {
+            'statusCode': 400,
+            'body': json.dumps({'message': f'Failed to {action[:-1]} tools', 'error': str(e)}),
+            'headers': {'Content-Type': 'application/json'}
+        }
 
-    except Exception as e:
-        print(f"Error updating tool data: {str(e)}")
-        raise
+    body = {
+        'message': f'{len(changed)} tools successfully {action}',
+        action: changed,
+    }
+    if s_nos is not None:
+        # Unknown ids and rows that were already in the requested state
+        changed_set = set(changed)
+        body['unchanged'] = [s_no for s_no in dict.fromkeys(s_nos) if s_no not in changed_set]
+    return {
+        'statusCode': 200,
+        'body': json.dumps(body),
+        'headers': {'Content-Type': 'application/json'}
+    }
 
 
 
-def check_And_Update(redshift_client, cluster_id, database, schema_name,table_name, secret_arn, tool_exists, s_no, request_body):
+
+def check_And_Insert(redshift_client, cluster_id, database, schema_name,table_name, secret_arn, tool_exists, tool_name, request_body):
+
     try:
-        if not tool_exists:
+
+        if tool_exists:
             return {
-                "statusCode": 404,
+                "statusCode": 400,
                 "body": json.dumps(
-                    {"message": f'Record with s_no "{s_no}" does not exist in database'}
+                    {
+                        "message": f'Tool name "{tool_name}" already exists in database',
+                        "exists": True,
+                    }
                 ),
                 "headers": {"Content-Type": "application/json"},
             }
+        else:
+            # If tool doesn't exist, proceed with insertion
+            # redshift_client, cluster_id, database, schema_name, table_name, secret_arn, tool_data
+            insert_success = insert_tool_data(
+                redshift_client,
+                cluster_id,
+                database,
+                schema_name,
+                table_name,
+                secret_arn,
+                request_body,  # Passing the entire request body as tool data
+            )
+        
+            if insert_success:
+                return {
+                    "statusCode": 201,
+                    "body": json.dumps(
+                        {
+                            "message": f'Tool "{tool_name}" successfully inserted',
+                            "tool_data": request_body,
+                        }
+                    ),
+                    "headers": {"Content-Type": "application/json"},
+                }
+            else:
+                return {
+                    "statusCode": 500,
+                    "body": json.dumps({"error": "Failed to insert tool data"}),
+                    "headers": {"Content-Type": "application/json"},
+                }
+
+    except Exception as e:
+        if is_auth_error(e) or is_retry_later_error(e):
+            raise
+        print(f"Error: {str(e)}")
+        import traceback
+        print(f"Traceback: {traceback.format_exc()}")
+        return {
+            'statusCode': 500,
+            'body': json.dumps({
+                'error': str(e)
+            }),
+            'headers': {
+                'Content-Type': 'application/json'
+            }
+        }
+
+
+def update_tool_data(redshift_client, cluster_id, database, schema_name,table_name, secret_arn, tool_data, deadline=None):
+    try:
+
+        # tool_name = tool_data.get("tool_name")
+        s_no = tool_data.get("s_no")
 
-        # If tool exists, proceed with update
+        # Remove tool_name from the data to be updated (since it's our primary key)
+        update_data = {k: v for k, v in tool_data.items() if k != "s_no"}
+
+        if not update_data:
+            raise ValueError("No fields provided for update")
+
+        # Column names go into the SQL text, so only known columns are accepted
+        unknown = sorted(set(update_data) - set(TABLE_COLUMNS))
+        if unknown:
+            raise ValueError(f"Unknown columns: {', '.join(unknown)}")
+
+        # Construct the SET clause, values are passed as parameters
+        columns = tuple(update_data)
+        null_columns = tuple(key for key, value in update_data.items() if value is None)
+        empty_columns = tuple(key for key, value in update_data.items() if value == "")
+        query = update_template(schema_name, table_name, columns, null_columns, empty_columns)
+        parameters = {key: value for key, value in update_data.items() if value is not None and value != ""}
+        parameters['s_no'] = s_no
+
+        log_debug(f"Update Query: {query}")
+
+        # Execute the query and wait for completion
+        statement = run_statement(redshift_client, cluster_id, database, secret_arn, query,
+                                  query_name="Update query", deadline=deadline, parameters=parameters)
+
+        # Check if any rows were updated, no rows means the s_no does not exist
+        rows_updated = statement.result_rows
+        if rows_updated > 0:
+            table_written(redshift_client, cluster_id, database, schema_name, table_name, secret_arn)
+        return rows_updated > 0
+
+    except Exception as e:
+        print(f"Error updating tool data: {str(e)}")
+        raise
+
+
+
+def check_And_Update(redshift_client, cluster_id, database, schema_name,table_name, secret_arn, s_no, request_body, deadline=None):
+    try:
+        # One UPDATE, its affected-row count tells whether the record exists
         update_success = update_tool_data(
             redshift_client,
             cluster_id,
@@ -483,6 +1843,7 @@ def check_And_Update(redshift_client, cluster_id, database, schema_name,table_na
             table_name,
             secret_arn,
             request_body,
+            deadline=deadline,
         )
 
         # if update_success:
@@ -516,8 +1877,10 @@ def check_And_Update(redshift_client, cluster_id, database, schema_name,table_na
             }
         else:
             return {
-                "statusCode": 500,
-                "body": json.dumps({"error": "Failed to update record"}),
+                "statusCode": 404,
+                "body": json.dumps(
+                    {"message": f'Record with s_no "{s_no}" does not exist in database'}
+                ),
                 "headers": {"Content-Type": "application/json"},
             }
 
@@ -532,6 +1895,8 @@ def check_And_Update(redshift_client, cluster_id, database, schema_name,table_na
             }
         }
     except Exception as e:
+        if is_auth_error(e) or is_retry_later_error(e):
+            raise
         print(f"Error: {str(e)}")
         import traceback
         print(f"Traceback: {traceback.format_exc()}")
@@ -546,67 +1911,33 @@ def check_And_Update(redshift_client, cluster_id, database, schema_name,table_na
         }
 
 
-def soft_delete_tool(redshift_client, cluster_id, database, schema_name, table_name, secret_arn, s_no):
+def soft_delete_tool(redshift_client, cluster_id, database, schema_name, table_name, secret_arn, s_no, deadline=None):
     # print(" Inside soft_delete_tool ")
     try:
         # Construct and execute UPDATE query for soft delete
-        query = f"""
-            UPDATE {schema_name}.{table_name}
-            SET is_display = FALSE
-            WHERE s_no = {s_no};
-        """
+        query = sql_template('soft_delete_tool', schema_name, table_name)
         
-        print(f"Soft Delete Query: {query}")  # For debugging
+        log_debug(f"Soft Delete Query: {query} s_no={s_no}")
         
-        # Execute the query
-        response = redshift_client.execute_statement(
-            ClusterIdentifier=cluster_id,
-            Database=database,
-            SecretArn=secret_arn,
-            Sql=query
-        )
-        
-        # Wait for query completion
-        statement_id = response['Id']
-        while True:
-            status_response = redshift_client.describe_statement(Id=statement_id)
-            status = status_response['Status']
-            # print(" Inside while True for delete")
-            # print("Status : ", status)
-            if status == 'FINISHED':
-                # Check if any rows were updated
-                # result = redshift_client.get_statement_result(Id=statement_id)
-                # rows_updated = result.get('UpdatedRows', 0)
-                # return rows_updated > 0
-                return True
-                
-            elif status in ['FAILED', 'ABORTED']:
-                error_message = f"Soft delete query failed: {status_response.get('Error', 'Unknown error')}"
-                print(error_message)
-                raise Exception(error_message)
-            
-            time.sleep(1)
+        # Execute the query and wait for completion
+        statement = run_statement(redshift_client, cluster_id, database, secret_arn, query,
+                                  query_name="Soft delete query", deadline=deadline, parameters={'s_no': s_no})
+
+        # Check if any rows were updated, no rows means the s_no does not exist
+        rows_updated = statement.result_rows
+        if rows_updated > 0:
+            table_written(redshift_client, cluster_id, database, schema_name, table_name, secret_arn)
+        return rows_updated > 0
 
     except Exception as e:
         print(f"Error soft deleting tool: {str(e)}")
         raise
 
 
-def check_And_Delete(redshift_client, cluster_id, database, schema_name,table_name, secret_arn, tool_exists, s_no, request_body):
+def check_And_Delete(redshift_client, cluster_id, database, schema_name,table_name, secret_arn, s_no, request_body, deadline=None):
     # print(" Inside Check and delete function ")
     try:
-        if not tool_exists:
-            return {
-                "statusCode": 404,
-                "body": json.dumps(
-                    {
-                        "message": f'Record with s_no "{s_no}" does not exist in database'
-                    }
-                ),
-                "headers": {"Content-Type": "application/json"},
-            }
-
-        # If tool exists, proceed with soft delete
+        # One UPDATE, its affected-row count tells whether the record exists
         delete_success = soft_delete_tool(
             redshift_client,
             cluster_id,
@@ -615,6 +1946,7 @@ def check_And_Delete(redshift_client, cluster_id, database, schema_name,table_na
             table_name,
             secret_arn,
             s_no,
+            deadline=deadline,
         )
 
         # print(" Delete_Success printing : ", delete_success)
@@ -631,12 +1963,18 @@ def check_And_Delete(redshift_client, cluster_id, database, schema_name,table_na
             }
         else:
             return {
-                "statusCode": 500,
-                "body": json.dumps({"error": "Failed to delete tool"}),
+                "statusCode": 404,
+                "body": json.dumps(
+                    {
+                        "message": f'Record with s_no "{s_no}" does not exist in database'
+                    }
+                ),
                 "headers": {"Content-Type": "application/json"},
             }
 
     except Exception as e:
+        if is_auth_error(e) or is_retry_later_error(e):
+            raise
         print(f"Error: {str(e)}")
         import traceback
 
@@ -647,112 +1985,42 @@ def check_And_Delete(redshift_client, cluster_id, database, schema_name,table_na
             "headers": {"Content-Type": "application/json"},
         }
 
-def check_s_no_exists(redshift_client, cluster_id, database, schema_name, table_name, secret_arn, s_no):
-    try:
-        query = f"""
-            SELECT EXISTS (
-                SELECT 1 
-                FROM {schema_name}.{table_name} 
-                WHERE s_no = {s_no}
-            );
-        """
-        
-        response = redshift_client.execute_statement(
-            ClusterIdentifier=cluster_id,
-            Database=database,
-            SecretArn=secret_arn,
-            Sql=query
-        )
-        
-        statement_id = response['Id']
-        while True:
-            status_response = redshift_client.describe_statement(Id=statement_id)
-            status = status_response['Status']
-            
-            if status == 'FINISHED':
-                result = redshift_client.get_statement_result(Id=statement_id)
-                exists = result['Records'][0][0]['booleanValue']
-                return exists
-                
-            elif status in ['FAILED', 'ABORTED']:
-                raise Exception(f"Query failed: {status_response.get('Error', 'Unknown error')}")
-            
-            time.sleep(1)
-
-    except Exception as e:
-        print(f"Error checking s_no existence: {str(e)}")
-        raise
-
-
-def get_tool_by_s_no(redshift_client, cluster_id, database, schema_name, table_name, secret_arn, s_no):
+def get_tool_by_s_no(redshift_client, cluster_id, database, schema_name, table_name, secret_arn, s_no, deadline=None, columns=None):
     try:
         # SQL query to get specific tool
-        query = f"""
-            SELECT * 
-            FROM {schema_name}.{table_name} 
-            WHERE s_no = {s_no} AND is_display = TRUE;
-        """
-        
-        # Execute the query
-        response = redshift_client.execute_statement(
-            ClusterIdentifier=cluster_id,
-            Database=database,
-            SecretArn=secret_arn,
-            Sql=query
-        )
+        query = sql_template('get_tool_by_s_no', schema_name, table_name, columns)
         
-        # Get query result
-        statement_id = response['Id']
+        # Execute the query and wait for completion
+        statement = run_statement(redshift_client, cluster_id, database, secret_arn, query,
+                                  deadline=deadline, parameters={'s_no': s_no})
+
+        result = redshift_client.get_statement_result(Id=statement.statement_id)
         
-        while True:
-            status_response = redshift_client.describe_statement(Id=statement_id)
-            status = status_response['Status']
-            
-            if status == 'FINISHED':
-                result = redshift_client.get_statement_result(Id=statement_id)
-                
-                # Get column names
-                columns = [meta['name'] for meta in result['ColumnMetadata']]
-                
-                if result['Records']:
-                    # Convert the first record to a dictionary
-                    record = {}
-                    for i, value in enumerate(result['Records'][0]):
-                        if 'stringValue' in value:
-                            record[columns[i]] = value['stringValue']
-                        elif 'longValue' in value:
-                            record[columns[i]] = value['longValue']
-                        elif 'doubleValue' in value:
-                            record[columns[i]] = value['doubleValue']
-                        elif 'booleanValue' in value:
-                            record[columns[i]] = value['booleanValue']
-                        elif 'isNull' in value:
-                            record[columns[i]] = None
-                    
-                    return {
-                        'statusCode': 200,
-                        'body': json.dumps(record, default=str),
-                        'headers': {
-                            'Content-Type': 'application/json'
-                        }
-                    }
-                else:
-                    return {
-                        'statusCode': 404,
-                        'body': json.dumps({
-                            'message': f'No record found with s_no: {s_no}'
-                        }),
-                        'headers': {
-                            'Content-Type': 'application/json'
-                        }
-                    }
-                
-            elif status in ['FAILED', 'ABORTED']:
-                raise Exception(f"Query failed: {status_response.get('Error', 'Unknown error')}")
+        if result['Records']:
+            # Convert the first record to a dictionary
+            record = build_row_decoder(result['ColumnMetadata'])(result['Records'][0])
             
-            time.sleep(1)
+            return {
+                'statusCode': 200,
+                'body': COMPACT_JSON_ENCODER.encode(record),
+                'headers': {
+                    'Content-Type': 'application/json'
+                }
+            }
+        else:
+            return {
+                'statusCode': 404,
+                'body': json.dumps({
+                    'message': f'No record found with s_no: {s_no}'
+                }),
+                'headers': {
+                    'Content-Type': 'application/json'
+                }
+            }
 
     except Exception as e:
+        if is_auth_error(e) or is_retry_later_error(e):
+            raise
         return {
             'statusCode': 500,
             'body': json.dumps({
@@ -764,86 +2032,1258 @@ def get_tool_by_s_no(redshift_client, cluster_id, database, schema_name, table_n
         }
 
 
-def get_tools_by_login(redshift_client, cluster_id, database, schema_name, table_name, secret_arn, login):
+def read_tools(redshift_client, cluster_id, database, schema_name, table_name, secret_arn, query_parameters, deadline=None):
     try:
-        # SQL query to get tools for a specific login
-        query = f"""
-            SELECT * 
-            FROM {schema_name}.{table_name} 
-            WHERE login = '{login}' AND is_display = TRUE;
-        """
-        
-        # Execute the query
-        response = redshift_client.execute_statement(
-            ClusterIdentifier=cluster_id,
-            Database=database,
-            SecretArn=secret_arn,
-            Sql=query
+        # A single record defaults to every column, lists to the summary
+        columns = parse_fields_param(query_parameters, None if 's_no' in query_parameters else SUMMARY_FIELDS)
+    except ValueError as ve:
+        return {
+            'statusCode': 400,
+            'body': json.dumps({'error': str(ve)}),
+            'headers': {'Content-Type': 'application/json'}
+        }
+
+    if 's_no' not in query_parameters:
+        try:
+            limit, after_s_no, after_key = parse_page_params(query_parameters)
+            partitions = parse_partitions_param(query_parameters)
+            filters = parse_filter_params(query_parameters)
+            sort = parse_sort_param(query_parameters)
+            since = parse_since_param(query_parameters)
+            if since is not None:
+                if query_parameters.get('sort'):
+                    raise ValueError("sort cannot be combined with since")
+                # Oldest change first, so the last row of every page is the next watermark
+                sort = ('last_modified', False)
+        except ValueError as ve:
+            return {
+                'statusCode': 400,
+                'body': json.dumps({'error': str(ve)}),
+                'headers': {'Content-Type': 'application/json'}
+            }
+
+    if 's_no' in query_parameters:
+        s_no = query_parameters['s_no']
+        print(f"Request type: Get specific tool with s_no {s_no}")
+        return get_tool_by_s_no(
+            redshift_client,
+            cluster_id,
+            database,
+            schema_name,
+            table_name,
+            secret_arn,
+            s_no,
+            deadline=deadline,
+            columns=columns
         )
-        
-        # Get query result
-        statement_id = response['Id']
-        
-        while True:
-            status_response = redshift_client.describe_statement(Id=statement_id)
-            status = status_response['Status']
-            
-            if status == 'FINISHED':
-                result = redshift_client.get_statement_result(Id=statement_id)
-                
-                # Get column names
-                columns = [meta['name'] for meta in result['ColumnMetadata']]
-                
-                # Convert all records to a list of dictionaries
-                records = []
-                for row in result['Records']:
-                    record = {}
-                    for i, value in enumerate(row):
-                        if 'stringValue' in value:
-                            record[columns[i]] = value['stringValue']
-                        elif 'longValue' in value:
-                            record[columns[i]] = value['longValue']
-                        elif 'doubleValue' in value:
-                            record[columns[i]] = value['doubleValue']
-                        elif 'booleanValue' in value:
-                            record[columns[i]] = value['booleanValue']
-                        elif 'isNull' in value:
-                            record[columns[i]] = None
-                    records.append(record)
-                
-                return {
-                    'statusCode': 200,
-                    'body': json.dumps({
-                        'total_count': len(records),
-                        'records': records
-                    }, default=str),
-                    'headers': {
-                        'Content-Type': 'application/json'
-                    }
-                }
-                
-            elif status in ['FAILED', 'ABORTED']:
-                raise Exception(f"Query failed: {status_response.get('Error', 'Unknown error')}")
-            
-            time.sleep(1)
+    else:
+        # login=... is one of the filters, all of them go into one WHERE clause
+        log_debug(f"Request type: Get tools, filters {filters}, sort {sort}")
+        return retrieve_data(
+            redshift_client,
+            cluster_id,
+            database,
+            schema_name,
+            table_name,
+            secret_arn,
+            limit=limit,
+            after_s_no=after_s_no,
+            deadline=deadline,
+            partitions=partitions,
+            filters=filters,
+            sort=sort,
+            after_key=after_key,
+            columns=columns,
+            since=since
+        )
+
+
+def summarize_tools(rows):
+    """Fold the (team, status, reuse, count) rows of the summary view into the response shape"""
+    by_team = {}
+    by_status = {}
+    by_reuse = {}
+    total = 0
+    for row in rows:
+        count = row['tool_count']
+        # NULLs cannot be JSON object keys
+        status = row['active_inactive'] or 'unspecified'
+        reuse = row['can_be_reused_across_csp_teams'] or 'unspecified'
+        team = by_team.setdefault(row['team_name'], {
+            'team_name': row['team_name'], 'tool_count': 0, 'by_status': {}, 'by_reuse': {}
+        })
+        team['tool_count'] += count
+        team['by_status'][status] = team['by_status'].get(status, 0) + count
+        team['by_reuse'][reuse] = team['by_reuse'].get(reuse, 0) + count
+        by_status[status] = by_status.get(status, 0) + count
+        by_reuse[reuse] = by_reuse.get(reuse, 0) + count
+        total += count
+    return {
+        'tool_count': total,
+        'team_count': len(by_team),
+        'by_status': by_status,
+        'by_reuse': by_reuse,
+        'teams': sorted(by_team.values(), key=lambda team: (-team['tool_count'], team['team_name'] or '')),
+    }
+
+
+def get_tool_summary(redshift_client, cluster_id, database, schema_name, table_name, secret_arn, deadline=None):
+    """Tool counts by team, status and reuse, cached in process for SUMMARY_CACHE_TTL_SECONDS"""
+    cache_key = (schema_name, table_name)
+    cached = _summary_cache.get(cache_key)
+    if cached and time.monotonic() < cached[1]:
+        body = cached[0]
+    else:
+        try:
+            statement = run_statement(redshift_client, cluster_id, database, secret_arn,
+                                      sql_template('tool_summary', schema_name, table_name),
+                                      query_name="Summary query", deadline=deadline)
+            rows = []
+            decode_row = None
+            for page in iter_result_pages(redshift_client, statement.statement_id):
+                decode_row = decode_row or build_row_decoder(page['ColumnMetadata'])
+                rows.extend(decode_row(row) for row in page['Records'])
+        except Exception as e:
+            if is_auth_error(e) or is_retry_later_error(e):
+                raise
+            error_message = f"Error: {str(e)}"
+            print(error_message)
+            return {
+                'statusCode': 500,
+                'body': json.dumps({'error': error_message}),
+                'headers': {'Content-Type': 'application/json'}
+            }
+        body = COMPACT_JSON_ENCODER.encode(summarize_tools(rows))
+        _summary_cache[cache_key] = (body, time.monotonic() + SUMMARY_CACHE_TTL_SECONDS)
+
+    return {
+        'statusCode': 200,
+        'body': body,
+        'headers': {
+            'Content-Type': 'application/json',
+            'Cache-Control': f"max-age={int(SUMMARY_CACHE_TTL_SECONDS)}"
+        }
+    }
+
+
+# S3 ObjectCreated ingestion of CSV files shaped like sample-data/Sample_Input.csv
+S3_READ_CHUNK_BYTES = int(os.environ.get('S3_READ_CHUNK_BYTES', str(64 * 1024)))
+S3_INGEST_BATCH_ROWS = int(os.environ.get('S3_INGEST_BATCH_ROWS', '500'))
+S3_COPY_THRESHOLD_BYTES = int(os.environ.get('S3_COPY_THRESHOLD_BYTES', str(50 * 1024 * 1024)))
+COPY_IAM_ROLE_ARN = os.environ.get('COPY_IAM_ROLE_ARN')
+S3_STAGING_BUCKET = os.environ.get('S3_STAGING_BUCKET')
+S3_STAGING_PREFIX = os.environ.get('S3_STAGING_PREFIX', 'staging/')
+# Rows with a bad cell are skipped, at most this many of them are listed in the result per file
+S3_INGEST_MAX_REPORTED_REJECTS = int(os.environ.get('S3_INGEST_MAX_REPORTED_REJECTS', '100'))
+# A file is staged first and moved into the table in one transaction that also
+# records it in the loads table, so a retried or repeated event loads it once.
+S3_INGEST_STAGING_TABLE_NAME = os.environ.get('S3_INGEST_STAGING_TABLE_NAME', 'csp_tools_ingest_staging')
+S3_INGEST_LOADS_TABLE_NAME = os.environ.get('S3_INGEST_LOADS_TABLE_NAME', 'csp_tools_ingest_loads')
+# Staged rows of attempts that never finished are cleared after this long
+S3_INGEST_STAGING_TTL_SECONDS = int(os.environ.get('S3_INGEST_STAGING_TTL_SECONDS', '3600'))
+# Rows without an s_no get ids reserved this many at a time for a COPY
+S3_COPY_S_NO_BLOCK_SIZE = int(os.environ.get('S3_COPY_S_NO_BLOCK_SIZE', '10000'))
+
+_s3_client = None
+
+
+def get_s3_client():
+    # The source bucket lives in the Lambda's own account, no assumed role needed
+    global _s3_client
+    if _s3_client is None:
+        _s3_client = boto3.client('s3')
+    return _s3_client
+
+
+def is_s3_event(event):
+    records = event.get('Records') or []
+    return bool(records) and records[0].get('eventSource') == 'aws:s3'
+
+
+def iter_csv_lines(chunks):
+    """Turn a stream of byte chunks into text lines, never holding more than one chunk"""
+    import codecs
+
+    decoder = codecs.getincrementaldecoder('utf-8-sig')()
+    pending = ''
+    for chunk in chunks:
+        pending += decoder.decode(chunk)
+        lines = pending.split('\n')
+        # The last piece has no newline yet, it continues in the next chunk
+        pending = lines.pop()
+        for line in lines:
+            yield line + '\n'
+    pending += decoder.decode(b'', True)
+    if pending:
+        yield pending
+
+
+def convert_csv_value(column, raw):
+    raw = raw.strip()
+    if raw == '':
+        return None
+    column_type = TABLE_COLUMNS[column]
+    if column_type == 'INT':
+        try:
+            return int(raw)
+        except ValueError:
+            raise ValueError(f"{column} is not an integer: {raw[:50]!r}")
+    if column_type == 'BOOLEAN':
+        return raw.lower() in ('true', 't', '1', 'yes', 'y')
+    return raw
+
+
+def iter_csv_tools(lines, rejected=None):
+    """Yield (columns, values) for every CSV row, keeping only the columns of the table
+
+    Rows with a cell that does not convert are skipped and counted in rejected,
+    {'count': ..., 'rows': [...]}, the first S3_INGEST_MAX_REPORTED_REJECTS listed.
+    """
+    import csv
+
+    reader = csv.reader(lines)
+    header = next(reader, None)
+    if header is None:
+        return
+    positions = [
+        (index, name.strip().lower())
+        for index, name in enumerate(header)
+        if name.strip().lower() in TABLE_COLUMNS
+    ]
+    columns = [name for _, name in positions]
+
+    for row in reader:
+        if not any(field.strip() for field in row):
+            continue
+        try:
+            values = [
+                convert_csv_value(name, row[index]) if index < len(row) else None
+                for index, name in positions
+            ]
+        except ValueError as e:
+            # Raising here would fail the whole file again on every retry of the event
+            if rejected is not None:
+                rejected['count'] += 1
+                if len(rejected['rows']) < S3_INGEST_MAX_REPORTED_REJECTS:
+                    rejected['rows'].append({'line': reader.line_num, 'error': str(e)})
+            continue
+        yield columns, values
+
+
+def render_values_row(values, trailing_sql=''):
+    # trailing_sql is appended as is, e.g. ", SYSDATE" for last_modified
+    return "(" + ", ".join(escape_sql_value(value) for value in values) + trailing_sql + ")"
+
+
+def s3_load_id(bucket, key, s3_object):
+    # An overwritten key is a new load, the same object delivered again is not
+    return f"s3://{bucket}/{key}#{s3_object.get('versionId') or s3_object.get('eTag', '')}"
+
+
+def loaded_rows(redshift_client, cluster_id, database, schema_name, secret_arn, load_id, deadline=None):
+    """Rows an earlier invocation loaded from load_id, None if it was never loaded"""
+    statement = run_statement(redshift_client, cluster_id, database, secret_arn,
+                              f"SELECT rows_loaded FROM {schema_name}.{S3_INGEST_LOADS_TABLE_NAME} WHERE load_id = :load_id;",
+                              query_name="Ingest load lookup", deadline=deadline, parameters={'load_id': load_id})
+    result = redshift_client.get_statement_result(Id=statement.statement_id)
+    return result['Records'][0][0]['longValue'] if result['Records'] else None
+
+
+def s_no_reserver(redshift_client, cluster_id, database, schema_name, table_name, secret_arn, block_size, deadline=None):
+    """Return a function handing out new s_no values, reserved block_size at a time"""
+    block = {'next': 0, 'end': 0}
+
+    def next_s_no():
+        if block['next'] >= block['end']:
+            block['next'] = reserve_s_no_block(redshift_client, cluster_id, database, schema_name, table_name,
+                                               secret_arn, block_size, deadline=deadline)
+            block['end'] = block['next'] + block_size
+        block['next'] += 1
+        return block['next'] - 1
+    return next_s_no
+
+
+def iter_ingest_rows(body, next_s_no, rejected=None):
+    """(columns, values) of a CSV body with s_no first, rows without one get next_s_no()"""
+    order = None
+    for columns, values in iter_csv_tools(iter_csv_lines(body.iter_chunks(S3_READ_CHUNK_BYTES)), rejected):
+        if order is None:
+            names = ['s_no'] + [name for name in columns if name != 's_no']
+            order = [columns.index(name) if name in columns else None for name in names]
+        row = [None if index is None else values[index] for index in order]
+        if row[0] is None:
+            row[0] = next_s_no()
+        yield names, row
+
+
+def commit_staged_load(redshift_client, cluster_id, database, schema_name, table_name, secret_arn, columns, load_id, attempt_id, rows_loaded, last_s_no, staging_sqls=(), deadline=None):
+    """Move an attempt's staged rows into the table and record the load, in one transaction"""
+    staging = f"{schema_name}.{S3_INGEST_STAGING_TABLE_NAME}"
+    loads = f"{schema_name}.{S3_INGEST_LOADS_TABLE_NAME}"
+    column_list = ', '.join(columns)
+    attempt = sql_string_literal(attempt_id)
+    load = sql_string_literal(load_id)
+    run_batch_statement(redshift_client, cluster_id, database, secret_arn, list(staging_sqls) + [
+        # Two deliveries of one file commit one after the other, the second finds the first's load
+        f"LOCK {loads};",
+        f"INSERT INTO {schema_name}.{table_name} ({column_list}, last_modified) "
+        f"SELECT {column_list}, SYSDATE FROM {staging} WHERE attempt_id = {attempt} "
+        f"AND NOT EXISTS (SELECT 1 FROM {loads} WHERE load_id = {load});",
+        # The file's ids are loaded as they are, later creates must be allocated past them
+        advance_allocator_template(schema_name, table_name, last_s_no),
+        f"INSERT INTO {loads} (load_id, table_name, rows_loaded) "
+        f"VALUES ({load}, {sql_string_literal(table_name)}, {int(rows_loaded)});",
+        f"DELETE FROM {staging} WHERE attempt_id = {attempt} "
+        f"OR staged_at < DATEADD(second, -{S3_INGEST_STAGING_TTL_SECONDS}, GETDATE());",
+    ], query_name="Ingest commit", deadline=deadline)
+
+
+def load_csv_rows(redshift_client, cluster_id, database, schema_name, table_name, secret_arn, body, load_id, deadline=None, rejected=None):
+    """Load a CSV stream through the staging table in bounded multi-row INSERT batches, returns (rows_loaded, batches)"""
+    import uuid
+
+    attempt_id = uuid.uuid4().hex
+    staging = f"{schema_name}.{S3_INGEST_STAGING_TABLE_NAME}"
+    attempt_sql = ", " + sql_string_literal(attempt_id)
+    next_s_no = s_no_reserver(redshift_client, cluster_id, database, schema_name, table_name, secret_arn,
+                              S3_INGEST_BATCH_ROWS, deadline=deadline)
+    rows_loaded = 0
+    batches = 0
+    columns = None
+    last_s_no = None
+    batch = []
+    batch_bytes = 0
+
+    def flush():
+        query = (f"INSERT INTO {staging} ({', '.join(columns)}, attempt_id) VALUES\n"
+                 + ",\n".join(batch) + ";")
+        run_statement(redshift_client, cluster_id, database, secret_arn, query,
+                      query_name="Ingest staging insert", deadline=deadline)
+
+    for columns, values in iter_ingest_rows(body, next_s_no, rejected):
+        # Rendered once here, the flush only joins the rows
+        row = render_values_row(values, attempt_sql)
+        row_bytes = len(row) + 2
+        if batch and (len(batch) >= S3_INGEST_BATCH_ROWS or batch_bytes + row_bytes > BATCH_SQL_MAX_BYTES):
+            flush()
+            rows_loaded += len(batch)
+            batches += 1
+            batch = []
+            batch_bytes = 0
+        batch.append(row)
+        batch_bytes += row_bytes
+        last_s_no = values[0] if last_s_no is None else max(last_s_no, values[0])
+
+    if batch:
+        flush()
+        rows_loaded += len(batch)
+        batches += 1
+
+    if rows_loaded:
+        commit_staged_load(redshift_client, cluster_id, database, schema_name, table_name, secret_arn,
+                           columns, load_id, attempt_id, rows_loaded, last_s_no, deadline=deadline)
+    return rows_loaded, batches
+
+
+def copy_csv_object(redshift_client, cluster_id, database, schema_name, table_name, secret_arn, s3_client, body, bucket, key, load_id, deadline=None, rejected=None):
+    """Stage a column-mapped copy of a large CSV, COPY it into the staging table and load it from there"""
+    import csv
+    import tempfile
+    import uuid
+
+    attempt_id = uuid.uuid4().hex
+    next_s_no = s_no_reserver(redshift_client, cluster_id, database, schema_name, table_name, secret_arn,
+                              S3_COPY_S_NO_BLOCK_SIZE, deadline=deadline)
+    rows_loaded = 0
+    columns = None
+    last_s_no = None
+    # Spills to /tmp past 16 MB instead of growing the heap with the file
+    with tempfile.SpooledTemporaryFile(max_size=16 * 1024 * 1024, mode='w+b') as staged:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row_columns, values in iter_ingest_rows(body, next_s_no, rejected):
+            if columns is None:
+                columns = row_columns
+                writer.writerow(columns + ['attempt_id'])
+            writer.writerow(['' if value is None else value for value in values] + [attempt_id])
+            rows_loaded += 1
+            last_s_no = values[0] if last_s_no is None else max(last_s_no, values[0])
+            if buffer.tell() >= S3_READ_CHUNK_BYTES:
+                staged.write(buffer.getvalue().encode('utf-8'))
+                buffer.seek(0)
+                buffer.truncate()
+        staged.write(buffer.getvalue().encode('utf-8'))
+
+        if not rows_loaded:
+            return 0
+
+        staged.seek(0)
+        staging_bucket = S3_STAGING_BUCKET or bucket
+        # Per attempt, two deliveries of one file must not overwrite each other's input
+        staging_key = f"{S3_STAGING_PREFIX}{attempt_id}-{key.rsplit('/', 1)[-1]}"
+        s3_client.upload_fileobj(staged, staging_bucket, staging_key)
+
+    query = f"""
+COPY {schema_name}.{S3_INGEST_STAGING_TABLE_NAME} ({', '.join(columns)}, attempt_id)
+FROM 's3://{staging_bucket}/{staging_key}'
+IAM_ROLE '{COPY_IAM_ROLE_ARN}'
+CSV IGNOREHEADER 1 EMPTYASNULL;
+"""
+    commit_staged_load(redshift_client, cluster_id, database, schema_name, table_name, secret_arn,
+                       columns, load_id, attempt_id, rows_loaded, last_s_no, staging_sqls=[query], deadline=deadline)
+    return rows_loaded
+
+
+def ingest_s3_event(event, connection, schema_name, table_name, deadline=None):
+    import urllib.parse
+
+    redshift_client = connection['redshift_client']
+    cluster_id = connection['cluster_id']
+    database = connection['database']
+    secret_arn = connection['secret_arn']
+    s3_client = get_s3_client()
+
+    results = []
+    started_loading = False
+    try:
+        for record in event['Records']:
+            if not record.get('eventName', '').startswith('ObjectCreated'):
+                continue
+            bucket = record['s3']['bucket']['name']
+            key = urllib.parse.unquote_plus(record['s3']['object']['key'])
+            if key.startswith(S3_STAGING_PREFIX):
+                # Our own staged COPY input, already loaded
+                continue
+
+            load_id = s3_load_id(bucket, key, record['s3']['object'])
+            previous_rows = loaded_rows(redshift_client, cluster_id, database, schema_name, secret_arn, load_id,
+                                        deadline=deadline)
+            if previous_rows is not None:
+                # A retried or repeated event, the whole file went in the first time
+                print(f"Skipping s3://{bucket}/{key}, already loaded {previous_rows} rows as {load_id}")
+                results.append({'key': key, 'mode': 'already_loaded', 'rows_loaded': 0, 'batches': 0,
+                                'rows_rejected': 0, 'rejected': []})
+                continue
+
+            print(f"Ingesting s3://{bucket}/{key}")
+            # From here on s_no values may be reserved and the file committed
+            started_loading = True
+            obj = s3_client.get_object(Bucket=bucket, Key=key)
+            started = time.monotonic()
+            rejected = {'count': 0, 'rows': []}
+
+            if COPY_IAM_ROLE_ARN and obj.get('ContentLength', 0) >= S3_COPY_THRESHOLD_BYTES:
+                rows_loaded = copy_csv_object(redshift_client, cluster_id, database, schema_name, table_name, secret_arn,
+                                              s3_client, obj['Body'], bucket, key, load_id, deadline=deadline,
+                                              rejected=rejected)
+                mode, batches = 'copy', 1
+            else:
+                rows_loaded, batches = load_csv_rows(redshift_client, cluster_id, database, schema_name, table_name,
+                                                     secret_arn, obj['Body'], load_id, deadline=deadline,
+                                                     rejected=rejected)
+                mode = 'insert'
+
+            elapsed = time.monotonic() - started
+            print(f"Loaded {rows_loaded} rows from {key} in {batches} batches ({mode}), {elapsed:.2f}s")
+            if rejected['count']:
+                first = rejected['rows'][0]
+                print(f"Skipped {rejected['count']} rows of {key}, first at line {first['line']}: {first['error']}")
+                record_metric('RejectedRows', rejected['count'], 'Count')
+            results.append({'key': key, 'mode': mode, 'rows_loaded': rows_loaded, 'batches': batches,
+                            'rows_rejected': rejected['count'], 'rejected': rejected['rows']})
+    finally:
+        if started_loading:
+            # Ids left in this instance's block may be taken by the loaded files now
+            with _s_no_pool_lock:
+                _s_no_pool.pop((schema_name, table_name), None)
+            table_written(redshift_client, cluster_id, database, schema_name, table_name, secret_arn)
+
+    return {
+        'statusCode': 200,
+        'body': json.dumps({'files': results}),
+        'headers': {'Content-Type': 'application/json'}
+    }
+
+
+# Full extracts are UNLOADed to S3 as Parquet instead of going through the
+# Lambda as JSON. The caller gets presigned URLs of the files in a manifest.
+EXPORT_BUCKET = os.environ.get('EXPORT_BUCKET')
+EXPORT_PREFIX = os.environ.get('EXPORT_PREFIX', 'exports/')
+UNLOAD_IAM_ROLE_ARN = os.environ.get('UNLOAD_IAM_ROLE_ARN') or COPY_IAM_ROLE_ARN
+# exportTools waits this long for the UNLOAD, longer exports are polled on exportStatus
+EXPORT_WAIT_SECONDS = float(os.environ.get('EXPORT_WAIT_SECONDS', '10'))
+EXPORT_URL_EXPIRY_SECONDS = int(os.environ.get('EXPORT_URL_EXPIRY_SECONDS', '3600'))
+
+
+def encode_export_id(statement_id, export_key):
+    payload = json.dumps({'id': statement_id, 'key': export_key}, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(payload).decode('ascii').rstrip('=')
+
+
+def decode_export_id(export_id):
+    """Return (statement_id, export_key) from an export id"""
+    try:
+        padded = export_id + '=' * (-len(export_id) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        statement_id, export_key = str(payload['id']), str(payload['key'])
+    except (ValueError, KeyError, TypeError, AttributeError):
+        raise ValueError("Invalid export_id")
+    # The key becomes part of an S3 prefix, only our own hex keys are accepted
+    if len(export_key) != 32 or any(c not in '0123456789abcdef' for c in export_key):
+        raise ValueError("Invalid export_id")
+    return statement_id, export_key
+
+
+def export_prefix(export_key):
+    return f"{EXPORT_PREFIX}{export_key}/"
+
+
+def unload_template(query, parameters, s3_prefix):
+    """UNLOAD of a parameterized SELECT, the parameters inlined as literals"""
+    import re
+
+    # The Data API cannot bind parameters inside the UNLOAD query string
+    query = re.sub(r':(\w+)', lambda match: sql_string_literal(str(parameters[match.group(1)])), query)
+    return (
+        f"UNLOAD ({sql_string_literal(query.rstrip(';'))})\n"
+        f"TO 's3://{EXPORT_BUCKET}/{s3_prefix}'\n"
+        f"IAM_ROLE '{UNLOAD_IAM_ROLE_ARN}'\n"
+        f"FORMAT PARQUET MANIFEST VERBOSE;"
+    )
+
+
+def client_error_code(error):
+    if isinstance(error, botocore.exceptions.ClientError):
+        return error.response.get('Error', {}).get('Code')
+    return None
+
+
+def export_error_response(status_code, export_id, error):
+    return {
+        'statusCode': status_code,
+        'body': json.dumps({'export_id': export_id, 'error': error}),
+        'headers': {'Content-Type': 'application/json'}
+    }
+
+
+def export_manifest_response(export_id, export_key):
+    """200 with presigned URLs of the Parquet files listed in the UNLOAD manifest"""
+    s3_client = get_s3_client()
+    try:
+        obj = s3_client.get_object(Bucket=EXPORT_BUCKET, Key=f"{export_prefix(export_key)}manifest")
+    except botocore.exceptions.ClientError as e:
+        if client_error_code(e) not in ('NoSuchKey', '404'):
+            raise
+        # Removed from the bucket since, e.g. by a lifecycle rule
+        return export_error_response(410, export_id, 'The export files are no longer available')
+    manifest = json.loads(obj['Body'].read())
+
+    files = []
+    for entry in manifest.get('entries', []):
+        # Entries are s3://bucket/key URLs
+        bucket, _, key = entry['url'][len('s3://'):].partition('/')
+        files.append({
+            'url': s3_client.generate_presigned_url('get_object', Params={'Bucket': bucket, 'Key': key},
+                                                    ExpiresIn=EXPORT_URL_EXPIRY_SECONDS),
+            'size': entry.get('meta', {}).get('content_length'),
+            'record_count': entry.get('meta', {}).get('record_count'),
+        })
+    return {
+        'statusCode': 200,
+        'body': json.dumps({
+            'export_id': export_id,
+            'status': 'FINISHED',
+            'format': 'parquet',
+            'record_count': manifest.get('meta', {}).get('record_count'),
+            'files': files,
+            'expires_in': EXPORT_URL_EXPIRY_SECONDS,
+        }),
+        'headers': {'Content-Type': 'application/json'}
+    }
+
+
+def export_pending_response(export_id, status):
+    return {
+        'statusCode': 202,
+        'body': json.dumps({'export_id': export_id, 'status': status}),
+        'headers': {'Content-Type': 'application/json'}
+    }
+
+
+def start_export(redshift_client, cluster_id, database, schema_name, table_name, secret_arn, query_parameters, deadline=None):
+    """UNLOAD the filtered / projected catalog to S3, 200 with the manifest if it finishes in time, else 202"""
+    try:
+        # Exports default to every column, the large texts are what analysts want
+        columns = parse_fields_param(query_parameters, None)
+        filters = parse_filter_params(query_parameters)
+    except ValueError as ve:
+        return {
+            'statusCode': 400,
+            'body': json.dumps({'error': str(ve)}),
+            'headers': {'Content-Type': 'application/json'}
+        }
+    if not EXPORT_BUCKET or not UNLOAD_IAM_ROLE_ARN:
+        return {
+            'statusCode': 500,
+            'body': json.dumps({'error': 'Exports need EXPORT_BUCKET and UNLOAD_IAM_ROLE_ARN'}),
+            'headers': {'Content-Type': 'application/json'}
+        }
+
+    import uuid
+
+    export_key = uuid.uuid4().hex
+    query = list_tools_template(schema_name, table_name, filter_shape(filters), 's_no', False, None, None, columns)
+    try:
+        statement_id = submit_statement(redshift_client, cluster_id, database, secret_arn,
+                                        unload_template(query, filter_parameters(filters), export_prefix(export_key)))
+    except botocore.exceptions.ClientError as e:
+        if is_auth_error(e):
+            raise
+        print(f"Error starting export: {str(e)}")
+        return export_error_response(500, None, f"The export could not be started: {client_error_code(e)}")
+    export_id = encode_export_id(statement_id, export_key)
+    print(f"Export {export_key} started as statement {statement_id}")
+
+    wait_deadline = time.monotonic() + EXPORT_WAIT_SECONDS
+    if deadline is not None:
+        wait_deadline = min(wait_deadline, deadline)
+    try:
+        # Still running when the wait is over: the UNLOAD goes on, exportStatus follows it
+        wait_for_query(redshift_client, statement_id, query_name="Export UNLOAD", deadline=wait_deadline,
+                       cancel_on_timeout=False)
+    except StatementTimeoutError:
+        return export_pending_response(export_id, 'STARTED')
+    except StatementFailedError as e:
+        return {
+            'statusCode': 500,
+            'body': json.dumps({'export_id': export_id, 'status': 'FAILED', 'error': str(e)}),
+            'headers': {'Content-Type': 'application/json'}
+        }
+    return export_manifest_response(export_id, export_key)
+
+
+def get_export_status(redshift_client, query_parameters):
+    export_id = query_parameters.get('export_id') or ''
+    try:
+        statement_id, export_key = decode_export_id(export_id)
+    except ValueError as ve:
+        return {
+            'statusCode': 400,
+            'body': json.dumps({'error': str(ve)}),
+            'headers': {'Content-Type': 'application/json'}
+        }
 
+    try:
+        status_response = redshift_client.describe_statement(Id=statement_id)
+    except botocore.exceptions.ClientError as e:
+        if is_auth_error(e) or client_error_code(e) not in ('ResourceNotFoundException', 'ValidationException'):
+            raise
+        # Data API statement ids expire after 24 hours, an old export_id cannot be told from an unknown one
+        return export_error_response(404, export_id, 'Unknown or expired export_id')
+    status = status_response['Status']
+    if status == 'FINISHED':
+        return export_manifest_response(export_id, export_key)
+    if status in ['FAILED', 'ABORTED']:
+        return {
+            'statusCode': 500,
+            'body': json.dumps({'export_id': export_id, 'status': status,
+                                'error': status_response.get('Error', 'Unknown error')}),
+            'headers': {'Content-Type': 'application/json'}
+        }
+    return export_pending_response(export_id, status)
+
+
+# Optional write-behind: with WRITE_BEHIND_QUEUE_URL set, createTool, updateTool
+# and deleteTool are validated and queued, and queue_handler applies each SQS
+# batch with one set-based statement per operation type. Use a FIFO queue to
+# keep the writes to one s_no in order.
+WRITE_BEHIND_QUEUE_URL = os.environ.get('WRITE_BEHIND_QUEUE_URL')
+WRITE_BEHIND_OPERATIONS = {
+    CREATE_RAW_PATH: 'create',
+    UPDATE_RAW_PATH: 'update',
+    DELETE_RAW_PATH: 'delete',
+}
+
+_sqs_client = None
+
+
+def get_sqs_client():
+    # The queue lives in the Lambda's own account, like the ingest bucket
+    global _sqs_client
+    if _sqs_client is None:
+        _sqs_client = boto3.client('sqs')
+    return _sqs_client
+
+
+def validate_write(operation, payload):
+    """Return an error message for a write that cannot be queued, None if it can"""
+    if operation == 'create':
+        return validate_tool_item(payload)
+    if operation == 'update':
+        return validate_tool_update(payload)
+    s_no = payload.get('s_no') if isinstance(payload, dict) else None
+    if isinstance(s_no, bool) or not isinstance(s_no, int):
+        return "s_no is required and must be an integer"
+    return None
+
+
+def enqueue_write(redshift_client, cluster_id, database, schema_name, table_name, secret_arn, operation, request_body, deadline=None):
+    """Validate a single write and queue it, 202 with the request id (and the s_no of a create)"""
+    payload = dict(request_body) if isinstance(request_body, dict) else request_body
+    if isinstance(payload, dict) and isinstance(payload.get('s_no'), str) and payload['s_no'].isdigit():
+        payload['s_no'] = int(payload['s_no'])
+    error = validate_write(operation, payload)
+    if error:
+        return {
+            'statusCode': 400,
+            'body': json.dumps({'error': error}),
+            'headers': {'Content-Type': 'application/json'}
+        }
+
+    import uuid
+
+    request_id = uuid.uuid4().hex
+    try:
+        if operation == 'create':
+            # Allocated now so the caller gets its s_no back, the consumer inserts with it
+            payload['s_no'] = allocate_s_no(redshift_client, cluster_id, database, schema_name, table_name,
+                                            secret_arn, deadline=deadline)
+        message = {
+            'QueueUrl': WRITE_BEHIND_QUEUE_URL,
+            'MessageBody': json.dumps({'request_id': request_id, 'operation': operation, 'payload': payload}),
+        }
+        if WRITE_BEHIND_QUEUE_URL.endswith('.fifo'):
+            message['MessageGroupId'] = str(payload['s_no'])
+            message['MessageDeduplicationId'] = request_id
+        get_sqs_client().send_message(**message)
     except Exception as e:
+        if is_auth_error(e):
+            raise
+        error_message = f"Error queueing {operation}: {str(e)}"
+        print(error_message)
         return {
             'statusCode': 500,
-            'body': json.dumps({
-                'error': str(e)
-            }),
-            'headers': {
-                'Content-Type': 'application/json'
+            'body': json.dumps({'error': error_message}),
+            'headers': {'Content-Type': 'application/json'}
+        }
+
+    body = {'request_id': request_id, 'status': 'queued', 'operation': operation, 's_no': payload['s_no']}
+    return {
+        'statusCode': 202,
+        'body': json.dumps(body),
+        'headers': {'Content-Type': 'application/json'}
+    }
+
+
+def parse_queued_write(record):
+    """Return (operation, payload) of a write-behind message, ValueError if it can never be applied"""
+    try:
+        message = json.loads(record['body'])
+        operation = message['operation']
+        payload = message['payload']
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError(f"Malformed message: {str(e)}")
+    if operation not in ('create', 'update', 'delete'):
+        raise ValueError(f"Unknown operation: {operation}")
+    if operation == 'create' and isinstance(payload, dict):
+        # A queued create carries the s_no allocated when it was accepted
+        s_no = payload.get('s_no')
+        if isinstance(s_no, bool) or not isinstance(s_no, int):
+            error = "Queued create without an s_no"
+        else:
+            error = validate_write(operation, {name: value for name, value in payload.items() if name != 's_no'})
+    else:
+        error = validate_write(operation, payload)
+    if error:
+        raise ValueError(error)
+    return operation, payload
+
+
+def apply_queued_writes(connection, schema_name, table_name, records, deadline=None):
+    """Apply one SQS batch, one set-based statement per operation type, returns the failed message ids"""
+    redshift_client = connection['redshift_client']
+    cluster_id = connection['cluster_id']
+    database = connection['database']
+    secret_arn = connection['secret_arn']
+
+    groups = {'create': [], 'update': [], 'delete': []}
+    for record in records:
+        try:
+            operation, payload = parse_queued_write(record)
+        except ValueError as e:
+            # Redelivery cannot fix it, so it is dropped instead of failing the batch
+            print(f"Dropping write-behind message {record.get('messageId')}: {str(e)}")
+            continue
+        groups[operation].append((record['messageId'], payload))
+
+    def existing_s_nos(s_nos, query_name):
+        statement = run_statement(redshift_client, cluster_id, database, secret_arn,
+                                  f"SELECT s_no FROM {schema_name}.{table_name} "
+                                  f"WHERE s_no IN ({', '.join(str(int(s_no)) for s_no in s_nos)});",
+                                  query_name=query_name, deadline=deadline)
+        existing = set()
+        for page in iter_result_pages(redshift_client, statement.statement_id):
+            existing.update(int(record[0]['longValue']) for record in page['Records'])
+        return existing
+
+    # Each apply_* returns the message ids to redeliver, an exception fails the whole group
+
+    def apply_creates(items):
+        # SQS delivers at least once, rows of an earlier delivery are not inserted twice
+        existing = existing_s_nos([payload['s_no'] for _, payload in items], "Queued create check")
+        payloads = [payload for _, payload in items if payload['s_no'] not in existing]
+        for start in range(0, len(payloads), MAX_BATCH_SIZE):
+            chunk = payloads[start:start + MAX_BATCH_SIZE]
+            tools = [{name: value for name, value in payload.items() if name != 's_no'} for payload in chunk]
+            success, _, error_message = insert_tools_batch(redshift_client, cluster_id, database, schema_name,
+                                                           table_name, secret_arn, tools, deadline=deadline,
+                                                           s_nos=[payload['s_no'] for payload in chunk])
+            if not success:
+                raise Exception(error_message)
+        return []
+
+    def apply_updates(items):
+        # Several updates of one s_no are merged in queue order, the last value of a column wins
+        merged = {}
+        for _, payload in items:
+            merged.setdefault(payload['s_no'], {}).update(payload)
+        found = apply_tool_updates(redshift_client, cluster_id, database, schema_name, table_name, secret_arn,
+                                   list(merged.values()), deadline=deadline)
+        missing = sorted(set(merged) - found)
+        if missing:
+            # The row may not be there yet, a write that never finds it ends in the dead-letter queue
+            print(f"Queued updates for unknown s_no values, left for redelivery: {missing}")
+        return [message_id for message_id, payload in items if payload['s_no'] not in found]
+
+    def apply_deletes(items):
+        # Rows already soft deleted count as applied, rows not there at all are redelivered
+        existing = existing_s_nos(sorted({payload['s_no'] for _, payload in items}), "Queued delete check")
+        if existing:
+            set_tools_display(redshift_client, cluster_id, database, schema_name, table_name, secret_arn, False,
+                              s_nos=sorted(existing), deadline=deadline)
+        missing = sorted({payload['s_no'] for _, payload in items} - existing)
+        if missing:
+            print(f"Queued deletes for unknown s_no values, left for redelivery: {missing}")
+        return [message_id for message_id, payload in items if payload['s_no'] not in existing]
+
+    failed = []
+    failed_create_s_nos = set()
+    # Creates first, so updates and deletes of a row created in the same batch find it
+    for operation, apply in (('create', apply_creates), ('update', apply_updates), ('delete', apply_deletes)):
+        items = groups[operation]
+        # Writes to a row whose create failed in this batch are redelivered along with it
+        blocked = [message_id for message_id, payload in items if payload['s_no'] in failed_create_s_nos]
+        if blocked:
+            print(f"{len(blocked)} queued {operation}s wait for a failed create")
+            failed.extend(blocked)
+            items = [(message_id, payload) for message_id, payload in items if payload['s_no'] not in failed_create_s_nos]
+        if not items:
+            continue
+
+        if deadline is not None and time.monotonic() >= deadline:
+            # Out of time: redelivered instead of submitted only to be cancelled
+            print(f"Deadline reached, {len(items)} queued {operation}s left for redelivery")
+            group_failed = [message_id for message_id, _ in items]
+        else:
+            try:
+                group_failed = apply(items)
+                print(f"Applied {len(items) - len(group_failed)} queued {operation}s")
+            except Exception as e:
+                if is_auth_error(e):
+                    # The redelivered messages get a fresh connection
+                    invalidate_connection_cache()
+                print(f"Error applying {len(items)} queued {operation}s: {str(e)}")
+                group_failed = [message_id for message_id, _ in items]
+        failed.extend(group_failed)
+
+        if operation == 'create':
+            group_failed = set(group_failed)
+            failed_create_s_nos = {payload['s_no'] for message_id, payload in items if message_id in group_failed}
+    return failed
+
+
+# Creates sent with an Idempotency-Key header run once per key: repeats get the
+# stored response back. Recent keys are kept in process, every key is also
+# written to a table for IDEMPOTENCY_TTL_SECONDS so a retry landing on another
+# instance is answered too. The key is claimed in the table before the create
+# runs, a retry arriving while it still runs gets a 409.
+IDEMPOTENT_ROUTES = (CREATE_RAW_PATH, CREATE_BATCH_RAW_PATH)
+IDEMPOTENCY_TABLE_NAME = os.environ.get('IDEMPOTENCY_TABLE_NAME', 'csp_tools_idempotency')
+IDEMPOTENCY_TTL_SECONDS = int(os.environ.get('IDEMPOTENCY_TTL_SECONDS', '86400'))
+# status_code of a claimed key whose create has not answered yet. Claims older
+# than IDEMPOTENCY_PENDING_SECONDS belong to an invocation that died.
+IDEMPOTENCY_PENDING_STATUS = 0
+IDEMPOTENCY_PENDING_SECONDS = int(os.environ.get('IDEMPOTENCY_PENDING_SECONDS', '60'))
+IDEMPOTENCY_CACHE_SIZE = int(os.environ.get('IDEMPOTENCY_CACHE_SIZE', '1024'))
+MAX_IDEMPOTENCY_KEY_LENGTH = 255
+# response_body is a VARCHAR(65535), larger responses are only kept in process
+IDEMPOTENCY_MAX_STORED_BYTES = 65535
+
+_idempotency_cache = OrderedDict()
+_idempotency_lock = threading.Lock()
+
+
+def get_idempotency_key(event):
+    headers = {k.lower(): v for k, v in (event.get('headers') or {}).items()}
+    return (headers.get('idempotency-key') or '').strip() or None
+
+
+def cached_idempotent_response(cache_key):
+    with _idempotency_lock:
+        entry = _idempotency_cache.get(cache_key)
+        if entry is None:
+            return None
+        expire_at, stored = entry
+        if time.monotonic() >= expire_at:
+            del _idempotency_cache[cache_key]
+            return None
+        _idempotency_cache.move_to_end(cache_key)
+        return stored
+
+
+def cache_idempotent_response(cache_key, stored):
+    with _idempotency_lock:
+        _idempotency_cache[cache_key] = (time.monotonic() + IDEMPOTENCY_TTL_SECONDS, stored)
+        _idempotency_cache.move_to_end(cache_key)
+        while len(_idempotency_cache) > IDEMPOTENCY_CACHE_SIZE:
+            _idempotency_cache.popitem(last=False)
+
+
+def claim_idempotency_key(connection, schema_name, table_name, idempotency_key, request_hash, deadline=None):
+    """Record the key as pending unless a live row has it already
+
+    Returns (claimed, stored), stored being (request_hash, status_code, body)
+    of the row found, status_code IDEMPOTENCY_PENDING_STATUS while its create runs.
+    """
+    redshift_client = connection['redshift_client']
+    idempotency_table = f"{schema_name}.{IDEMPOTENCY_TABLE_NAME}"
+    key = sql_string_literal(idempotency_key)
+    table = sql_string_literal(table_name)
+    live_row = (
+        f"idempotency_key = {key} AND table_name = {table} "
+        f"AND created_at > DATEADD(second, -{IDEMPOTENCY_TTL_SECONDS}, GETDATE()) "
+        f"AND (status_code <> {IDEMPOTENCY_PENDING_STATUS} "
+        f"OR created_at > DATEADD(second, -{IDEMPOTENCY_PENDING_SECONDS}, GETDATE()))"
+    )
+    try:
+        # Batches take no parameters, the values are inlined as literals
+        statement = run_batch_statement(
+            redshift_client, connection['cluster_id'], connection['database'], connection['secret_arn'],
+            [
+                # Held to the end of the batch, of two attempts with one key only the first inserts
+                f"LOCK {idempotency_table};",
+                f"SELECT request_hash, status_code, response_body FROM {idempotency_table} "
+                f"WHERE {live_row} ORDER BY created_at LIMIT 1;",
+                f"INSERT INTO {idempotency_table} (idempotency_key, table_name, request_hash, status_code) "
+                f"SELECT {key}, {table}, {sql_string_literal(request_hash)}, {IDEMPOTENCY_PENDING_STATUS} "
+                f"WHERE NOT EXISTS (SELECT 1 FROM {idempotency_table} WHERE {live_row});",
+            ],
+            query_name="Idempotency claim", deadline=deadline,
+        )
+        result = redshift_client.get_statement_result(Id=f"{statement.statement_id}:2")
+    except StatementFailedError as e:
+        # Without the table the key is still honoured by this instance
+        print(f"Error claiming idempotency key: {str(e)}")
+        return False, None
+    if not result['Records']:
+        return True, None
+    row = result['Records'][0]
+    return False, (row[0]['stringValue'], int(row[1]['longValue']), row[2].get('stringValue'))
+
+
+def release_idempotency_key(connection, schema_name, table_name, idempotency_key):
+    """Drop our pending claim, so a retry of a create that did not succeed runs it again"""
+    try:
+        submit_statement(connection['redshift_client'], connection['cluster_id'], connection['database'],
+                         connection['secret_arn'],
+                         sql_template('release_idempotency_key', schema_name, table_name),
+                         parameters={'idempotency_key': idempotency_key, 'table_name': table_name})
+    except Exception as e:
+        # Left behind, the claim expires after IDEMPOTENCY_PENDING_SECONDS
+        record_metric('IdempotencySaveFailures', 1, 'Count')
+        print(f"Error releasing idempotency key: {str(e)}")
+
+
+def save_idempotent_response(connection, schema_name, table_name, idempotency_key, stored):
+    request_hash, status_code, body = stored
+    if len(body.encode('utf-8')) > IDEMPOTENCY_MAX_STORED_BYTES:
+        release_idempotency_key(connection, schema_name, table_name, idempotency_key)
+        return
+    try:
+        # Fire and forget, the create already succeeded
+        submit_statement(connection['redshift_client'], connection['cluster_id'], connection['database'],
+                         connection['secret_arn'],
+                         sql_template('save_idempotent_response', schema_name, table_name),
+                         parameters={'idempotency_key': idempotency_key, 'table_name': table_name,
+                                     'status_code': status_code, 'response_body': body})
+    except Exception as e:
+        # Not raised even for auth errors, the create before it has committed
+        record_metric('IdempotencySaveFailures', 1, 'Count')
+        print(f"Error saving idempotency key: {str(e)}")
+
+
+def idempotent_write(connection, schema_name, table_name, event, request_body, idempotency_key, deadline=None):
+    """Run a create once per Idempotency-Key, repeats get the first response without touching the table"""
+    if len(idempotency_key) > MAX_IDEMPOTENCY_KEY_LENGTH:
+        return {
+            'statusCode': 400,
+            'body': json.dumps({'error': f'Idempotency-Key is limited to {MAX_IDEMPOTENCY_KEY_LENGTH} characters'}),
+            'headers': {'Content-Type': 'application/json'}
+        }
+
+    # The same key with another payload is a client bug, not a retry
+    payload = json.dumps([event['rawPath'], request_body], sort_keys=True, separators=(',', ':'))
+    request_hash = hashlib.sha256(payload.encode('utf-8')).hexdigest()
+    cache_key = (schema_name, table_name, idempotency_key)
+
+    claimed = False
+    stored = cached_idempotent_response(cache_key)
+    if stored is None:
+        claimed, stored = claim_idempotency_key(connection, schema_name, table_name, idempotency_key,
+                                                request_hash, deadline)
+        if stored is not None and stored[1] != IDEMPOTENCY_PENDING_STATUS:
+            cache_idempotent_response(cache_key, stored)
+    if stored is not None:
+        stored_hash, status_code, body = stored
+        if stored_hash != request_hash:
+            return {
+                'statusCode': 422,
+                'body': json.dumps({'error': 'Idempotency-Key was already used for a different request'}),
+                'headers': {'Content-Type': 'application/json'}
+            }
+        if status_code == IDEMPOTENCY_PENDING_STATUS:
+            record_metric('IdempotencyConflicts', 1, 'Count')
+            return {
+                'statusCode': 409,
+                'body': json.dumps({'error': 'A request with this Idempotency-Key is still running, retry later'}),
+                'headers': {'Content-Type': 'application/json', 'Retry-After': str(DEADLINE_RETRY_AFTER_SECONDS)}
             }
+        record_metric('IdempotentReplays', 1, 'Count')
+        return {
+            'statusCode': status_code,
+            'body': body,
+            'headers': {'Content-Type': 'application/json', 'Idempotent-Replayed': 'true'}
         }
 
+    try:
+        response = route_write_request(event, connection, schema_name, table_name, request_body, deadline)
+    except Exception:
+        if claimed:
+            release_idempotency_key(connection, schema_name, table_name, idempotency_key)
+        raise
+    # Failed creates are not remembered, retrying them should run them again
+    if response and 200 <= response['statusCode'] < 300:
+        stored = (request_hash, response['statusCode'], response['body'])
+        cache_idempotent_response(cache_key, stored)
+        if claimed:
+            save_idempotent_response(connection, schema_name, table_name, idempotency_key, stored)
+    elif claimed:
+        release_idempotency_key(connection, schema_name, table_name, idempotency_key)
+    return response
+
+
+def is_warmup_event(event):
+    # e.g. an EventBridge schedule with the constant input {"warmup": true}
+    return bool(event.get('warmup'))
+
+
+def warm_up(connection, schema_name, table_name, deadline=None):
+    """Prime what a getTools read needs without reading any tools"""
+    # Loaded now so the first compressed read does not pay for the imports
+    load_brotli()
+    import gzip
+
+    version = None
+    try:
+        version = get_table_version(connection['redshift_client'], connection['cluster_id'], connection['database'],
+                                    schema_name, table_name, connection['secret_arn'], deadline=deadline)
+    except StatementFailedError as e:
+        print(f"Error reading table version: {str(e)}")
+    return {
+        'statusCode': 200,
+        'body': json.dumps({'warm': True, 'table_version': version}),
+        'headers': {'Content-Type': 'application/json'}
+    }
+
+
+def route_request(event, connection, schema_name, table_name, deadline=None):
+    redshift_client = connection['redshift_client']
+    cluster_id = connection['cluster_id']
+    database = connection['database']
+    secret_arn = connection['secret_arn']
+
+    if is_warmup_event(event):
+        # The handler has already fetched the connection, that is most of the priming
+        return warm_up(connection, schema_name, table_name, deadline)
+
+    if is_s3_event(event):
+        return ingest_s3_event(event, connection, schema_name, table_name, deadline)
+
+    # Checking for the APIs ==========>
+    print("raw path : ", event['rawPath'])
+    if event['rawPath'] == GET_ALL_TOOLS_PATH:
+        # API Gateway sends null when the request has no query string
+        query_parameters = event.get('queryStringParameters') or {}
+
+        # Conditional GET: a matching ETag is answered from the table version alone
+        encoding = negotiate_encoding(event)
+        etag = None
+        try:
+            version = get_table_version(redshift_client, cluster_id, database, schema_name, table_name, secret_arn, deadline=deadline)
+            etag = make_etag(version, event['rawPath'], query_parameters, encoding)
+        except StatementFailedError as e:
+            # Without a version the read still works, just unconditionally
+            print(f"Error reading table version: {str(e)}")
+
+        if etag and etag_matches(event, etag):
+            return {
+                'statusCode': 304,
+                'body': '',
+                'headers': {'ETag': etag, 'Cache-Control': 'no-cache', 'Vary': 'Accept-Encoding'}
+            }
+
+        response = read_tools(
+            redshift_client,
+            cluster_id,
+            database,
+            schema_name,
+            table_name,
+            secret_arn,
+            query_parameters,
+            deadline=deadline
+        )
+        if etag and response['statusCode'] == 200:
+            response['headers']['ETag'] = etag
+            response['headers']['Cache-Control'] = 'no-cache'
+        if response['statusCode'] == 200:
+            response['headers']['Vary'] = 'Accept-Encoding'
+            response = compress_response(response, encoding)
+        return response
+
+        # return retrieve_data(redshift_client, cluster_id, database, schema_name,table_name, secret_arn)
+
+    if event['rawPath'] == EXPORT_RAW_PATH:
+        return start_export(redshift_client, cluster_id, database, schema_name, table_name, secret_arn,
+                            event.get('queryStringParameters') or {}, deadline=deadline)
+
+    if event['rawPath'] == EXPORT_STATUS_RAW_PATH:
+        return get_export_status(redshift_client, event.get('queryStringParameters') or {})
+
+    if event['rawPath'] == SUMMARY_RAW_PATH:
+        return get_tool_summary(redshift_client, cluster_id, database, schema_name, table_name, secret_arn,
+                                deadline=deadline)
+
+    request_body = json.loads(event['body'])
+
+    # A retried create with the same Idempotency-Key gets the first response back
+    idempotency_key = get_idempotency_key(event) if event['rawPath'] in IDEMPOTENT_ROUTES else None
+    if idempotency_key:
+        return idempotent_write(connection, schema_name, table_name, event, request_body, idempotency_key, deadline)
+    return route_write_request(event, connection, schema_name, table_name, request_body, deadline)
+
+
+def route_write_request(event, connection, schema_name, table_name, request_body, deadline=None):
+    redshift_client = connection['redshift_client']
+    cluster_id = connection['cluster_id']
+    database = connection['database']
+    secret_arn = connection['secret_arn']
+
+    if WRITE_BEHIND_QUEUE_URL and event['rawPath'] in WRITE_BEHIND_OPERATIONS:
+        return enqueue_write(redshift_client, cluster_id, database, schema_name, table_name, secret_arn,
+                             WRITE_BEHIND_OPERATIONS[event['rawPath']], request_body, deadline=deadline)
+    # tool_name = request_body.get('tool_name')
+
+    # print("request body",  request_body)
+    # print("tool_name", tool_name)
+
+    # # Validate tool_name presence
+    # if not tool_name:
+    #     return {
+    #         'statusCode': 400,
+    #         'body': json.dumps({
+    #             'error': 'tool_name is required in the request'
+    #         }),
+    #         'headers': {
+    #             'Content-Type': 'application/json'
+    #         }
+    #     }
+        
+           
+    # # Check if tool already exists
+    # tool_exists = check_tool_exists(
+    #     redshift_client, 
+    #     cluster_id, 
+    #     database, 
+    #     schema_name,
+    #     table_name, 
+    #     secret_arn,
+    #     tool_name
+    # )
+
+    # print("tool_exists result from the lambda handler : ", tool_exists)
+
+    if event['rawPath'] == CREATE_BATCH_RAW_PATH:
+        return create_tools_batch(redshift_client, cluster_id, database, schema_name, table_name, secret_arn, request_body, deadline=deadline)
+
+    if event['rawPath'] == UPDATE_BATCH_RAW_PATH:
+        return update_tools_batch(redshift_client, cluster_id, database, schema_name, table_name, secret_arn, request_body, deadline=deadline)
+
+    if event['rawPath'] in [DELETE_BATCH_RAW_PATH, RESTORE_BATCH_RAW_PATH]:
+        return bulk_set_display(redshift_client, cluster_id, database, schema_name, table_name, secret_arn, request_body,
+                                event['rawPath'] == RESTORE_BATCH_RAW_PATH, deadline=deadline)
+
+    if event['rawPath'] == CREATE_RAW_PATH:
+        success, new_s_no, error_message = insert_tool_data(redshift_client, cluster_id, database, schema_name,table_name, secret_arn, request_body, deadline=deadline) # tool_exists, tool_name, request_body)
+
+        if success:
+            return {
+                "statusCode": 201,
+                "body": json.dumps(
+                    {
+                        "message": "Tool successfully created",
+                        "s_no": new_s_no,
+                        "data": request_body,
+                    }
+                ),
+                "headers": {"Content-Type": "application/json"},
+            }
+        else:
+            return {
+                "statusCode": 400,
+                "body": json.dumps(
+                    {"message": "Failed to create tool", "error": error_message}
+                ),
+                "headers": {"Content-Type": "application/json"},
+            }
+
+
+    s_no = request_body.get('s_no')
+    if not s_no and event['rawPath'] in [UPDATE_RAW_PATH, DELETE_RAW_PATH]:
+        return {
+            'statusCode': 400,
+            'body': json.dumps({'error': 's_no is required in the request'}),
+            'headers': {'Content-Type': 'application/json'}
+        }
+
+    if event['rawPath'] == UPDATE_RAW_PATH:
+        return check_And_Update(redshift_client, cluster_id, database, schema_name,table_name, secret_arn, s_no, request_body, deadline=deadline)
+    if event['rawPath'] == DELETE_RAW_PATH:
+        print(" Delete Request ")
+        return check_And_Delete(redshift_client, cluster_id, database, schema_name,table_name, secret_arn, s_no, request_body, deadline=deadline)
+
+    return None
+
 
 
 def lambda_handler(event, context):
     # TODO implement
 
-    print("Event ====>>>>> ", event)
+    global _cold_start
+    cold_start, _cold_start = _cold_start, False
+    started = time.perf_counter()
+
+    if DEBUG_LOGGING:
+        print("Event ====>>>>> ", event)
 
     # print(event)
     # if event['rawPath'] ==  GET_RAW_PATH:
@@ -871,185 +3311,93 @@ def lambda_handler(event, context):
 
     
     try:
-        
-        # Assume role to get credentials for accessing Redshift
-        redshift_region = os.environ.get('REDSHIFT_REGION', 'us-east-1')
-        Role_Arn = os.environ['Role_Arn']
-        session_name = "cross_acct_lambda"
-
-        print("redshift_region  ==> ", redshift_region)
-        print("Role_Arn  ==> ", Role_Arn)
-        
-
-        Credentials = assume_role(Role_Arn, session_name)
-        access_key = Credentials['AccessKeyId']
-        secret_key = Credentials['SecretAccessKey']
-        session_token = Credentials['SessionToken']
-
-        print("access_key ==> ", access_key)
-        print("secret_key ==> ", secret_key)
-        print("session_token ==> ", session_token)
-
-
-        # Fetch RedShift credentials from Secrets Manager
-        secret_name = os.environ["SecretId"]
-        print("secret_name ==> ", secret_name)
 
+        schema_name = os.environ['SCHEMA_NAME']
+        table_name = os.environ['REDSHIFT_TABLE_NAME']
 
-        response = get_secret(secret_name, access_key, secret_key, session_token, redshift_region)
-        secret_arn = response['ARN']
-        print("secret_arn ==> ", secret_arn)
+        # Every statement of this invocation has to finish before the Lambda times out
+        deadline = get_deadline(context)
 
-        secret = response['SecretString']
-        print("secret ==> ", secret)
+        # Reuses the credentials / secret / client cached by earlier warm invocations
+        connection = get_redshift_connection()
 
-        secret_json = json.loads(secret)
-        print("secret_json  ==> ", secret_json)
+        try:
+            response = route_request(event, connection, schema_name, table_name, deadline)
+        except Exception as e:
+            if not is_auth_error(e) or committed_writes():
+                # Once a write went in, running the request again would repeat it
+                raise
+            # Cached credentials or secret went stale, rebuild them and retry once
+            print(f"Auth error, refreshing cached connection: {str(e)}")
+            connection = get_redshift_connection(force_refresh=True)
+            response = route_request(event, connection, schema_name, table_name, deadline)
+
+        log_debug("Connection cache stats: ", cache_stats)
+        if response and isinstance(response.get('body'), str):
+            record_metric('ResponseBytes', len(response['body']), 'Bytes')
+        return response
+
+    except RetryLaterError as e:
+        # Cancelled before the Lambda timed out, or lost to concurrent writers: the client can simply retry
+        if isinstance(e, StatementTimeoutError):
+            print(f"Deadline exceeded: {str(e)}")
+            record_metric('DeadlineExceeded', 1, 'Count')
+            error_message = 'The request did not finish in time, retry later'
+        else:
+            print(f"Retry later: {str(e)}")
+            error_message = 'Too many concurrent writes, retry later'
+        if 'rawPath' not in event:
+            # S3 and warm-up invocations are async, only a failed invocation gets retried
+            raise
+        return {
+            'statusCode': 503,
+            'body': json.dumps({'error': error_message}),
+            'headers': {'Content-Type': 'application/json', 'Retry-After': str(DEADLINE_RETRY_AFTER_SECONDS)}
+        }
 
+    except Exception as e:
+        record_metric('Errors', 1, 'Count')
+        print(f"Error: {str(e)}")
+        import traceback
+        print(f"Traceback: {traceback.format_exc()}")
+        raise
 
-        # Initialize Redshift client
-        cluster_id = secret_json['dbClusterIdentifier']
-        print("Cluster_id ==> ", cluster_id)
-        database = secret_json['dbname']
-        print("database name => ", database)
-        table = os.environ["REDSHIFT_TABLE_NAME"]
-        print("table ==> ", table)
+    finally:
+        record_metric('TotalTime', (time.perf_counter() - started) * 1000)
+        emit_metrics(route_name(event), cold_start)
 
 
-        redshift_client= create_redshift_client(access_key, secret_key, session_token, redshift_region)
-        print(redshift_client)
+def queue_handler(event, context):
+    """Entry point of the write-behind consumer, reports failed messages as a partial batch response"""
+    global _cold_start
+    cold_start, _cold_start = _cold_start, False
+    started = time.perf_counter()
+    records = event.get('Records') or []
 
-        # Create and execute INSERT statement
+    try:
         schema_name = os.environ['SCHEMA_NAME']
         table_name = os.environ['REDSHIFT_TABLE_NAME']
+        deadline = get_deadline(context)
+        connection = get_redshift_connection()
 
-        # print("Schema name ===> ", schema_name)
-        # print("Table name ===> ", table_name)
-
-
-        # Ended redshift logic, checking for the APIs ==========>
-        print("raw path : ", event['rawPath'])
-        if event['rawPath'] == GET_ALL_TOOLS_PATH:
-            query_parameters = event.get('queryStringParameters', {})
-            
-            if 's_no' in query_parameters:
-                s_no = query_parameters['s_no']
-                print(f"Request type: Get specific tool with s_no {s_no}")
-                return get_tool_by_s_no(
-                    redshift_client,
-                    cluster_id,
-                    database,
-                    schema_name,
-                    table_name,
-                    secret_arn,
-                    s_no
-                )
-            elif 'login' in query_parameters:
-                login = query_parameters['login']
-                print(f"Request type: Get tools for login {login}")
-                return get_tools_by_login(
-                    redshift_client,
-                    cluster_id,
-                    database,
-                    schema_name,
-                    table_name,
-                    secret_arn,
-                    login
-                )
-            else:
-                print("Request type: Get all tools")
-                return retrieve_data(
-                    redshift_client,
-                    cluster_id,
-                    database,
-                    schema_name,
-                    table_name,
-                    secret_arn
-                )
-
-            # return retrieve_data(redshift_client, cluster_id, database, schema_name,table_name, secret_arn)
-
-        request_body = json.loads(event['body'])
-        # tool_name = request_body.get('tool_name')
-
-        # print("request body",  request_body)
-        # print("tool_name", tool_name)
-
-        # # Validate tool_name presence
-        # if not tool_name:
-        #     return {
-        #         'statusCode': 400,
-        #         'body': json.dumps({
-        #             'error': 'tool_name is required in the request'
-        #         }),
-        #         'headers': {
-        #             'Content-Type': 'application/json'
-        #         }
-        #     }
-            
-               
-        # # Check if tool already exists
-        # tool_exists = check_tool_exists(
-        #     redshift_client, 
-        #     cluster_id, 
-        #     database, 
-        #     schema_name,
-        #     table_name, 
-        #     secret_arn,
-        #     tool_name
-        # )
-
-        # print("tool_exists result from the lambda handler : ", tool_exists)
-
-        if event['rawPath'] == CREATE_RAW_PATH:
-            success, new_s_no, error_message = insert_tool_data(redshift_client, cluster_id, database, schema_name,table_name, secret_arn, request_body) # tool_exists, tool_name, request_body)
-
-            if success:
-                return {
-                    "statusCode": 201,
-                    "body": json.dumps(
-                        {
-                            "message": "Tool successfully created",
-                            "s_no": new_s_no,
-                            "data": request_body,
-                        }
-                    ),
-                    "headers": {"Content-Type": "application/json"},
-                }
-            else:
-                return {
-                    "statusCode": 400,
-                    "body": json.dumps(
-                        {"message": "Failed to create tool", "error": error_message}
-                    ),
-                    "headers": {"Content-Type": "application/json"},
-                }
-
-
-        s_no = request_body.get('s_no')
-        if not s_no and event['rawPath'] in [UPDATE_RAW_PATH, DELETE_RAW_PATH]:
-            return {
-                'statusCode': 400,
-                'body': json.dumps({'error': 's_no is required in the request'}),
-                'headers': {'Content-Type': 'application/json'}
-            }
-
-        tool_exists = check_s_no_exists(redshift_client, cluster_id, database, schema_name, table_name, secret_arn, s_no)
-
-        
-        if event['rawPath'] == UPDATE_RAW_PATH:
-            return check_And_Update(redshift_client, cluster_id, database, schema_name,table_name, secret_arn, tool_exists, s_no, request_body)
-        if event['rawPath'] == DELETE_RAW_PATH:
-            print(" Delete Request ")
-            return check_And_Delete(redshift_client, cluster_id, database, schema_name,table_name, secret_arn, tool_exists, s_no, request_body)
-
+        failed = apply_queued_writes(connection, schema_name, table_name, records, deadline)
+        record_metric('QueuedWrites', len(records), 'Count')
+        record_metric('FailedWrites', len(failed), 'Count')
+        return {'batchItemFailures': [{'itemIdentifier': message_id} for message_id in failed]}
 
     except Exception as e:
+        # Without a connection nothing was applied, the whole batch is retried
+        record_metric('Errors', 1, 'Count')
         print(f"Error: {str(e)}")
         import traceback
         print(f"Traceback: {traceback.format_exc()}")
         raise
 
+    finally:
+        record_metric('TotalTime', (time.perf_counter() - started) * 1000)
+        emit_metrics('writeBehind', cold_start)
 
 
-    return None
+# Only inside the Lambda runtime, importing the module anywhere else stays side effect free
+if INIT_PRIME_CONNECTION and os.environ.get('AWS_LAMBDA_FUNCTION_NAME'):
+    prime_connection()
@@ -26,6 +26,72 @@ CREATE TABLE csp_tools.csp_tools_data1
 DISTSTYLE AUTO SORTKEY(s_no);
 
 
+# Counter the lambda reserves blocks of s_no values from (replaces LOCK TABLE + MAX(s_no))
+CREATE TABLE csp_tools.csp_tools_id_allocator
+(
+    table_name VARCHAR(255) PRIMARY KEY NOT NULL,
+    next_s_no BIGINT NOT NULL
+);
+
+INSERT INTO csp_tools.csp_tools_id_allocator (table_name, next_s_no)
+SELECT 'csp_tools_data1', COALESCE(MAX(s_no), 0) + 1 FROM csp_tools.csp_tools_data1;
+
+
+# Time of the last write to each row, set by every write from the lambda (getTools?since=)
+ALTER TABLE csp_tools.csp_tools_data1
+ADD COLUMN last_modified TIMESTAMP;
+
+UPDATE csp_tools.csp_tools_data1 SET last_modified = GETDATE() WHERE last_modified IS NULL;
+
+
+# S3 ingest: a file's rows are staged under an attempt id, then moved into
+# csp_tools_data1 in the same transaction that records the file in
+# csp_tools_ingest_loads. A retried event finds the file there and skips it.
+CREATE TABLE csp_tools.csp_tools_ingest_staging (LIKE csp_tools.csp_tools_data1 INCLUDING DEFAULTS);
+
+ALTER TABLE csp_tools.csp_tools_ingest_staging
+ADD COLUMN attempt_id VARCHAR(32);
+
+ALTER TABLE csp_tools.csp_tools_ingest_staging
+ADD COLUMN staged_at TIMESTAMP DEFAULT GETDATE();
+
+CREATE TABLE csp_tools.csp_tools_ingest_loads
+(
+    load_id VARCHAR(2048) NOT NULL,
+    table_name VARCHAR(255) NOT NULL,
+    rows_loaded INT NOT NULL,
+    loaded_at TIMESTAMP DEFAULT GETDATE()
+);
+
+
+# Tool counts behind /getToolSummary and the dashboard. The lambda's database user
+# must own the view if SUMMARY_REFRESH_AFTER_WRITE is turned on.
+CREATE MATERIALIZED VIEW csp_tools.csp_tools_team_summary
+AUTO REFRESH YES
+AS
+SELECT team_name, active_inactive, can_be_reused_across_csp_teams, COUNT(*) AS tool_count
+FROM csp_tools.csp_tools_data1
+WHERE is_display = TRUE
+GROUP BY team_name, active_inactive, can_be_reused_across_csp_teams;
+
+
+# Responses of creates sent with an Idempotency-Key header, read back on retries.
+# A key is claimed with status_code 0 before its create runs, the response
+# replaces it once the create succeeded.
+# Rows older than IDEMPOTENCY_TTL_SECONDS are ignored, clear them out with a
+# scheduled DELETE ... WHERE created_at < DATEADD(day, -1, GETDATE()).
+CREATE TABLE csp_tools.csp_tools_idempotency
+(
+    idempotency_key VARCHAR(255) NOT NULL,
+    table_name VARCHAR(255) NOT NULL,
+    request_hash CHAR(64) NOT NULL,
+    status_code INT NOT NULL,
+    response_body VARCHAR(65535),
+    created_at TIMESTAMP DEFAULT GETDATE()
+)
+SORTKEY(created_at);
+
+
 // Here are few of the sql queries which i have used for this project.
 
 select * From csp_tools.csp_tools_data_temp_new